@@ -1,11 +1,15 @@
+import os
 from fastapi import FastAPI
 from logging_config import setup_logging
 from app.routes import runs
+from app.services.runner_service import RunnerService
 from db.models import Base
 from db.session import engine
+from db.migrations import upgrade_schema
 
 # Create tables on startup (simple approach for dev)
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
 logger = setup_logging()
 
@@ -13,6 +17,12 @@ app = FastAPI(title="LLM Reliability Analyzer", version="0.1.0")
 
 app.include_router(runs.router, tags=["runs"])
 
+@app.on_event("startup")
+async def resume_interrupted_runs():
+    # Pick up runs left unfinished by a previous process (e.g. a redeploy)
+    if os.getenv("RESUME_INCOMPLETE_RUNS", "true").lower() == "true":
+        await RunnerService.resume_incomplete_runs()
+
 @app.get("/")
 def read_root():
     logger.info("Root endpoint called")
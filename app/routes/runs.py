@@ -1,37 +1,138 @@
 from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from db.session import get_db
 from db.models import Run, TestResult
-from app.schemas.run import RunCreate, RunResponse, RunDetailResponse
+from app.schemas.run import BatchResponse, BatchRunCreate, RunCreate, RunMerge, RunResponse, RunDetailResponse
 from app.services.runner_service import RunnerService
+from evaluator.llm.factory import DEFAULT_MODELS
+from evaluator.persistence import RUN_RUNNING, merge_runs
+from evaluator.sampling import SampleSpec
 import os
+import uuid
 
 router = APIRouter()
 
+def _new_run(run_in: RunCreate, batch_id: Optional[str] = None) -> Run:
+    """Run record with the resolved provider and model stored in its params."""
+    # The API has always executed runs on Groq unless told otherwise
+    provider = run_in.provider or os.getenv("MODEL_PROVIDER", "groq")
+    model_name = run_in.model_name or os.getenv("MODEL_NAME") or DEFAULT_MODELS.get(provider)
+    return Run(
+        model_name=model_name,
+        provider=provider,
+        tags=",".join(run_in.tags) if run_in.tags else "all",
+        batch_id=batch_id,
+        baseline_run_id=run_in.baseline_run_id,
+        status=RUN_RUNNING,
+        params=run_in.model_copy(update={"model_name": model_name, "provider": provider}).model_dump_json()
+    )
+
 @router.post("/runs", response_model=RunResponse, status_code=202)
 def create_run(run_in: RunCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Trigger a new test run in the background.
     """
-    model_name = run_in.model_name or os.getenv("MODEL_NAME") or "gemini-flash-latest"
-    provider = os.getenv("MODEL_PROVIDER", "google")
-    
+    if run_in.baseline_run_id and not db.query(Run).filter(Run.id == run_in.baseline_run_id).first():
+        raise HTTPException(status_code=404, detail="Baseline run not found")
+
     # Create initial DB record
-    db_run = Run(
-        model_name=model_name,
-        provider=provider,
-        tags=",".join(run_in.tags) if run_in.tags else "all"
-    )
+    db_run = _new_run(run_in)
     db.add(db_run)
     db.commit()
     db.refresh(db_run)
     
     # Enqueue background task
-    background_tasks.add_task(RunnerService.execute_run, run_id=db_run.id, run_params=run_in)
+    background_tasks.add_task(RunnerService.execute_run, run_id=db_run.id, run_params=RunCreate.model_validate_json(db_run.params))
     
     return db_run
 
+@router.post("/runs/batch", response_model=BatchResponse, status_code=202)
+def create_batch(batch_in: BatchRunCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """
+    Run the same suite against several models at once, one Run per model.
+
+    The runs share a batch id and can be compared pairwise with /compare.
+    """
+    batch_id = str(uuid.uuid4())
+    shared = batch_in.model_dump(exclude={"models"})
+    runs = [
+        _new_run(RunCreate(model_name=spec.model_name, provider=spec.provider, **shared), batch_id=batch_id)
+        for spec in batch_in.models
+    ]
+    db.add_all(runs)
+    db.commit()
+    for run in runs:
+        db.refresh(run)
+    
+    background_tasks.add_task(
+        RunnerService.execute_batch,
+        run_params_by_id={run.id: RunCreate.model_validate_json(run.params) for run in runs},
+        tags=batch_in.tags,
+        sample=SampleSpec.from_params(batch_in)
+    )
+    
+    return BatchResponse(batch_id=batch_id, runs=runs)
+
+@router.get("/batches/{batch_id}", response_model=BatchResponse)
+def get_batch(batch_id: str, db: Session = Depends(get_db)):
+    """
+    Get the runs of a multi-model batch.
+    """
+    runs = db.query(Run).filter(Run.batch_id == batch_id).order_by(Run.model_name).all()
+    if not runs:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return BatchResponse(batch_id=batch_id, runs=runs)
+
+@router.post("/runs/merge", response_model=RunResponse, status_code=201)
+def merge_shard_runs(merge_in: RunMerge, db: Session = Depends(get_db)):
+    """
+    Combine several finished runs, typically the shards of one suite, into a new Run.
+    """
+    sources = []
+    for run_id in merge_in.run_ids:
+        run = db.query(Run).filter(Run.id == run_id).first()
+        if not run:
+            raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+        sources.append((run, db.query(TestResult).filter(TestResult.run_id == run_id).all()))
+    try:
+        merged = merge_runs(db, sources)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    db.refresh(merged)
+    return merged
+
+@router.post("/runs/{run_id}/resume", response_model=RunResponse, status_code=202)
+def resume_run(run_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """
+    Resume an interrupted run. Tests that already have results are skipped.
+    """
+    run = db.query(Run).filter(Run.id == run_id).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    
+    run.status = RUN_RUNNING
+    db.commit()
+    db.refresh(run)
+    
+    background_tasks.add_task(RunnerService.resume_run, run_id=run.id)
+    
+    return run
+
+@router.post("/runs/{run_id}/cancel", response_model=RunResponse, status_code=202)
+def cancel_run(run_id: str, db: Session = Depends(get_db)):
+    """
+    Abort a running run. In-flight requests are cancelled and results stored so far are kept.
+    """
+    run = db.query(Run).filter(Run.id == run_id).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    if not RunnerService.cancel_run(run_id):
+        raise HTTPException(status_code=409, detail="Run is not executing")
+
+    return run
+
 @router.get("/runs", response_model=List[RunResponse])
 def get_runs(skip: int = 0, limit: int = 20, db: Session = Depends(get_db)):
     """
@@ -96,7 +197,10 @@ def compare_runs(base_run: str, compare_run: str, db: Session = Depends(get_db))
                 }
                 for i in result.improvements
             ],
-            "avg_latency_delta": result.avg_latency_delta
+            "avg_latency_delta": result.avg_latency_delta,
+            "avg_ttft_delta": result.avg_ttft_delta,
+            "avg_tokens_per_sec_delta": result.avg_tokens_per_sec_delta,
+            "cost_usd_delta": result.cost_usd_delta
         }
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -1,10 +1,98 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Literal, Optional
 from datetime import datetime
+from evaluator.sampling import parse_shard
+from evaluator.tag_query import parse_tag_queries
+
+Provider = Literal["groq", "google", "ollama", "mock"]
+JudgeType = Literal["grounding", "hallucination", "quality"]
+
+def _validate_tag_queries(tags: Optional[List[str]]) -> Optional[List[str]]:
+    """Reject malformed tag queries up front (TagQueryError is a ValueError)."""
+    if tags:
+        parse_tag_queries(tags)
+    return tags
 
 class RunCreate(BaseModel):
     model_name: Optional[str] = None
-    tags: Optional[List[str]] = None
+    provider: Optional[Provider] = Field(None, description="Model provider (defaults to MODEL_PROVIDER env)")
+    tags: Optional[List[str]] = Field(None, description="Tag queries, ORed (e.g. ['json AND NOT adversarial', 'refusal'])")
+    max_concurrency: Optional[int] = Field(None, ge=1, description="Max in-flight requests for this run")
+    temperature: Optional[float] = Field(None, ge=0, description="Generation temperature (provider default if unset)")
+    cache_mode: Optional[Literal["off", "deterministic", "force"]] = Field(
+        None, description="Response cache mode (defaults to RESPONSE_CACHE_MODE env or 'deterministic')"
+    )
+    max_duration_s: Optional[float] = Field(None, gt=0, description="Wall-clock budget; in-flight tests are cancelled when spent")
+    max_tokens: Optional[int] = Field(None, ge=1, description="Token budget (generation + judge); in-flight tests are cancelled when spent")
+    max_requests: Optional[int] = Field(None, ge=1, description="Provider request budget; no new requests are sent once spent")
+    sample_fraction: Optional[float] = Field(None, gt=0, le=1, description="Run this share of each tag's tests (at least one per tag)")
+    sample_per_tag: Optional[int] = Field(None, ge=1, description="Run this many tests per tag (takes precedence over sample_fraction)")
+    sample_seed: Optional[int] = Field(None, description="Seed choosing the sampled tests (default 0)")
+    shard: Optional[str] = Field(None, description="Run only shard i of N ('i/N'), by a stable hash of the test id")
+    abort_invalid_json: Optional[bool] = Field(
+        None, description="Stop a JSON test's generation once its output can no longer be valid JSON (defaults to ABORT_INVALID_JSON env)"
+    )
+    judge: Optional[JudgeType] = Field(
+        None, description="LLM judge applied to outputs that pass the deterministic checks (defaults to LLM_JUDGE env; none if unset)"
+    )
+    baseline_run_id: Optional[str] = Field(
+        None, description="Incremental run: copy forward this run's results for cases whose content, model and params are unchanged"
+    )
+
+    @field_validator("tags")
+    @classmethod
+    def check_tags(cls, tags):
+        return _validate_tag_queries(tags)
+
+    @field_validator("shard")
+    @classmethod
+    def check_shard(cls, shard):
+        if shard is not None:
+            parse_shard(shard)
+        return shard
+
+class ModelSpec(BaseModel):
+    model_name: str
+    provider: Optional[Provider] = Field(None, description="Model provider (defaults to MODEL_PROVIDER env)")
+
+class BatchRunCreate(BaseModel):
+    """One run per model over the same suite, executed together."""
+    models: List[ModelSpec] = Field(..., min_length=1)
+    tags: Optional[List[str]] = Field(None, description="Tag queries, ORed (e.g. ['json AND NOT adversarial', 'refusal'])")
+    max_concurrency: Optional[int] = Field(None, ge=1, description="Max in-flight requests per model")
+    temperature: Optional[float] = Field(None, ge=0, description="Generation temperature (provider default if unset)")
+    cache_mode: Optional[Literal["off", "deterministic", "force"]] = Field(
+        None, description="Response cache mode (defaults to RESPONSE_CACHE_MODE env or 'deterministic')"
+    )
+    max_duration_s: Optional[float] = Field(None, gt=0, description="Wall-clock budget; in-flight tests are cancelled when spent")
+    max_tokens: Optional[int] = Field(None, ge=1, description="Token budget (generation + judge); in-flight tests are cancelled when spent")
+    max_requests: Optional[int] = Field(None, ge=1, description="Provider request budget; no new requests are sent once spent")
+    sample_fraction: Optional[float] = Field(None, gt=0, le=1, description="Run this share of each tag's tests (at least one per tag)")
+    sample_per_tag: Optional[int] = Field(None, ge=1, description="Run this many tests per tag (takes precedence over sample_fraction)")
+    sample_seed: Optional[int] = Field(None, description="Seed choosing the sampled tests (default 0)")
+    shard: Optional[str] = Field(None, description="Run only shard i of N ('i/N'), by a stable hash of the test id")
+    abort_invalid_json: Optional[bool] = Field(
+        None, description="Stop a JSON test's generation once its output can no longer be valid JSON (defaults to ABORT_INVALID_JSON env)"
+    )
+    judge: Optional[JudgeType] = Field(
+        None, description="LLM judge applied to outputs that pass the deterministic checks (defaults to LLM_JUDGE env; none if unset)"
+    )
+
+    @field_validator("tags")
+    @classmethod
+    def check_tags(cls, tags):
+        return _validate_tag_queries(tags)
+
+    @field_validator("shard")
+    @classmethod
+    def check_shard(cls, shard):
+        if shard is not None:
+            parse_shard(shard)
+        return shard
+
+class RunMerge(BaseModel):
+    """Runs (e.g. the shards of one suite) to combine into a new Run."""
+    run_ids: List[str] = Field(..., min_length=1, description="Runs to merge, in order of precedence")
 
 class TestResultResponse(BaseModel):
     id: str
@@ -14,6 +102,23 @@ class TestResultResponse(BaseModel):
     status: str
     failure_reasons: Optional[str] = None
     latency_ms: Optional[float] = None
+    ttft_ms: Optional[float] = None
+    output_tokens: Optional[int] = None
+    tokens_per_sec: Optional[float] = None
+    cached: Optional[bool] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cached_prompt_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    cost_usd: Optional[float] = None
+    judge_prompt_tokens: Optional[int] = None
+    judge_completion_tokens: Optional[int] = None
+    judge_cost_usd: Optional[float] = None
+    judge_score: Optional[float] = None  # 0-10, when the LLM judge ran
+    judge_reasoning: Optional[str] = None
+    judge_issues: Optional[str] = None  # JSON list
+    fingerprint: Optional[str] = None
+    copied_from_run_id: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -24,11 +129,29 @@ class RunResponse(BaseModel):
     model_name: str
     provider: str
     tags: str
+    batch_id: Optional[str] = None
+    baseline_run_id: Optional[str] = None
+    status: Optional[str] = None
+    budget_exhausted: Optional[str] = None
+    total_tests: Optional[int] = None
     pass_rate: Optional[float] = None
     avg_latency: Optional[float] = None
+    p95_latency: Optional[float] = None
+    avg_ttft_ms: Optional[float] = None
+    p95_ttft_ms: Optional[float] = None
+    avg_tokens_per_sec: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    total_tokens: Optional[int] = None
+    cost_usd: Optional[float] = None
+    judge_cost_usd: Optional[float] = None
     
     class Config:
         from_attributes = True
 
 class RunDetailResponse(RunResponse):
     results: List[TestResultResponse] = []
+
+class BatchResponse(BaseModel):
+    batch_id: str
+    runs: List[RunResponse]
@@ -1,5 +1,13 @@
-from pydantic import BaseModel, Field
+import hashlib
+import json
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
 from typing import List, Optional, Dict, Any
+from evaluator.constraints import ConstraintSet, compile_constraints
+
+# Fields that determine what a test sends and how its output is judged
+FINGERPRINT_FIELDS = (
+    "prompt", "context", "tags", "expected_behavior", "constraints", "evaluation_criteria", "should_refuse"
+)
 
 class TestCase(BaseModel):
     id: str = Field(..., description="Unique identifier for the test case")
@@ -17,3 +25,31 @@ class TestCase(BaseModel):
     should_refuse: bool = Field(False, description="Whether the model should refuse to answer")
     
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Extra metadata")
+
+    _compiled_constraints: Optional[ConstraintSet] = PrivateAttr(default=None)
+    _fingerprint: Optional[str] = PrivateAttr(default=None)
+
+    @model_validator(mode="after")
+    def check_constraints(self) -> "TestCase":
+        # Parsed once here so evaluators never re-parse constraint strings
+        self._compiled_constraints = compile_constraints(self.constraints, self.evaluation_criteria)
+        self._fingerprint = self._hash_fingerprint()
+        return self
+
+    @property
+    def compiled_constraints(self) -> ConstraintSet:
+        """`constraints` and JSON criteria as checker objects (see evaluator.constraints)."""
+        if self._compiled_constraints is None:
+            self._compiled_constraints = compile_constraints(self.constraints, self.evaluation_criteria)
+        return self._compiled_constraints
+
+    @property
+    def fingerprint(self) -> str:
+        """Content hash of FINGERPRINT_FIELDS; unchanged cases can reuse earlier results."""
+        if self._fingerprint is None:
+            self._fingerprint = self._hash_fingerprint()
+        return self._fingerprint
+
+    def _hash_fingerprint(self) -> str:
+        payload = json.dumps({name: getattr(self, name) for name in FINGERPRINT_FIELDS}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
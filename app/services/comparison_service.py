@@ -36,6 +36,9 @@ class ComparisonResult:
     unchanged: List[TestComparison]
     
     avg_latency_delta: float
+    avg_ttft_delta: Optional[float] = None
+    avg_tokens_per_sec_delta: Optional[float] = None
+    cost_usd_delta: Optional[float] = None
 
 class ComparisonService:
     """Service for comparing test runs and detecting regressions."""
@@ -108,6 +111,15 @@ class ComparisonService:
         # Calculate metrics
         pass_rate_delta = (compare_run.pass_rate or 0) - (base_run.pass_rate or 0)
         avg_latency_delta = (compare_run.avg_latency or 0) - (base_run.avg_latency or 0)
+        avg_ttft_delta = None
+        if compare_run.avg_ttft_ms is not None and base_run.avg_ttft_ms is not None:
+            avg_ttft_delta = compare_run.avg_ttft_ms - base_run.avg_ttft_ms
+        avg_tokens_per_sec_delta = None
+        if compare_run.avg_tokens_per_sec is not None and base_run.avg_tokens_per_sec is not None:
+            avg_tokens_per_sec_delta = compare_run.avg_tokens_per_sec - base_run.avg_tokens_per_sec
+        cost_usd_delta = None
+        if compare_run.cost_usd is not None and base_run.cost_usd is not None:
+            cost_usd_delta = compare_run.cost_usd - base_run.cost_usd
         
         return ComparisonResult(
             base_run_id=base_run_id,
@@ -121,7 +133,10 @@ class ComparisonService:
             regressions=regressions,
             improvements=improvements,
             unchanged=unchanged,
-            avg_latency_delta=avg_latency_delta
+            avg_latency_delta=avg_latency_delta,
+            avg_ttft_delta=avg_ttft_delta,
+            avg_tokens_per_sec_delta=avg_tokens_per_sec_delta,
+            cost_usd_delta=cost_usd_delta
         )
     
     @staticmethod
@@ -161,5 +176,11 @@ class ComparisonService:
         # Latency
         if result.avg_latency_delta != 0:
             print(f"\n⏱️  Avg Latency: {result.avg_latency_delta:+.0f}ms")
+        if result.avg_ttft_delta is not None:
+            print(f"⏱️  Avg TTFT: {result.avg_ttft_delta:+.0f}ms")
+        if result.avg_tokens_per_sec_delta is not None:
+            print(f"⚡ Avg Throughput: {result.avg_tokens_per_sec_delta:+.1f} tokens/sec")
+        if result.cost_usd_delta is not None:
+            print(f"💰 Est. Cost: {result.cost_usd_delta:+.4f} USD")
         
         print("="*60)
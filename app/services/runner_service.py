@@ -1,106 +1,303 @@
 import os
-import time
+import asyncio
 import logging
-from typing import List, Optional
+from typing import Dict, List, Optional, Set
 from sqlalchemy.orm import Session
 from app.schemas.run import RunCreate
-from db.models import Run, TestResult
+from app.schemas.test_case import TestCase
+from db.models import Run
 from db.session import SessionLocal
-# from evaluator.llm.gemini_client import GeminiAdapter  # Commented: Using Groq instead
-from evaluator.llm.groq_client import GroqAdapter
-from evaluator.loader import TestLoader
+from evaluator.base import BaseEvaluator
+from evaluator.budget import RunBudget
+from evaluator.incremental import Baseline
+from evaluator.llm.cache import CachedAdapter
+from evaluator.llm.factory import DEFAULT_MODELS, create_adapter
+from evaluator.loader import PendingTests, TestLoader
+from evaluator.runner import Runner, TestOutcome
+from evaluator.sampling import SampleSpec
+from evaluator.persistence import (
+    RUN_CANCELLED,
+    RUN_COMPLETED,
+    RUN_FAILED,
+    RUN_RUNNING,
+    RUN_TRUNCATED,
+    ResultWriter,
+    build_result_row,
+    completed_test_ids,
+    finalize_run,
+    load_run_params,
+)
 
 logger = logging.getLogger(__name__)
 
+# Strong references to runs resumed at startup so they aren't garbage collected
+_background_runs: Set[asyncio.Task] = set()
+
+# Runs executing in this process, by run id, so they can be cancelled
+_active_runs: Dict[str, asyncio.Task] = {}
+
 class RunnerService:
     @staticmethod
-    def execute_run(run_id: str, run_params: RunCreate):
+    async def execute_run(
+        run_id: str,
+        run_params: RunCreate,
+        tests: Optional[List[TestCase]] = None,
+        evaluators: Optional[List[BaseEvaluator]] = None,
+    ):
         """
         Executes the test suite in the background.
+
+        Tests that already have a stored result for this run are skipped, so the
+        same call resumes an interrupted run. Runs on the API event loop so that
+        concurrency limits are shared between runs started at the same time;
+        its database and dataset work is done on worker threads so the loop
+        keeps serving requests. The run can be aborted with `cancel_run`.
+
+        Args:
+            run_id: Run to execute
+            run_params: Parameters the run was created with
+            tests: Already loaded suite (loaded from datasets/ by tags if None)
+            evaluators: Evaluators to apply (the default set if None)
+        """
+        task = asyncio.create_task(RunnerService._execute_run(run_id, run_params, tests, evaluators))
+        _active_runs[run_id] = task
+        try:
+            await task
+        finally:
+            if _active_runs.get(run_id) is task:
+                del _active_runs[run_id]
+
+    @staticmethod
+    def cancel_run(run_id: str) -> bool:
         """
+        Cancel a run executing in this process, aborting its in-flight requests.
+        Results stored so far are kept and the run is marked cancelled.
+
+        Returns:
+            False if the run is not executing in this process
+        """
+        task = _active_runs.get(run_id)
+        if task is None or task.done():
+            return False
+        # Safe to call from the threadpool that runs sync routes
+        task.get_loop().call_soon_threadsafe(task.cancel)
+        return True
+
+    @staticmethod
+    def build_evaluators(judge: Optional[str] = None) -> List[BaseEvaluator]:
+        """
+        Evaluators applied to every API run. They are stateless, so one set can serve many runs.
+
+        Args:
+            judge: LLM judge evaluation type (defaults to LLM_JUDGE env; no judge if unset)
+        """
+        from evaluator.evaluators.format import FormatEvaluator
+        from evaluator.evaluators.compliance import ComplianceEvaluator
+        evaluators: List[BaseEvaluator] = [FormatEvaluator(), ComplianceEvaluator()]
+        judge = judge or os.getenv("LLM_JUDGE")
+        if judge:
+            from evaluator.evaluators.llm_judge import LLMJudgeEvaluator
+            evaluators.append(LLMJudgeEvaluator(evaluation_type=judge))
+        return evaluators
+
+    @staticmethod
+    async def _execute_run(
+        run_id: str,
+        run_params: RunCreate,
+        tests: Optional[List[TestCase]],
+        evaluators: Optional[List[BaseEvaluator]],
+    ):
         # Load environment variables (critical for background tasks!)
         from dotenv import load_dotenv
         load_dotenv()
         
+        # The session is only used from worker threads (one call at a time), so
+        # database round trips and dataset reads never block the API event loop
         db: Session = SessionLocal()
+        run_record = None
+        total_tests = len(tests) if tests is not None else 0
         try:
-            run_record = db.query(Run).filter(Run.id == run_id).first()
+            run_record = await asyncio.to_thread(lambda: db.query(Run).filter(Run.id == run_id).first())
             if not run_record:
                 logger.error(f"Run {run_id} not found in DB")
                 return
 
-            model_name = run_params.model_name or os.getenv("MODEL_NAME") or "llama-3.3-70b-versatile"
-            print(f"DEBUG: Starting run {run_id} with model {model_name}")
+            provider = run_params.provider or run_record.provider
+            model_name = run_params.model_name or os.getenv("MODEL_NAME") or DEFAULT_MODELS.get(provider)
+            print(f"DEBUG: Starting run {run_id} with {provider} model {model_name}")
             
             # Initialize Adapter
             try:
-                # adapter = GeminiAdapter(model_name=model_name)  # Commented: Using Groq instead
-                adapter = GroqAdapter(model_name=model_name)
+                adapter = create_adapter(provider, model_name=model_name)
             except Exception as e:
                 logger.error(f"Adapter init failed: {e}")
+                run_record.status = RUN_FAILED
+                await asyncio.to_thread(db.commit)
                 return
 
-            # Load Tests
-            loader = TestLoader(base_path="datasets")
-            tests = loader.load_test_suite(tags=run_params.tags)
-            print(f"DEBUG: Loaded {len(tests)} tests for tags {run_params.tags}")
+            cache_mode = run_params.cache_mode or os.getenv("RESPONSE_CACHE_MODE", "deterministic")
+            if cache_mode != "off":
+                adapter = CachedAdapter(adapter, mode=cache_mode)
+            params = {"temperature": run_params.temperature} if run_params.temperature is not None else None
+
+            # Tests are read lazily while the run executes (unless shared with other runs of a batch)
+            count = None  # A shared list is counted by its length
+            if tests is None:
+                loader = TestLoader(base_path="datasets")
+                sample = SampleSpec.from_params(run_params)
+                tests = loader.iter_test_suite(tags=run_params.tags, sample=sample)
+                count = lambda: loader.count_test_suite(tags=run_params.tags, sample=sample)
+            
+            # Skip tests completed before an interruption, and unchanged ones of an incremental run
+            done_ids = await asyncio.to_thread(completed_test_ids, db, run_id)
+            baseline = await asyncio.to_thread(Baseline, db, run_id, run_params) if run_params.baseline_run_id else None
+            pending = PendingTests(tests, done_ids, reuse=baseline.reuse if baseline else None, count=count)
+            if done_ids:
+                print(f"DEBUG: Resuming run {run_id}: {len(done_ids)} already done")
+            if baseline and baseline.changed_params:
+                print(f"DEBUG: Run {run_id} re-runs every test: {', '.join(baseline.changed_params)} changed since baseline")
+            run_record.status = RUN_RUNNING
+            await asyncio.to_thread(db.commit)
             
             # Initialize Evaluators
-            from evaluator.evaluators.format import FormatEvaluator
-            from evaluator.evaluators.compliance import ComplianceEvaluator
-            evaluators = [FormatEvaluator(), ComplianceEvaluator()]
+            if evaluators is None:
+                evaluators = RunnerService.build_evaluators(run_params.judge)
             
-            latencies = []
-            results_meta = []
-
-            for test in tests:
-                start_time = time.time()
-                try:
-                    output = adapter.generate(prompt=test.prompt, context=test.context)
-                    latency_ms = (time.time() - start_time) * 1000
-                    latencies.append(latency_ms)
-                    
-                    # Evaluate
-                    test_passed = True
-                    reasons = []
-                    for ev in evaluators:
-                        res = ev.evaluate(test, output)
-                        if not res.passed:
-                            test_passed = False
-                            reasons.append(f"{ev.__class__.__name__}: {res.reason}")
-                    
-                    status = "PASS" if test_passed else "FAIL"
-                    
-                    # Save Result
-                    acc_result = TestResult(
-                        run_id=run_id,
-                        test_id=test.id,
-                        test_name=test.name,
-                        input_prompt=test.prompt,
-                        output_text=output,
-                        status=status,
-                        failure_reasons="\n".join(reasons),
-                        latency_ms=latency_ms
-                    )
-                    db.add(acc_result)
-                    db.commit()
-                    
-                    results_meta.append({"status": status})
-                    
-                    # Rate limit sleep (15s for free tier: 4 req/min < 5 req/min limit)
-                    time.sleep(15)
-                    
-                except Exception as e:
-                    logger.error(f"Test {test.id} execution failed: {e}")
+            budget = RunBudget.from_params(run_params)
+            runner = Runner(
+                adapter, evaluators, max_concurrency=run_params.max_concurrency, params=params, budget=budget,
+                abort_invalid_json=run_params.abort_invalid_json
+            )
+
+            # Results are persisted in batches behind the runner
+            writer = ResultWriter()
+            writer.start()
+
+            async def save_result(outcome: TestOutcome):
+                await writer.put(build_result_row(run_id, outcome))
+
+            try:
+                await runner.run(pending, on_result=save_result, collect=False)
+            finally:
+                await writer.close()
+                if baseline:
+                    await asyncio.to_thread(baseline.flush)
+                # May count the rest of the suite if the run stopped early
+                total_tests = await asyncio.to_thread(lambda: pending.total)
+            print(f"DEBUG: Run {run_id} read {total_tests} tests for tags {run_params.tags}")
+            if baseline:
+                print(f"DEBUG: Run {run_id} copied {baseline.copied} unchanged results from {baseline.baseline_run_id}")
             
-            # Update Run Metrics
-            if results_meta:
-                pass_count = sum(1 for r in results_meta if r["status"] == "PASS")
-                run_record.pass_rate = pass_count / len(tests)
-                run_record.avg_latency = sum(latencies) / len(latencies) if latencies else 0.0
-                db.commit()
+            # Update Run Metrics (over results from before and after any resume)
+            if budget is not None and budget.exhausted:
+                print(f"DEBUG: Run {run_id} truncated: {budget.exhausted} budget exhausted")
+                await asyncio.to_thread(
+                    finalize_run, db, run_record, total_tests=total_tests, status=RUN_TRUNCATED,
+                    budget_exhausted=budget.exhausted, rows_lost=writer.rows_lost
+                )
+            else:
+                await asyncio.to_thread(
+                    finalize_run, db, run_record, total_tests=total_tests, status=RUN_COMPLETED, rows_lost=writer.rows_lost
+                )
                 
+        except asyncio.CancelledError:
+            # Handled here rather than re-raised: cancelling a run is not an error
+            logger.info(f"Run {run_id} cancelled")
+            await asyncio.to_thread(db.rollback)
+            if run_record:
+                await asyncio.to_thread(finalize_run, db, run_record, total_tests=total_tests, status=RUN_CANCELLED)
         except Exception as e:
             logger.error(f"Critical error in execute_run: {e}")
+            await asyncio.to_thread(db.rollback)
+            if run_record:
+                run_record.status = RUN_FAILED
+                await asyncio.to_thread(db.commit)
+        finally:
+            db.close()
+
+    @staticmethod
+    async def execute_batch(
+        run_params_by_id: Dict[str, RunCreate],
+        tags: Optional[List[str]],
+        sample: Optional[SampleSpec] = None,
+    ):
+        """
+        Execute several runs of one batch (typically one per model) together.
+
+        The suite is loaded and validated once and shared by every run. All
+        model x test pairs are scheduled on the event loop at once; each run keeps
+        its own concurrency limit, and runs on the same provider share that
+        provider's rate budget and concurrency slots.
+        """
+        from dotenv import load_dotenv
+        load_dotenv()
+
+        try:
+            loader = TestLoader(base_path="datasets")
+            tests = await asyncio.to_thread(loader.load_test_suite, tags=tags, sample=sample)
+            # Judge settings are shared by every run of a batch
+            evaluators = RunnerService.build_evaluators(next(iter(run_params_by_id.values())).judge)
+        except Exception as e:
+            logger.error(f"Critical error loading batch suite: {e}")
+            await asyncio.to_thread(RunnerService._mark_failed, list(run_params_by_id))
+            return
+        print(f"DEBUG: Loaded {len(tests)} tests for {len(run_params_by_id)} batched runs")
+
+        await asyncio.gather(*(
+            RunnerService.execute_run(run_id, run_params, tests=tests, evaluators=evaluators)
+            for run_id, run_params in run_params_by_id.items()
+        ))
+
+    @staticmethod
+    def _mark_failed(run_ids: List[str]):
+        """Set the runs' status to failed (blocking; called off the event loop)."""
+        db: Session = SessionLocal()
+        try:
+            db.query(Run).filter(Run.id.in_(run_ids)).update({Run.status: RUN_FAILED}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    async def resume_run(run_id: str):
+        """
+        Resume a run using the parameters it was started with.
+        """
+        run_params = await asyncio.to_thread(RunnerService._stored_params, run_id)
+        if run_params is None:
+            logger.error(f"Run {run_id} not found in DB")
+            return
+        
+        await RunnerService.execute_run(run_id, run_params)
+
+    @staticmethod
+    def _stored_params(run_id: str) -> Optional[RunCreate]:
+        """Parameters a run was created with, or None if it doesn't exist (blocking)."""
+        db: Session = SessionLocal()
+        try:
+            run_record = db.query(Run).filter(Run.id == run_id).first()
+            return load_run_params(run_record) if run_record else None
+        finally:
+            db.close()
+
+    @staticmethod
+    async def resume_incomplete_runs():
+        """
+        Schedule every run still marked as running (e.g. interrupted by a restart).
+        Must be awaited on the API event loop.
+        """
+        run_ids = await asyncio.to_thread(RunnerService._running_run_ids)
+        for run_id in run_ids:
+            logger.info(f"Resuming interrupted run {run_id}")
+            task = asyncio.create_task(RunnerService.resume_run(run_id))
+            _background_runs.add(task)
+            task.add_done_callback(_background_runs.discard)
+
+    @staticmethod
+    def _running_run_ids() -> List[str]:
+        """Ids of the runs marked as running (blocking)."""
+        db: Session = SessionLocal()
+        try:
+            return [run_id for (run_id,) in db.query(Run.id).filter(Run.status == RUN_RUNNING).all()]
         finally:
             db.close()
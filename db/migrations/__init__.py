@@ -0,0 +1,23 @@
+"""
+Lightweight schema upgrades for existing databases.
+
+`Base.metadata.create_all` only creates missing tables, so columns added to
+the models after a database was first created are added here.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from db.models import Base
+
+def upgrade_schema(engine: Engine):
+    """Add any model columns missing from existing tables (new columns must be nullable)."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
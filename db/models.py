@@ -14,10 +14,27 @@ class Run(Base):
     model_name = Column(String, index=True)
     provider = Column(String)
     tags = Column(String) # Comma-separated tags
+    batch_id = Column(String, index=True, nullable=True) # Groups runs started by one multi-model request
+    status = Column(String, nullable=True) # running / completed / failed / cancelled / truncated
+    budget_exhausted = Column(String, nullable=True) # time / tokens / requests, when the run was truncated
+    params = Column(Text, nullable=True) # JSON run parameters, used to resume
+    baseline_run_id = Column(String, nullable=True) # Incremental runs: run whose unchanged results were copied forward
+    total_tests = Column(Integer, nullable=True)
     
     # Metrics
     pass_rate = Column(Float, nullable=True)
     avg_latency = Column(Float, nullable=True)
+    p95_latency = Column(Float, nullable=True)
+    avg_ttft_ms = Column(Float, nullable=True)
+    p95_ttft_ms = Column(Float, nullable=True)
+    avg_tokens_per_sec = Column(Float, nullable=True)
+    
+    # Token accounting (generation + judge) and estimated cost
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    total_tokens = Column(Integer, nullable=True)
+    cost_usd = Column(Float, nullable=True)  # Generation + judge, from the local price table
+    judge_cost_usd = Column(Float, nullable=True)
     
     results = relationship("TestResult", back_populates="run", cascade="all, delete-orphan")
 
@@ -35,7 +52,25 @@ class TestResult(Base):
     status = Column(String) # PASS / FAIL
     failure_reasons = Column(Text) # JSON list or newline separated
     
-    latency_ms = Column(Float, nullable=True)
+    latency_ms = Column(Float, nullable=True)  # Total generation time
+    ttft_ms = Column(Float, nullable=True)  # Time to first streamed token
+    output_tokens = Column(Integer, nullable=True)
+    tokens_per_sec = Column(Float, nullable=True)  # Decode throughput
+    cached = Column(Boolean, nullable=True)  # Output served from the response cache
+    
+    # Provider-reported token usage and estimated cost
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    cached_prompt_tokens = Column(Integer, nullable=True)  # Prompt tokens served from the provider's prompt cache
+    total_tokens = Column(Integer, nullable=True)
+    cost_usd = Column(Float, nullable=True)
+    judge_prompt_tokens = Column(Integer, nullable=True)
+    judge_completion_tokens = Column(Integer, nullable=True)
+    judge_cost_usd = Column(Float, nullable=True)
+    
+    # Incremental runs
+    fingerprint = Column(String, nullable=True)  # TestCase.fingerprint of the case that produced this result
+    copied_from_run_id = Column(String, nullable=True)  # Baseline run the result was copied from (not re-executed)
     
     # LLM Judge Scores
     judge_score = Column(Float, nullable=True)  # 0-10 score from judge
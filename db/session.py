@@ -1,14 +1,19 @@
+import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 
-# SQLite database file
-DATABASE_URL = "sqlite:///./llm_reliability.db"
+# SQLite database file by default; DATABASE_URL points shards of a run at a shared database
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./llm_reliability.db")
+
+
+def make_engine(url: str):
+    """Engine for a database URL, with the options SQLite needs."""
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}  # Needed for SQLite + FastAPI/Async
+    return create_engine(url, connect_args=connect_args)
+
 
 # Create engine
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False} # Needed for SQLite + FastAPI/Async
-)
+engine = make_engine(DATABASE_URL)
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -1,7 +1,52 @@
+import os
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Optional, List
+from typing import Any, Optional, List, Sequence, Tuple
 from app.schemas.test_case import TestCase
+from evaluator.llm.usage import UsageTracker, track_usage
+
+# Relative cost of evaluating one output: pipelines run cheaper evaluators first,
+# and evaluators costing a model call only when the verdict is still open
+COST_DETERMINISTIC = 1  # Checks of the output text alone
+COST_MODEL_CALL = 100  # Calls a model (e.g. LLM judge)
+
+# Model-calling evaluations in flight at once (JUDGE_MAX_CONCURRENCY env)
+DEFAULT_JUDGE_CONCURRENCY = 4
+
+_judge_pool: Optional[ThreadPoolExecutor] = None
+_judge_pool_lock = threading.Lock()
+_judge_thread = threading.local()
+
+
+def _mark_judge_thread():
+    _judge_thread.active = True
+
+
+def get_judge_pool() -> ThreadPoolExecutor:
+    """Process-wide pool every model-calling evaluation runs on, so JUDGE_MAX_CONCURRENCY bounds them all."""
+    global _judge_pool
+    with _judge_pool_lock:
+        if _judge_pool is None:
+            _judge_pool = ThreadPoolExecutor(
+                max_workers=max(1, int(os.getenv("JUDGE_MAX_CONCURRENCY", DEFAULT_JUDGE_CONCURRENCY))),
+                thread_name_prefix="judge",
+                initializer=_mark_judge_thread,
+            )
+        return _judge_pool
+
+
+def on_judge_pool() -> bool:
+    """Whether the caller runs on the judge pool, which must not wait on work it submits to itself."""
+    return getattr(_judge_thread, "active", False)
+
+@dataclass
+class Judgment:
+    """A model judge's assessment of an output."""
+    score: float  # 0 to 10
+    reasoning: str
+    issues: List[str] = field(default_factory=list)
 
 @dataclass
 class EvaluationResult:
@@ -9,11 +54,35 @@ class EvaluationResult:
     passed: bool
     reason: str
     failure_type: Optional[str] = None  # FORMAT_FAIL, COMPLIANCE_FAIL, etc.
+    errors: List[Any] = field(default_factory=list)  # Structured failures, e.g. JsonErrors with a path
+    usage: Optional[UsageTracker] = field(default=None, repr=False)  # Model calls made to evaluate (LLM judge)
+    judgment: Optional[Judgment] = None  # Set by evaluators that ask a model to judge
 
 class BaseEvaluator(ABC):
+    # Relative cost per output (COST_DETERMINISTIC or COST_MODEL_CALL)
+    cost: int = COST_DETERMINISTIC
+
     @abstractmethod
     def evaluate(self, test_case: TestCase, output: str) -> EvaluationResult:
         """
         Evaluates the LLM output against the test case definition.
         """
         pass
+
+    def evaluate_batch(self, pairs: Sequence[Tuple[TestCase, str]]) -> List[EvaluationResult]:
+        """
+        Evaluates many (test_case, output) pairs, returning results in the same order.
+
+        The default evaluates each pair on its own. Evaluators override it when a
+        batch can share work, such as parsing each distinct test case or output
+        once, or judging pairs concurrently; overrides must attach the usage of
+        any model call to the result it was made for.
+        """
+        results = []
+        for test_case, output in pairs:
+            with track_usage() as usage:
+                result = self.evaluate(test_case, output)
+            if usage.records and result.usage is None:
+                result.usage = usage
+            results.append(result)
+        return results
@@ -0,0 +1,74 @@
+"""
+Per-run budgets enforced by the Runner.
+
+- requests: provider calls (retries and hedges included). Once spent, no new
+  call is dispatched; calls already in flight finish.
+- tokens: prompt + completion tokens of generations and judge calls (estimated
+  when a provider reports none). Hard cap: in-flight work is cancelled.
+- time: wall-clock seconds since the run started. Hard cap: in-flight work is
+  cancelled.
+
+After the run, `exhausted` names the budget that stopped it, or is None if
+every test got to run.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+BUDGET_TIME = "time"
+BUDGET_TOKENS = "tokens"
+BUDGET_REQUESTS = "requests"
+
+
+class BudgetExceeded(Exception):
+    """Raised inside the Runner when a test can't be dispatched because a budget is spent."""
+
+
+@dataclass
+class RunBudget:
+    max_duration_s: Optional[float] = None
+    max_tokens: Optional[int] = None
+    max_requests: Optional[int] = None
+
+    tokens_used: int = 0
+    requests_used: int = 0
+    exhausted: Optional[str] = None  # BUDGET_TIME / BUDGET_TOKENS / BUDGET_REQUESTS
+
+    @classmethod
+    def from_params(cls, run_params) -> Optional["RunBudget"]:
+        """Budget from a RunCreate, or None if it sets no cap."""
+        if run_params.max_duration_s is None and run_params.max_tokens is None and run_params.max_requests is None:
+            return None
+        return cls(
+            max_duration_s=run_params.max_duration_s,
+            max_tokens=run_params.max_tokens,
+            max_requests=run_params.max_requests,
+        )
+
+    @property
+    def tokens_spent(self) -> bool:
+        return self.max_tokens is not None and self.tokens_used >= self.max_tokens
+
+    def check_dispatch(self):
+        """Raise BudgetExceeded if no new provider call may start."""
+        if self.exhausted is not None:
+            raise BudgetExceeded(self.exhausted)
+        if self.tokens_spent:
+            self.exhausted = BUDGET_TOKENS
+            raise BudgetExceeded(self.exhausted)
+        if self.max_requests is not None and self.requests_used >= self.max_requests:
+            self.exhausted = BUDGET_REQUESTS
+            raise BudgetExceeded(self.exhausted)
+
+    def take_request(self, hedge: bool = False):
+        """
+        Account for a provider call about to start (raises BudgetExceeded if none are left).
+
+        A refused hedge doesn't mark the budget exhausted: its test still completes.
+        """
+        if hedge and self.max_requests is not None and self.requests_used >= self.max_requests:
+            raise BudgetExceeded(BUDGET_REQUESTS)
+        self.check_dispatch()
+        self.requests_used += 1
+
+    def add_tokens(self, tokens: int):
+        self.tokens_used += tokens
@@ -0,0 +1,263 @@
+"""
+Constraint language for test cases.
+
+Each entry of `TestCase.constraints` is "<name>:<argument>":
+
+    exact_match:<text>      the output contains the text (case-insensitive)
+    forbidden:<text>        the output doesn't contain the text (case-insensitive)
+    regex:<pattern>         the output matches the pattern (re.search)
+    not_regex:<pattern>     the output doesn't match the pattern
+    max_words:N, min_words:N
+    max_chars:N, min_chars:N
+    max_tokens:N, min_tokens:N    estimated tokens (~4 characters each)
+    format:json             the output is (or embeds) JSON
+    json_type:<type>        the JSON is an object, array, string, number, boolean or null
+    json_keys:a,b           the JSON is an object with these top-level keys
+
+A JSON Schema given in the test's evaluation criteria (see
+evaluator.json_validation) is compiled into the same set, as is
+`format: json` there.
+
+A test case's list is compiled once, when the TestCase is validated, into a
+ConstraintSet of checker objects that evaluators run directly. An unknown or
+malformed constraint (or schema) makes the test case invalid instead of being
+ignored. ComplianceEvaluator runs the text checks and FormatEvaluator the JSON
+ones (any JSON constraint implies format:json).
+"""
+import re
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
+
+from evaluator.json_validation import JsonError, SchemaValidator, compile_schema, schema_from_criteria
+from evaluator.llm.base import estimate_output_tokens
+
+
+class ConstraintError(ValueError):
+    """Raised for an unknown or malformed constraint."""
+
+
+class Output:
+    """An output being checked, with measures computed at most once across checks."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    @cached_property
+    def lowered(self) -> str:
+        return self.text.lower()
+
+    @cached_property
+    def words(self) -> int:
+        return len(self.text.split())
+
+    @cached_property
+    def tokens(self) -> int:
+        return estimate_output_tokens(self.text)
+
+    @property
+    def chars(self) -> int:
+        return len(self.text)
+
+
+class TextCheck:
+    source: str  # The constraint as written
+
+    def check(self, output: Output) -> Optional[str]:
+        """Failure reason, or None if the output satisfies the constraint."""
+        raise NotImplementedError
+
+
+class JsonCheck:
+    source: str
+
+    def check(self, value: Any) -> List[JsonError]:
+        """Violations of a parsed JSON value (empty if it satisfies the constraint)."""
+        raise NotImplementedError
+
+
+@dataclass(frozen=True)
+class Contains(TextCheck):
+    source: str
+    target: str
+    lowered: str
+
+    def check(self, output):
+        if self.lowered not in output.lowered:
+            return f"Output did not contain expected text: '{self.target}'"
+        return None
+
+
+@dataclass(frozen=True)
+class Forbidden(TextCheck):
+    source: str
+    target: str
+    lowered: str
+
+    def check(self, output):
+        if self.lowered in output.lowered:
+            return f"Output contains forbidden text: '{self.target}'"
+        return None
+
+
+@dataclass(frozen=True)
+class Pattern(TextCheck):
+    source: str
+    pattern: "re.Pattern"
+    must_match: bool
+
+    def check(self, output):
+        found = self.pattern.search(output.text) is not None
+        if found != self.must_match:
+            verb = "did not match" if self.must_match else "matched forbidden"
+            return f"Output {verb} pattern: '{self.pattern.pattern}'"
+        return None
+
+
+@dataclass(frozen=True)
+class Limit(TextCheck):
+    source: str
+    measure: str  # words / chars / tokens
+    bound: int
+    is_max: bool
+
+    def check(self, output):
+        value = getattr(output, self.measure)
+        if self.is_max and value > self.bound:
+            return f"Output has {value} {self.measure}, more than {self.bound}"
+        if not self.is_max and value < self.bound:
+            return f"Output has {value} {self.measure}, fewer than {self.bound}"
+        return None
+
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "number": (int, float),
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+@dataclass(frozen=True)
+class JsonType(JsonCheck):
+    source: str
+    name: str
+
+    def check(self, value):
+        expected = _JSON_TYPES[self.name]
+        # bool is an int subclass, but true/false are not JSON numbers
+        if isinstance(value, expected) and not (self.name == "number" and isinstance(value, bool)):
+            return []
+        return [JsonError("$", f"is not {'an' if self.name[0] in 'aeiou' else 'a'} {self.name}")]
+
+
+@dataclass(frozen=True)
+class JsonKeys(JsonCheck):
+    source: str
+    keys: Tuple[str, ...]
+
+    def check(self, value):
+        if not isinstance(value, dict):
+            return [JsonError("$", "is not an object")]
+        return [JsonError("$", f"is missing key '{key}'") for key in self.keys if key not in value]
+
+
+@dataclass(frozen=True)
+class JsonSchema(JsonCheck):
+    source: str
+    validator: SchemaValidator
+
+    def check(self, value):
+        return self.validator.validate(value)
+
+
+@dataclass(frozen=True)
+class ConstraintSet:
+    """A test case's compiled constraints."""
+    text_checks: Tuple[TextCheck, ...] = ()
+    json_checks: Tuple[JsonCheck, ...] = ()
+    requires_json: bool = False
+
+    def check_text(self, text: str) -> Optional[str]:
+        """Reason of the first text constraint the output violates, or None."""
+        output = Output(text)
+        for check in self.text_checks:
+            reason = check.check(output)
+            if reason:
+                return reason
+        return None
+
+    def check_json(self, value: Any) -> List[JsonError]:
+        """Violations of the first JSON constraint a parsed output fails (empty if none)."""
+        for check in self.json_checks:
+            errors = check.check(value)
+            if errors:
+                return errors
+        return []
+
+
+def _count(source: str, argument: str) -> int:
+    try:
+        bound = int(argument)
+    except ValueError:
+        raise ConstraintError(f"Invalid constraint {source!r}: expected a whole number")
+    if bound < 0:
+        raise ConstraintError(f"Invalid constraint {source!r}: must not be negative")
+    return bound
+
+
+def _compile_one(source: str) -> Tuple[Optional[TextCheck], Optional[JsonCheck], bool]:
+    """(text check, JSON check, requires JSON) for one constraint."""
+    name, sep, argument = source.partition(":")
+    name, argument = name.strip().lower(), argument.strip()
+    if not sep or not argument:
+        raise ConstraintError(f"Invalid constraint {source!r}: expected <name>:<argument>")
+
+    if name == "exact_match":
+        return Contains(source, argument, argument.lower()), None, False
+    if name == "forbidden":
+        return Forbidden(source, argument, argument.lower()), None, False
+    if name in ("regex", "not_regex"):
+        try:
+            pattern = re.compile(argument)
+        except re.error as e:
+            raise ConstraintError(f"Invalid constraint {source!r}: {e}")
+        return Pattern(source, pattern, must_match=name == "regex"), None, False
+    if name.startswith(("max_", "min_")) and name[4:] in ("words", "chars", "tokens"):
+        return Limit(source, name[4:], _count(source, argument), is_max=name.startswith("max_")), None, False
+    if name == "format":
+        if argument.lower() != "json":
+            raise ConstraintError(f"Invalid constraint {source!r}: only format:json is supported")
+        return None, None, True
+    if name == "json_type":
+        if argument.lower() not in _JSON_TYPES:
+            raise ConstraintError(f"Invalid constraint {source!r}: expected one of {', '.join(_JSON_TYPES)}")
+        return None, JsonType(source, argument.lower()), True
+    if name == "json_keys":
+        keys = tuple(key.strip() for key in argument.split(",") if key.strip())
+        return None, JsonKeys(source, keys), True
+    raise ConstraintError(f"Unknown constraint {source!r}")
+
+
+def compile_constraints(constraints: List[str], criteria: Optional[Dict[str, Any]] = None) -> ConstraintSet:
+    """Compile a constraint list and the JSON criteria of a test (raises ConstraintError)."""
+    text_checks: List[TextCheck] = []
+    json_checks: List[JsonCheck] = []
+    requires_json = bool(criteria) and criteria.get("format") == "json"
+    schema = schema_from_criteria(criteria)
+    if schema is not None:
+        try:
+            json_checks.append(JsonSchema("schema", compile_schema(schema)))
+        except ValueError as e:
+            raise ConstraintError(str(e))
+        requires_json = True
+    for source in constraints:
+        text_check, json_check, needs_json = _compile_one(source)
+        if text_check is not None:
+            text_checks.append(text_check)
+        if json_check is not None:
+            json_checks.append(json_check)
+        requires_json = requires_json or needs_json
+    return ConstraintSet(tuple(text_checks), tuple(json_checks), requires_json)
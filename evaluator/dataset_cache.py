@@ -0,0 +1,169 @@
+"""
+Compiled cache of validated test cases.
+
+Each dataset file's validated TestCases are pickled to one entry under the
+cache directory, keyed by the file's path and stamped with its mtime and size.
+An entry is only used while the stamp still matches, so editing, replacing or
+touching a dataset file re-parses just that file. Entries also record the
+TestCase schema they were built with and are ignored once it changes.
+
+Alongside the entries, a single tag index file records each dataset file's
+test ids and tags under the same stamps, which is all a tag query needs to
+decide which files to load. It also keeps the last TagIndex built over the
+whole suite, reused until any file's stamp changes.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.schemas.test_case import TestCase
+from evaluator.tag_query import TagIndex
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = ".cache/datasets"
+INDEX_FILE = "tag_index.pickle"
+
+# Bump to invalidate every entry when the entry layout changes
+_FORMAT_VERSION = 5
+_SCHEMA_HASH = hashlib.sha256(
+    json.dumps(TestCase.model_json_schema(), sort_keys=True).encode("utf-8")
+).hexdigest()[:16]
+
+
+def default_cache_dir() -> Optional[str]:
+    """DATASET_CACHE_DIR, or the default location; "off" (or empty) disables the cache."""
+    cache_dir = os.getenv("DATASET_CACHE_DIR", DEFAULT_CACHE_DIR)
+    if not cache_dir or cache_dir.lower() == "off":
+        return None
+    return cache_dir
+
+
+class DatasetCache:
+    """
+    Per-file store of validated TestCases, safe to share across threads.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, tuple]] = None  # abspath -> (stamp, [(id, tags)])
+        self._tag_index: Optional[Tuple[tuple, TagIndex]] = None  # (signature, index over the suite)
+        self._index_dirty = False
+
+    def _path(self, file_path: str) -> str:
+        key = hashlib.sha256(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.pickle")
+
+    @staticmethod
+    def stamp(file_path: str) -> tuple:
+        """Identifies the current state of a dataset file (taken before parsing it)."""
+        stat = os.stat(file_path)
+        return (_FORMAT_VERSION, _SCHEMA_HASH, stat.st_mtime_ns, stat.st_size)
+
+    def get(self, file_path: str, stamp: tuple) -> Optional[List[TestCase]]:
+        """Cached cases of a file, or None if missing or stale."""
+        try:
+            with open(self._path(file_path), "rb") as f:
+                # The stamp is pickled ahead of the cases so a stale entry is rejected unread
+                if pickle.load(f) != stamp:
+                    return None
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable dataset cache entry for {file_path}: {e}")
+            return None
+
+    def is_fresh(self, file_path: str, stamp: tuple) -> bool:
+        """Whether a file has an up-to-date entry (without loading its cases)."""
+        try:
+            with open(self._path(file_path), "rb") as f:
+                return pickle.load(f) == stamp
+        except Exception:
+            return False
+
+    def put(self, file_path: str, stamp: tuple, tests: List[TestCase]):
+        """Store a file's cases under the stamp taken before it was parsed."""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(file_path)
+            # Write-then-rename so concurrent loaders never see a partial entry
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(stamp, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(tests, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write dataset cache entry for {file_path}: {e}")
+
+    def _load_index(self) -> Dict[str, tuple]:
+        if self._index is None:
+            try:
+                with open(os.path.join(self.cache_dir, INDEX_FILE), "rb") as f:
+                    index = pickle.load(f)
+                if index.get("version") != (_FORMAT_VERSION, _SCHEMA_HASH):
+                    index = {}
+                self._index = index.get("files", {})
+                self._tag_index = index.get("tag_index")
+            except FileNotFoundError:
+                self._index = {}
+            except Exception as e:
+                logger.warning(f"Rebuilding unreadable dataset tag index: {e}")
+                self._index = {}
+        return self._index
+
+    def get_tags(self, file_path: str, stamp: tuple) -> Optional[List[Tuple[str, Tuple[str, ...]]]]:
+        """(test id, tags) of every test in a file, or None if not indexed at this stamp."""
+        with self._lock:
+            entry = self._load_index().get(os.path.abspath(file_path))
+        if entry is None or entry[0] != stamp:
+            return None
+        return entry[1]
+
+    def put_tags(self, file_path: str, stamp: tuple, tests: List[Tuple[str, Tuple[str, ...]]]):
+        with self._lock:
+            self._load_index()[os.path.abspath(file_path)] = (stamp, tests)
+            self._index_dirty = True
+
+    def get_tag_index(self, signature: tuple) -> Optional[TagIndex]:
+        """
+        The TagIndex stored under a signature, or None.
+
+        Args:
+            signature: The indexed files with their stamps, as ((file path, stamp), ...)
+        """
+        with self._lock:
+            self._load_index()
+            if self._tag_index is None or self._tag_index[0] != signature:
+                return None
+            return self._tag_index[1]
+
+    def put_tag_index(self, signature: tuple, index: TagIndex):
+        with self._lock:
+            self._load_index()
+            self._tag_index = (signature, index)
+            self._index_dirty = True
+
+    def save_index(self):
+        """Write the tag index back if it changed."""
+        with self._lock:
+            if not self._index_dirty:
+                return
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                path = os.path.join(self.cache_dir, INDEX_FILE)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(
+                        {"version": (_FORMAT_VERSION, _SCHEMA_HASH), "files": self._index, "tag_index": self._tag_index},
+                        f, protocol=pickle.HIGHEST_PROTOCOL,
+                    )
+                os.replace(tmp_path, path)
+                self._index_dirty = False
+            except OSError as e:
+                logger.warning(f"Could not write dataset tag index: {e}")
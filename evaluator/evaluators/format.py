@@ -1,38 +1,53 @@
-import json
 import logging
+from typing import Dict, List, Sequence, Tuple
 from evaluator.base import BaseEvaluator, EvaluationResult
+from evaluator.json_validation import ExtractedJson, extract_json
 from app.schemas.test_case import TestCase
 
 logger = logging.getLogger(__name__)
 
+def requires_json(test_case: TestCase) -> bool:
+    """Whether a test's output must be JSON: the json tag, a JSON constraint or a schema in the criteria."""
+    if test_case.tags and "json" in test_case.tags:
+        return True
+    return test_case.compiled_constraints.requires_json
+
 class FormatEvaluator(BaseEvaluator):
     def evaluate(self, test_case: TestCase, output: str) -> EvaluationResult:
-        # Check if JSON format is required
-        requires_json = False
-        if test_case.tags and "json" in test_case.tags:
-            requires_json = True
-        
-        # Also check constraints
-        if any("format:json" in c.lower() for c in test_case.constraints):
-            requires_json = True
-            
-        if not requires_json:
+        if not requires_json(test_case):
             return EvaluationResult(score=1.0, passed=True, reason="No format constraints")
+        return self._check(test_case, extract_json(output))
+
+    def evaluate_batch(self, pairs: Sequence[Tuple[TestCase, str]]) -> List[EvaluationResult]:
+        # Identical outputs (e.g. the same answer from several models or runs) are parsed once
+        extracted: Dict[str, ExtractedJson] = {}
+        results = []
+        for test_case, output in pairs:
+            if not requires_json(test_case):
+                results.append(EvaluationResult(score=1.0, passed=True, reason="No format constraints"))
+                continue
+            if output not in extracted:
+                extracted[output] = extract_json(output)
+            results.append(self._check(test_case, extracted[output]))
+        return results
 
-        try:
-            # Attempt to find JSON blob if it's wrapped in markdown
-            cleaned_output = output
-            if "```json" in output:
-                cleaned_output = output.split("```json")[1].split("```")[0]
-            elif "```" in output:
-                 cleaned_output = output.split("```")[1].split("```")[0]
-            
-            json.loads(cleaned_output.strip())
-            return EvaluationResult(score=1.0, passed=True, reason="Valid JSON")
-        except json.JSONDecodeError as e:
+    @staticmethod
+    def _check(test_case: TestCase, extracted: ExtractedJson) -> EvaluationResult:
+        if not extracted.ok:
+            return EvaluationResult(
+                score=0.0,
+                passed=False,
+                reason=extracted.errors[0].message,
+                failure_type="FORMAT_FAIL",
+                errors=extracted.errors
+            )
+        errors = test_case.compiled_constraints.check_json(extracted.value)
+        if errors:
             return EvaluationResult(
-                score=0.0, 
-                passed=False, 
-                reason=f"Invalid JSON: {str(e)}", 
-                failure_type="FORMAT_FAIL"
+                score=0.0,
+                passed=False,
+                reason="JSON does not match the expected shape: " + "; ".join(str(e) for e in errors),
+                failure_type="FORMAT_FAIL",
+                errors=errors
             )
+        return EvaluationResult(score=1.0, passed=True, reason="Valid JSON")
@@ -1,10 +1,14 @@
+import contextvars
+import dataclasses
 import json
 import logging
-from typing import Optional
-from evaluator.base import BaseEvaluator, EvaluationResult
+from typing import Dict, List, Sequence, Tuple
+from evaluator.base import COST_MODEL_CALL, BaseEvaluator, EvaluationResult, Judgment, get_judge_pool, on_judge_pool
 from app.schemas.test_case import TestCase
 from evaluator.judges.prompts import get_judge_prompt
 from evaluator.llm.groq_client import GroqAdapter
+from evaluator.llm.rate_limiter import generate_rate_limited
+from evaluator.llm.usage import track_usage
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +17,8 @@ class LLMJudgeEvaluator(BaseEvaluator):
     Uses an LLM to judge test outputs for semantic qualities.
     Evaluates: grounding, hallucination, and overall quality.
     """
+
+    cost = COST_MODEL_CALL
     
     def __init__(self, judge_model: str = "llama-3.3-70b-versatile", evaluation_type: str = "grounding"):
         """
@@ -34,17 +40,56 @@ class LLMJudgeEvaluator(BaseEvaluator):
         Returns:
             EvaluationResult with judge score and reasoning
         """
-        # Get judge prompt
-        judge_prompt = get_judge_prompt(
+        return self._judge(self._build_prompt(test_case, output))
+
+    def evaluate_batch(self, pairs: Sequence[Tuple[TestCase, str]]) -> List[EvaluationResult]:
+        """
+        Judge a batch of outputs concurrently on the process-wide judge pool
+        (JUDGE_MAX_CONCURRENCY calls at once, across every batch and run).
+
+        Pairs that produce the same judge prompt are judged once; each call's
+        usage is attached to the first result it produced.
+        """
+        prompts = [self._build_prompt(test_case, output) for test_case, output in pairs]
+        unique = list(dict.fromkeys(prompts))
+        if len(unique) <= 1 or on_judge_pool():
+            # A single call, or a batch already on the judge pool (which must not wait on itself), runs here
+            judged: Dict[str, EvaluationResult] = {prompt: self._judge_tracked(prompt) for prompt in unique}
+        else:
+            # Each call runs in a copy of the caller's context so its usage is tracked separately
+            pool = get_judge_pool()
+            futures = [pool.submit(contextvars.copy_context().run, self._judge_tracked, prompt) for prompt in unique]
+            judged = {prompt: future.result() for prompt, future in zip(unique, futures)}
+
+        results = []
+        seen = set()
+        for prompt in prompts:
+            result = judged[prompt]
+            if prompt in seen:
+                result = dataclasses.replace(result, usage=None)
+            seen.add(prompt)
+            results.append(result)
+        return results
+
+    def _build_prompt(self, test_case: TestCase, output: str) -> str:
+        return get_judge_prompt(
             evaluation_type=self.evaluation_type,
             prompt=test_case.prompt,
             output=output,
             expected_behavior=test_case.expected_behavior or ""
         )
-        
+
+    def _judge_tracked(self, judge_prompt: str) -> EvaluationResult:
+        with track_usage() as usage:
+            result = self._judge(judge_prompt)
+        if usage.records:
+            result.usage = usage
+        return result
+
+    def _judge(self, judge_prompt: str) -> EvaluationResult:
         try:
-            # Call judge API
-            judge_response = self.judge.generate(prompt=judge_prompt)
+            # Call judge API, paced by the provider's shared limiter (which generation also uses) and retried on 429
+            judge_response = generate_rate_limited(self.judge, prompt=judge_prompt)
             
             # Parse JSON response
             judgment = self._parse_judgment(judge_response)
@@ -65,7 +110,8 @@ class LLMJudgeEvaluator(BaseEvaluator):
                 score=score / 10.0,  # Normalize to 0-1
                 passed=passed,
                 reason=reason_text,
-                failure_type="JUDGE_QUALITY_FAIL" if not passed else None
+                failure_type="JUDGE_QUALITY_FAIL" if not passed else None,
+                judgment=Judgment(score=score, reasoning=reasoning, issues=list(issues))
             )
             
         except Exception as e:
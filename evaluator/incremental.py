@@ -0,0 +1,101 @@
+"""
+Incremental runs: reuse a baseline run's results for unchanged test cases.
+
+A result is copied forward into the new run, instead of re-executing its
+test, when the baseline ran the same model with the same generation params
+and the test's fingerprint (prompt, context, tags, expected behavior,
+constraints, criteria, should_refuse) matches the one stored with the
+result. Provider errors are never copied, so transient failures get another
+try.
+"""
+import logging
+from typing import Dict, List, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.schemas.run import RunCreate
+from app.schemas.test_case import TestCase
+from db.models import Run, TestResult
+from evaluator.persistence import load_run_params
+
+logger = logging.getLogger(__name__)
+
+# Parameters that change what a model generates for the same prompt
+GENERATION_PARAMS = ("provider", "model_name", "temperature")
+
+# Parameters that change how the same output is evaluated
+EVALUATION_PARAMS = ("judge",)
+
+# Copied results are written in batches of this many rows
+COPY_BATCH_SIZE = 500
+
+
+class Baseline:
+    """
+    Results of a baseline run that an incremental run may copy forward.
+
+    Pass `reuse` to PendingTests: it queues the copy of a test's baseline result
+    and reports whether the test can be skipped. Call `flush` once the run ends.
+    """
+
+    def __init__(self, db: Session, run_id: str, run_params: RunCreate):
+        """
+        Raises:
+            ValueError: If the baseline run doesn't exist
+        """
+        self.db = db
+        self.run_id = run_id
+        self.baseline_run_id = run_params.baseline_run_id
+        baseline = db.query(Run).filter(Run.id == self.baseline_run_id).first()
+        if baseline is None:
+            raise ValueError(f"Baseline run {self.baseline_run_id} not found")
+
+        baseline_params = load_run_params(baseline).model_copy(
+            update={"provider": baseline.provider, "model_name": baseline.model_name}
+        )
+        self.changed_params = [
+            name for name in GENERATION_PARAMS + EVALUATION_PARAMS
+            if getattr(baseline_params, name) != getattr(run_params, name)
+        ]
+        self._results: Dict[str, Tuple[str, str]] = {}  # test id -> (fingerprint, result id)
+        if not self.changed_params:
+            rows = db.query(TestResult.test_id, TestResult.fingerprint, TestResult.id).filter(
+                TestResult.run_id == self.baseline_run_id,
+                TestResult.fingerprint.isnot(None),
+                ~TestResult.output_text.startswith("Error:"),
+            ).all()
+            self._results = {test_id: (fingerprint, result_id) for test_id, fingerprint, result_id in rows}
+        self._queued: List[str] = []
+        self.copied = 0
+
+    def reuse(self, test: TestCase) -> bool:
+        """Queue the baseline result of an unchanged test; False if the test must run."""
+        entry = self._results.get(test.id)
+        if entry is None or entry[0] != test.fingerprint:
+            return False
+        self._queued.append(entry[1])
+        if len(self._queued) >= COPY_BATCH_SIZE:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Write the queued copies into the incremental run."""
+        if not self._queued:
+            return
+        columns = [
+            column.name for column in TestResult.__table__.columns
+            if column.name not in ("id", "run_id", "copied_from_run_id")
+        ]
+        results = self.db.query(TestResult).filter(TestResult.id.in_(self._queued)).all()
+        self.db.add_all(
+            TestResult(
+                run_id=self.run_id,
+                # A result copied again still points at the run that produced it
+                copied_from_run_id=result.copied_from_run_id or self.baseline_run_id,
+                **{name: getattr(result, name) for name in columns},
+            )
+            for result in results
+        )
+        self.db.commit()
+        self.copied += len(results)
+        self._queued = []
@@ -0,0 +1,255 @@
+"""
+Incremental JSON validation of streamed outputs.
+
+JsonStreamValidator reads a generation chunk by chunk and reports a format
+failure as soon as the text received so far can no longer become valid JSON
+under extract_json's rules, so the runner can stop a malformed completion
+instead of paying for the rest of it (see Runner's abort_invalid_json).
+
+Only the content of an output's first ```json fence is followed, since
+extract_json judges that block alone whatever surrounds it. Anything before
+it, including text starting with "{" or "[" (which may be prose such as
+"[Note]", or be followed by a fence or embedded JSON), is never failed early:
+bare JSON is left to FormatEvaluator once the output is complete. The
+validator never fails an output that extract_json accepts.
+
+When the fenced value is complete it is also checked against the test's
+JSON constraints and schema, so a wrong shape fails before the closing fence.
+"""
+import json
+import re
+from typing import List, Optional
+
+from evaluator.constraints import ConstraintSet
+from evaluator.json_validation import loads
+
+_WS = " \t\n\r"  # Whitespace allowed between JSON tokens
+_HEX = set("0123456789abcdefABCDEF")
+_NUMBER_CHARS = set("0123456789+-.eE")
+_NUMBER_RE = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?")
+_LITERALS = ("true", "false", "null", "NaN", "Infinity", "-Infinity")  # Accepted by the standard library too
+_STRING_RUN_RE = re.compile(r'[^"\\\x00-\x1f]+')
+_FENCE = "```"
+_JSON_FENCE = _FENCE + "json"
+
+# What the parser expects next
+_VALUE, _VALUE_OR_CLOSE, _KEY, _KEY_OR_CLOSE, _COLON, _COMMA_OR_CLOSE = range(6)
+
+
+class JsonStreamValidator:
+    """
+    Pushdown JSON syntax checker fed one streamed chunk at a time.
+
+    One validator follows one generation; `feed` returns the failure reason
+    once the output can no longer be valid (and keeps returning it).
+    """
+
+    def __init__(self, constraints: Optional[ConstraintSet] = None):
+        """
+        Args:
+            constraints: JSON constraints checked once the document is complete (syntax only if None)
+        """
+        self.constraints = constraints
+        self.error: Optional[str] = None
+        self._mode = "seeking"  # seeking (the fence) / fenced / closing (the fence) / finished
+        self._pending = ""  # Text held back while a fence may straddle chunks
+        self._seen = 0  # Characters received
+        self._stack: List[str] = []
+        self._started = False  # Whether the document's top-level value has begun
+        self._expect = _VALUE
+        self._token: Optional[str] = None  # string / key / number / literal
+        self._token_text = ""
+        self._escape: Optional[int] = None  # 0 after a backslash, else \uXXXX hex digits left
+        self._doc: List[str] = []  # Document text received, for the constraint check
+        self._doc_end = 0  # Document length up to the current chunk
+        self._closing = 0  # Backticks of the closing fence received
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """Consume the next chunk; the failure reason once the output can no longer be valid, else None."""
+        self._seen += len(chunk)
+        if self.error is None and self._mode != "finished":
+            self._consume(chunk)
+        return self.error
+
+    def _fail(self, message: str):
+        self.error = f"Invalid JSON after {self._seen} characters of output: {message}"
+        self._mode = "finished"
+
+    def _consume(self, text: str):
+        if self._mode == "seeking":
+            text = self._pending + text
+            start = text.find(_JSON_FENCE)
+            if start < 0:
+                self._pending = text[-(len(_JSON_FENCE) - 1):]
+                return
+            self._pending = ""
+            self._mode, text = "fenced", text[start + len(_JSON_FENCE):]
+        self._parse(text)
+
+    def _parse(self, text: str):
+        self._doc.append(text)
+        i, n = 0, len(text)
+        while i < n and self._mode == "fenced":
+            if self._token in ("string", "key"):
+                i = self._string(text, i)
+                continue
+            if self._token is not None:
+                i = self._scalar(text, i)
+                continue
+            ch = text[i]
+            if ch in _WS or (not self._started and ch.isspace()):
+                # The fence content is stripped before parsing, so any leading whitespace is fine
+                i += 1
+                continue
+            self._started = True
+            i += 1
+            expect = self._expect
+            if expect in (_VALUE, _VALUE_OR_CLOSE):
+                if ch == "]" and expect == _VALUE_OR_CLOSE:
+                    self._close(text, i)
+                elif ch == "{":
+                    self._stack.append("}")
+                    self._expect = _KEY_OR_CLOSE
+                elif ch == "[":
+                    self._stack.append("]")
+                    self._expect = _VALUE_OR_CLOSE
+                elif ch == '"':
+                    self._token = "string"
+                elif ch == "-" or ch.isdigit():
+                    self._token, self._token_text = "number", ch
+                elif ch in "tfnNI":
+                    self._token, self._token_text = "literal", ch
+                else:
+                    self._fail(f"Expecting value, got {ch!r}")
+            elif expect in (_KEY, _KEY_OR_CLOSE):
+                if ch == "}" and expect == _KEY_OR_CLOSE:
+                    self._close(text, i)
+                elif ch == '"':
+                    self._token = "key"
+                else:
+                    self._fail(f"Expecting property name enclosed in double quotes, got {ch!r}")
+            elif expect == _COLON:
+                if ch == ":":
+                    self._expect = _VALUE
+                else:
+                    self._fail(f"Expecting ':' delimiter, got {ch!r}")
+            elif ch == ",":
+                self._expect = _KEY if self._stack[-1] == "}" else _VALUE
+            elif ch == self._stack[-1]:
+                self._close(text, i)
+            else:
+                self._fail(f"Expecting ',' delimiter, got {ch!r}")
+        if self._mode == "closing":
+            self._closing_fence(text, i)
+        self._doc_end += n
+
+    def _string(self, text: str, i: int) -> int:
+        n = len(text)
+        while i < n:
+            if self._escape is not None:
+                ch = text[i]
+                if self._escape == 0:
+                    if ch == "u":
+                        self._escape = 4
+                    elif ch in '"\\/bfnrt':
+                        self._escape = None
+                    else:
+                        self._fail(f"Invalid \\escape: {ch!r}")
+                        return n
+                elif ch in _HEX:
+                    self._escape = self._escape - 1 or None
+                else:
+                    self._fail("Invalid \\uXXXX escape")
+                    return n
+                i += 1
+                continue
+            run = _STRING_RUN_RE.match(text, i)
+            if run:
+                i = run.end()
+                continue
+            ch = text[i]
+            i += 1
+            if ch == "\\":
+                self._escape = 0
+            elif ch == '"':
+                if self._token == "key":
+                    self._token, self._expect = None, _COLON
+                else:
+                    self._token = None
+                    self._value_done(text, i)
+                return i
+            else:
+                self._fail("Invalid control character in string")
+                return n
+        return i
+
+    def _scalar(self, text: str, i: int) -> int:
+        """Continue a number or literal; it ends at the first character that can't extend it."""
+        n = len(text)
+        while i < n:
+            ch = text[i]
+            if self._token == "number":
+                if ch in _NUMBER_CHARS:
+                    self._token_text += ch
+                    i += 1
+                    continue
+                if self._token_text == "-" and ch == "I":
+                    self._token = "literal"
+                else:
+                    if not _NUMBER_RE.fullmatch(self._token_text):
+                        self._fail(f"Invalid number {self._token_text!r}")
+                        return n
+                    self._token = None
+                    self._value_done(text, i)
+                    return i
+            if ch.isalpha():
+                self._token_text += ch
+                if not any(literal.startswith(self._token_text) for literal in _LITERALS):
+                    self._fail(f"Expecting value, got {self._token_text!r}")
+                    return n
+                i += 1
+                continue
+            if self._token_text not in _LITERALS:
+                self._fail(f"Expecting value, got {self._token_text!r}")
+                return n
+            self._token = None
+            self._value_done(text, i)
+            return i
+        return i
+
+    def _close(self, text: str, end: int):
+        self._stack.pop()
+        self._value_done(text, end)
+
+    def _value_done(self, text: str, end: int):
+        """A value ended just before text[end]; at the top level the document is complete."""
+        if self._stack:
+            self._expect = _COMMA_OR_CLOSE
+            return
+        doc = "".join(self._doc)[:self._doc_end + end]
+        self._mode = "closing"
+        self._check_value(doc)
+
+    def _check_value(self, doc: str):
+        if self.constraints is None or not self.constraints.json_checks:
+            return
+        try:
+            value = loads(doc.strip())
+        except json.JSONDecodeError:
+            return  # Left to FormatEvaluator, which parses the complete output
+        errors = self.constraints.check_json(value)
+        if errors:
+            self.error = "JSON does not match the expected shape: " + "; ".join(str(e) for e in errors)
+            self._mode = "finished"
+
+    def _closing_fence(self, text: str, i: int):
+        """After a fenced value only whitespace may come before the closing fence."""
+        for ch in text[i:]:
+            if ch == "`":
+                self._closing += 1
+                if self._closing == len(_FENCE):
+                    self._mode = "finished"
+                    return
+            elif self._closing or not ch.isspace():
+                self._fail(f"Extra data after the JSON value: {ch!r}")
+                return
@@ -0,0 +1,173 @@
+"""
+JSON extraction and JSON Schema validation for format tests.
+
+Outputs are parsed with orjson when it is installed, falling back to the
+standard library (which also produces the error message when parsing fails).
+`extract_json` finds the JSON of an output without copying it around: the
+first ```json fenced block, else the first fenced block, else the whole
+output, else the first object or array embedded in prose.
+
+A test case carries a JSON Schema in its evaluation criteria:
+
+    evaluation_criteria:
+      format: json
+      schema: {type: object, required: [name, age], properties: {age: {type: integer}}}
+
+(`required_keys: [name, age]` is shorthand for an object schema requiring
+those keys.) Validators are compiled once per distinct schema and shared by
+every test case using it. Failures are returned as JsonErrors carrying the
+JSONPath of the offending value.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from jsonschema import SchemaError
+from jsonschema.validators import validator_for
+
+try:
+    import orjson
+except ImportError:  # Optional speedup
+    orjson = None
+
+# Schema errors reported per output (the first ones by path)
+MAX_SCHEMA_ERRORS = 5
+
+# Embedded candidates ("{" or "[" in prose) tried before giving up
+MAX_EMBEDDED_CANDIDATES = 16
+
+_FENCE = "```"
+_INFO_STRING_RE = re.compile(r"[ \t]*[\w+.-]*[ \t]*\r?")
+_OPENING_RE = re.compile(r"[\[{]")
+_decoder = json.JSONDecoder()
+
+
+@dataclass(frozen=True)
+class JsonError:
+    path: str  # JSONPath of the offending value ("$" is the whole document)
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}: {self.message}"
+
+
+@dataclass
+class ExtractedJson:
+    value: Any = None
+    errors: List[JsonError] = field(default_factory=list)  # Empty if the output held valid JSON
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def loads(text: str) -> Any:
+    """Parse JSON text (raises json.JSONDecodeError)."""
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass  # Re-parsed below for the standard library's error message and leniency (NaN)
+    return json.loads(text)
+
+
+def _decode_error(e: json.JSONDecodeError) -> JsonError:
+    return JsonError("$", f"Invalid JSON: {e.msg}: line {e.lineno} column {e.colno} (char {e.pos})")
+
+
+def extract_json(output: str) -> ExtractedJson:
+    """The JSON value an output holds, fenced, bare or embedded in prose."""
+    start = output.find(_FENCE + "json")
+    if start >= 0:
+        start += len(_FENCE) + 4
+    else:
+        start = output.find(_FENCE)
+        if start >= 0:
+            # Skip the info string of the fence (e.g. ```JSON or ```javascript)
+            start += len(_FENCE)
+            newline = output.find("\n", start)
+            if newline >= 0 and _INFO_STRING_RE.fullmatch(output, start, newline):
+                start = newline + 1
+    if start >= 0:
+        end = output.find(_FENCE, start)
+        try:
+            return ExtractedJson(value=loads(output[start:end if end >= 0 else len(output)].strip()))
+        except json.JSONDecodeError as e:
+            return ExtractedJson(errors=[_decode_error(e)])
+
+    try:
+        return ExtractedJson(value=loads(output.strip()))
+    except json.JSONDecodeError as e:
+        error = e
+    for i, match in enumerate(_OPENING_RE.finditer(output)):
+        if i == MAX_EMBEDDED_CANDIDATES:
+            break
+        try:
+            value, _ = _decoder.raw_decode(output, match.start())
+            return ExtractedJson(value=value)
+        except json.JSONDecodeError:
+            continue
+    return ExtractedJson(errors=[_decode_error(error)])
+
+
+def json_path(parts) -> str:
+    """JSONPath of a jsonschema error path (e.g. $.items[0].name)."""
+    path = "$"
+    for part in parts:
+        path += f"[{part}]" if isinstance(part, int) else f".{part}"
+    return path
+
+
+class SchemaValidator:
+    """
+    A compiled JSON Schema. Pickles as its schema and is rebuilt through the
+    cache when loaded, so cached test cases share validators too.
+    """
+
+    def __init__(self, schema: Dict[str, Any]):
+        """
+        Raises:
+            ValueError: If the schema is not a valid JSON Schema
+        """
+        if not isinstance(schema, (dict, bool)):
+            raise ValueError("Invalid JSON Schema: must be an object")
+        cls = validator_for(schema)
+        try:
+            cls.check_schema(schema)
+        except SchemaError as e:
+            raise ValueError(f"Invalid JSON Schema: {e.message}")
+        self.schema = schema
+        self._validator = cls(schema)
+
+    def __reduce__(self):
+        return (compile_schema, (self.schema,))
+
+    def validate(self, value: Any) -> List[JsonError]:
+        """Up to MAX_SCHEMA_ERRORS violations, ordered by path (empty if valid)."""
+        errors = sorted(self._validator.iter_errors(value), key=lambda e: [str(p) for p in e.absolute_path])
+        return [JsonError(json_path(e.absolute_path), e.message) for e in errors[:MAX_SCHEMA_ERRORS]]
+
+
+_validators: Dict[str, SchemaValidator] = {}
+
+
+def compile_schema(schema: Dict[str, Any]) -> SchemaValidator:
+    """The validator of a schema, compiled on first use (raises ValueError for an invalid schema)."""
+    key = json.dumps(schema, sort_keys=True, default=str)
+    validator = _validators.get(key)
+    if validator is None:
+        # setdefault keeps one validator per schema if two threads compile it at once
+        validator = _validators.setdefault(key, SchemaValidator(schema))
+    return validator
+
+
+def schema_from_criteria(criteria: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """JSON Schema declared by evaluation criteria, if any."""
+    if not criteria:
+        return None
+    if "schema" in criteria:
+        return criteria["schema"]
+    if criteria.get("required_keys"):
+        return {"type": "object", "required": list(criteria["required_keys"])}
+    return None
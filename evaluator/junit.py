@@ -0,0 +1,84 @@
+"""
+Incremental JUnit XML report.
+
+The report is rewritten after every test so that a CI job killed by a timeout
+still leaves a valid file with every result collected so far.
+"""
+import os
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from typing import List, Optional
+
+from app.schemas.test_case import TestCase
+
+
+@dataclass
+class _Case:
+    test: TestCase
+    time_s: float
+    failure: Optional[str] = None
+    error: Optional[str] = None
+    skipped: Optional[str] = None
+    output: Optional[str] = None
+
+
+class JUnitReport:
+    """
+    Accumulates test outcomes and keeps a JUnit XML file up to date.
+    """
+
+    def __init__(self, path: str, suite_name: str = "llm-reliability"):
+        self.path = path
+        self.suite_name = suite_name
+        self._cases: List[_Case] = []
+
+    def add_result(self, test: TestCase, passed: bool, latency_ms: float, reasons: List[str], output: str):
+        self._cases.append(_Case(
+            test=test,
+            time_s=latency_ms / 1000,
+            failure=None if passed else "; ".join(reasons) or "Failed",
+            output=output
+        ))
+        self.write()
+
+    def add_error(self, test: TestCase, message: str):
+        self._cases.append(_Case(test=test, time_s=0.0, error=message))
+        self.write()
+
+    def add_skipped(self, test: TestCase, message: str):
+        self._cases.append(_Case(test=test, time_s=0.0, skipped=message))
+        self.write()
+
+    def _build(self) -> ET.ElementTree:
+        suite = ET.Element("testsuite", {
+            "name": self.suite_name,
+            "tests": str(len(self._cases)),
+            "failures": str(sum(1 for c in self._cases if c.failure is not None)),
+            "errors": str(sum(1 for c in self._cases if c.error is not None)),
+            "skipped": str(sum(1 for c in self._cases if c.skipped is not None)),
+            "time": f"{sum(c.time_s for c in self._cases):.3f}",
+        })
+        for case in self._cases:
+            element = ET.SubElement(suite, "testcase", {
+                "classname": self.suite_name,
+                "name": f"{case.test.id}: {case.test.name}",
+                "time": f"{case.time_s:.3f}",
+            })
+            if case.failure is not None:
+                ET.SubElement(element, "failure", {"message": case.failure}).text = case.failure
+            if case.error is not None:
+                ET.SubElement(element, "error", {"message": case.error}).text = case.error
+            if case.skipped is not None:
+                ET.SubElement(element, "skipped", {"message": case.skipped})
+            if case.output:
+                ET.SubElement(element, "system-out").text = case.output
+        return ET.ElementTree(suite)
+
+    def write(self):
+        """Atomically replace the report file with the current results."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        self._build().write(tmp_path, encoding="utf-8", xml_declaration=True)
+        os.replace(tmp_path, self.path)
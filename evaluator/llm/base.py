@@ -1,7 +1,51 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Any, Optional
+from metrics.latency import GenerationMetrics, GenerationTimer
+
+class RateLimitError(Exception):
+    """Raised by adapters when the provider rejects a call with 429 / quota exhaustion."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds. HTTP-date values are ignored."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+@dataclass
+class StreamChunk:
+    """A piece of streamed output."""
+    text: str = ""
+    # Provider-reported completion token count, usually only on the final chunk
+    completion_tokens: Optional[int] = None
+    # The text is an adapter error message ("Error: ...") ending a failed stream, possibly after partial output
+    error: bool = False
+
+@dataclass
+class Generation:
+    """A completed generation with its timing metrics."""
+    text: str
+    metrics: GenerationMetrics
+    # Why the stream was stopped before the model finished (the text is partial), if it was
+    stopped: Optional[str] = None
+
+def estimate_output_tokens(text: str) -> int:
+    """Fallback token count (~4 characters per token) when the provider reports none."""
+    return (len(text) + 3) // 4
 
 class ModelAdapter(ABC):
+    # Provider key used for per-provider scheduling (concurrency, rate limits)
+    provider: str = "unknown"
+
     @abstractmethod
     def generate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
         """
@@ -14,5 +58,61 @@ class ModelAdapter(ABC):
             
         Returns:
             The generated text response.
+
+        Raises:
+            RateLimitError: If the provider rejected the call for exceeding its quota.
         """
         pass
+
+    async def agenerate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Async variant of `generate`.
+
+        The default runs the blocking call in a worker thread; adapters with a
+        native async client override it so no thread is parked per request.
+        """
+        return await asyncio.to_thread(self.generate, prompt, context, params)
+
+    async def astream(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[StreamChunk]:
+        """
+        Stream the generation as chunks.
+
+        The default yields the whole `agenerate` result as a single chunk;
+        adapters with streaming APIs override it.
+        """
+        text = await self.agenerate(prompt, context, params)
+        yield StreamChunk(text=text, error=text.startswith("Error:"))
+
+    async def agenerate_streamed(
+        self,
+        prompt: str,
+        context: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        on_chunk: Optional[Callable[[str], Optional[str]]] = None
+    ) -> Generation:
+        """
+        Consume `astream` and measure time-to-first-token, total time and throughput.
+
+        Args:
+            on_chunk: Called with each piece of text; returning a reason stops the
+                stream there (closing it cancels the request, and the partial output
+                is neither cached nor complete)
+        """
+        timer = GenerationTimer()
+        parts = []
+        reported_tokens = None
+        stopped = None
+        async with aclosing(self.astream(prompt, context, params)) as stream:
+            async for chunk in stream:
+                if chunk.text:
+                    timer.mark_chunk()
+                    parts.append(chunk.text)
+                    if on_chunk is not None:
+                        stopped = on_chunk(chunk.text)
+                        if stopped:
+                            break
+                if chunk.completion_tokens is not None:
+                    reported_tokens = chunk.completion_tokens
+        text = "".join(parts)
+        output_tokens = reported_tokens if reported_tokens is not None else estimate_output_tokens(text)
+        return Generation(text=text, metrics=timer.finish(output_tokens), stopped=stopped)
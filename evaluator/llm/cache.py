@@ -0,0 +1,233 @@
+"""
+Content-addressed response cache for model adapters.
+
+Responses are stored as one JSON file per key under a cache directory, with a
+total size limit enforced by least-recently-used eviction.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .base import ModelAdapter, StreamChunk
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = ".cache/responses"
+DEFAULT_MAX_MB = 512
+
+# off: never read or write
+# deterministic: always write, only serve hits for temperature == 0
+# force: always write, always serve hits
+CACHE_MODES = ("off", "deterministic", "force")
+
+
+@dataclass
+class CacheEntry:
+    output: str
+    latency_ms: Optional[float] = None
+
+
+class ResponseCache:
+    """
+    Disk-backed LRU store of generated outputs, safe to share across threads.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # key -> size, oldest first
+        self._total_bytes = 0
+        self._load_index()
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]]) -> str:
+        """Hash everything that determines a generation."""
+        payload = json.dumps(
+            {"provider": provider, "model": model, "prompt": prompt, "context": context, "params": params or {}},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_index(self):
+        """Rebuild the LRU order from file modification times (touched on every hit)."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for file in files:
+                if not file.endswith(".json"):
+                    continue
+                stat = os.stat(os.path.join(root, file))
+                entries.append((stat.st_mtime, file[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            if key not in self._index:
+                return None
+            self._index.move_to_end(key)
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+            self._discard(key)
+            return None
+        return CacheEntry(output=data["output"], latency_ms=data.get("latency_ms"))
+
+    def put(self, key: str, entry: CacheEntry):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({"output": entry.output, "latency_ms": entry.latency_ms, "created": time.time()})
+        # Write-then-rename so concurrent readers never see a partial file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        size = os.path.getsize(path)
+        with self._lock:
+            self._total_bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+            evicted = []
+            while self._total_bytes > self.max_bytes and len(self._index) > 1:
+                old_key, old_size = self._index.popitem(last=False)
+                self._total_bytes -= old_size
+                evicted.append(old_key)
+        for old_key in evicted:
+            self._remove_file(old_key)
+
+    def _discard(self, key: str):
+        with self._lock:
+            self._total_bytes -= self._index.pop(key, 0)
+        self._remove_file(key)
+
+    def _remove_file(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache configured from RESPONSE_CACHE_DIR / RESPONSE_CACHE_MAX_MB."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(
+                cache_dir=os.getenv("RESPONSE_CACHE_DIR", DEFAULT_CACHE_DIR),
+                max_bytes=int(float(os.getenv("RESPONSE_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024),
+            )
+        return _shared_cache
+
+
+class CachedAdapter(ModelAdapter):
+    """
+    Wraps any ModelAdapter and serves repeated generations from the response cache.
+    """
+
+    def __init__(self, adapter: ModelAdapter, mode: str = "deterministic", cache: Optional[ResponseCache] = None):
+        """
+        Args:
+            adapter: Adapter that performs real generations
+            mode: One of CACHE_MODES
+            cache: Cache to use (defaults to the process-wide cache)
+        """
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{mode}', expected one of {CACHE_MODES}")
+        self.adapter = adapter
+        self.provider = adapter.provider
+        self.model_name = getattr(adapter, "model_name", adapter.__class__.__name__)
+        self.mode = mode
+        self.cache = cache or get_response_cache()
+
+    def _key(self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]]) -> str:
+        return ResponseCache.make_key(self.provider, self.model_name, prompt, context, params)
+
+    def _serves_hits(self, params: Optional[Dict[str, Any]]) -> bool:
+        if self.mode == "force":
+            return True
+        if self.mode == "deterministic":
+            return bool(params) and params.get("temperature") == 0
+        return False
+
+    def lookup(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> Optional[CacheEntry]:
+        """Return a cached response if this mode may serve one, without calling the provider."""
+        if not self._serves_hits(params):
+            return None
+        return self.cache.get(self._key(prompt, context, params))
+
+    def store(self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]], output: str, latency_ms: Optional[float] = None):
+        """Record a generation. Error strings returned by adapters are never cached."""
+        if self.mode == "off" or output.startswith("Error:"):
+            return
+        self.cache.put(self._key(prompt, context, params), CacheEntry(output=output, latency_ms=latency_ms))
+
+    # Async callers go through these so cache file reads and writes never block the event loop
+
+    async def alookup(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> Optional[CacheEntry]:
+        """`lookup` on a worker thread."""
+        if not self._serves_hits(params):
+            return None
+        return await asyncio.to_thread(self.lookup, prompt, context, params)
+
+    async def astore(self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]], output: str, latency_ms: Optional[float] = None):
+        """`store` on a worker thread."""
+        if self.mode == "off" or output.startswith("Error:"):
+            return
+        await asyncio.to_thread(self.store, prompt, context, params, output, latency_ms)
+
+    def generate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
+        hit = self.lookup(prompt, context, params)
+        if hit is not None:
+            return hit.output
+
+        start_time = time.time()
+        output = self.adapter.generate(prompt=prompt, context=context, params=params)
+        self.store(prompt, context, params, output, latency_ms=(time.time() - start_time) * 1000)
+        return output
+
+    async def agenerate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
+        hit = await self.alookup(prompt, context, params)
+        if hit is not None:
+            return hit.output
+
+        start_time = time.time()
+        output = await self.adapter.agenerate(prompt=prompt, context=context, params=params)
+        await self.astore(prompt, context, params, output, latency_ms=(time.time() - start_time) * 1000)
+        return output
+
+    async def astream(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[StreamChunk]:
+        hit = await self.alookup(prompt, context, params)
+        if hit is not None:
+            yield StreamChunk(text=hit.output)
+            return
+
+        start_time = time.time()
+        parts = []
+        failed = False
+        async for chunk in self.adapter.astream(prompt=prompt, context=context, params=params):
+            parts.append(chunk.text)
+            failed = failed or chunk.error
+            yield chunk
+        # Only reached when the stream was fully consumed, so outputs cut short by the consumer are never cached,
+        # nor are streams that failed partway (their text is partial output followed by the error)
+        if not failed:
+            await self.astore(prompt, context, params, "".join(parts), latency_ms=(time.time() - start_time) * 1000)
@@ -0,0 +1,41 @@
+"""
+Adapter construction by provider name (MODEL_PROVIDER).
+"""
+from typing import Optional
+
+from .base import ModelAdapter
+
+PROVIDERS = ("groq", "google", "ollama", "mock")
+
+# Model used when a run doesn't name one
+DEFAULT_MODELS = {
+    "groq": "llama-3.3-70b-versatile",
+    "google": "gemini-flash-latest",
+    "ollama": "llama3",
+    "mock": "mock",
+}
+
+
+def create_adapter(provider: str, model_name: Optional[str] = None) -> ModelAdapter:
+    """
+    Build the adapter for a provider.
+
+    Args:
+        provider: One of PROVIDERS
+        model_name: Model to use (the adapter's default if None)
+    """
+    kwargs = {"model_name": model_name} if model_name else {}
+    # Imported lazily so a provider's SDK is only required when it is used
+    if provider == "groq":
+        from .groq_client import GroqAdapter
+        return GroqAdapter(**kwargs)
+    if provider == "google":
+        from .gemini_client import GeminiAdapter
+        return GeminiAdapter(**kwargs)
+    if provider == "ollama":
+        from .ollama_client import OllamaAdapter
+        return OllamaAdapter(**kwargs)
+    if provider == "mock":
+        from .mock import MockAdapter
+        return MockAdapter(**kwargs)
+    raise ValueError(f"Unknown provider '{provider}', expected one of {PROVIDERS}")
@@ -1,12 +1,17 @@
 import os
 import google.generativeai as genai
-from typing import Dict, Any, Optional
-from .base import ModelAdapter
+from google.api_core import exceptions as google_exceptions
+from typing import AsyncIterator, Dict, Any, Optional
+from .base import ModelAdapter, RateLimitError, StreamChunk
+from .hedging import get_request_policy
+from .usage import record_usage
 import logging
 
 logger = logging.getLogger(__name__)
 
 class GeminiAdapter(ModelAdapter):
+    provider = "google"
+
     def __init__(self, model_name: str = "gemini-1.5-flash"):
         self.model_name = model_name
         self.api_key = os.getenv("GOOGLE_API_KEY")
@@ -17,8 +22,7 @@ class GeminiAdapter(ModelAdapter):
         genai.configure(api_key=self.api_key)
         self.model = genai.GenerativeModel(self.model_name)
 
-    def generate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
-        
+    def _build_request(self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]]):
         # Combine system context if provided (Gemini supports system instructions in newer versions, 
         # but simple concatenation is robust for broad compatibility in this demo)
         if context:
@@ -26,17 +30,72 @@ class GeminiAdapter(ModelAdapter):
         else:
             full_prompt = prompt
 
+        # Default generation config
+        generation_config = genai.types.GenerationConfig(
+            temperature=params.get("temperature", 0.7) if params else 0.7
+        )
+        return full_prompt, generation_config
+
+    def _request_options(self) -> Dict[str, Any]:
+        return {"timeout": get_request_policy(self.provider).timeout_s}
+
+    def generate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
+        full_prompt, generation_config = self._build_request(prompt, context, params)
         try:
-            # Default generation config
-            generation_config = genai.types.GenerationConfig(
-                temperature=params.get("temperature", 0.7) if params else 0.7
-            )
-            
             response = self.model.generate_content(
                 full_prompt,
-                generation_config=generation_config
+                generation_config=generation_config,
+                request_options=self._request_options()
+            )
+            self._record_usage(getattr(response, "usage_metadata", None))
+            return response.text
+        except Exception as e:
+            return self._handle_error(e)
+
+    async def agenerate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
+        full_prompt, generation_config = self._build_request(prompt, context, params)
+        try:
+            response = await self.model.generate_content_async(
+                full_prompt,
+                generation_config=generation_config,
+                request_options=self._request_options()
             )
+            self._record_usage(getattr(response, "usage_metadata", None))
             return response.text
         except Exception as e:
-            logger.error(f"Gemini API error: {e}")
-            return f"Error: {str(e)}"
+            return self._handle_error(e)
+
+    async def astream(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[StreamChunk]:
+        full_prompt, generation_config = self._build_request(prompt, context, params)
+        try:
+            response = await self.model.generate_content_async(
+                full_prompt,
+                generation_config=generation_config,
+                request_options=self._request_options(),
+                stream=True
+            )
+            usage = None
+            async for chunk in response:
+                # Usage metadata is cumulative, so only the last chunk's counts are recorded
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                yield StreamChunk(text=chunk.text, completion_tokens=getattr(usage, "candidates_token_count", None) or None)
+            self._record_usage(usage)
+        except Exception as e:
+            yield StreamChunk(text=self._handle_error(e), error=True)
+
+    def _record_usage(self, usage):
+        if usage is None:
+            return
+        record_usage(
+            self.provider,
+            self.model_name,
+            getattr(usage, "prompt_token_count", None),
+            getattr(usage, "candidates_token_count", None),
+            getattr(usage, "cached_content_token_count", None)
+        )
+
+    def _handle_error(self, e: Exception) -> str:
+        if isinstance(e, google_exceptions.ResourceExhausted):
+            raise RateLimitError(str(e))
+        logger.error(f"Gemini API error: {e}")
+        return f"Error: {str(e)}"
@@ -1,21 +1,39 @@
+import asyncio
 import os
-from typing import Dict, Any, Optional
-from .base import ModelAdapter
-from groq import Groq, GroqError
+import weakref
+from typing import AsyncIterator, Dict, Any, Optional
+from .base import ModelAdapter, RateLimitError, StreamChunk, parse_retry_after
+from .hedging import get_request_policy
+from .http import get_async_http_client, get_http_client
+from .usage import record_usage
+from groq import AsyncGroq, Groq, GroqError, RateLimitError as GroqRateLimitError
 import logging
 
 logger = logging.getLogger(__name__)
 
 class GroqAdapter(ModelAdapter):
+    provider = "groq"
+
     def __init__(self, model_name: str = "llama3-70b-8192"):
         self.model_name = model_name
         self.api_key = os.getenv("GROQ_API_KEY")
         if not self.api_key:
             logger.warning("GROQ_API_KEY not found in environment variables.")
         
-        self.client = Groq(api_key=self.api_key)
+        # Retries are handled by the runner's rate limiter, so 429s must surface here
+        self.client = Groq(api_key=self.api_key, max_retries=0, http_client=get_http_client())
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncGroq]" = weakref.WeakKeyDictionary()
 
-    def generate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
+    def _async_client(self) -> AsyncGroq:
+        """Async client bound to the running event loop's connection pool."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncGroq(api_key=self.api_key, max_retries=0, http_client=get_async_http_client())
+            self._async_clients[loop] = client
+        return client
+
+    def _build_request(self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         messages = []
         
         if context:
@@ -28,16 +46,59 @@ class GroqAdapter(ModelAdapter):
         if params and "temperature" in params:
             temperature = params["temperature"]
 
+        return {
+            "messages": messages,
+            "model": self.model_name,
+            "temperature": temperature,
+            "timeout": get_request_policy(self.provider).timeout_s
+        }
+
+    def generate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=messages,
-                model=self.model_name,
-                temperature=temperature,
-            )
+            chat_completion = self.client.chat.completions.create(**self._build_request(prompt, context, params))
+            self._record_usage(chat_completion.usage)
+            return chat_completion.choices[0].message.content
+        except Exception as e:
+            return self._handle_error(e)
+
+    async def agenerate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
+        try:
+            chat_completion = await self._async_client().chat.completions.create(**self._build_request(prompt, context, params))
+            self._record_usage(chat_completion.usage)
             return chat_completion.choices[0].message.content
-        except GroqError as e:
-            logger.error(f"Groq API error: {e}")
-            return f"Error: {str(e)}"
         except Exception as e:
+            return self._handle_error(e)
+
+    async def astream(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[StreamChunk]:
+        try:
+            stream = await self._async_client().chat.completions.create(
+                **self._build_request(prompt, context, params), stream=True
+            )
+            try:
+                async for chunk in stream:
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    # Groq reports usage on the final chunk under x_groq
+                    usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                    if usage:
+                        self._record_usage(usage)
+                    yield StreamChunk(text=text or "", completion_tokens=usage.completion_tokens if usage else None)
+            finally:
+                # Closing the response ends the generation when the consumer stops early
+                await stream.response.aclose()
+        except Exception as e:
+            yield StreamChunk(text=self._handle_error(e), error=True)
+
+    def _record_usage(self, usage):
+        if usage is None:
+            return
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        record_usage(self.provider, self.model_name, usage.prompt_tokens, usage.completion_tokens, cached)
+
+    def _handle_error(self, e: Exception) -> str:
+        if isinstance(e, GroqRateLimitError):
+            raise RateLimitError(str(e), retry_after=parse_retry_after(e.response.headers.get("retry-after")))
+        if isinstance(e, GroqError):
+            logger.error(f"Groq API error: {e}")
+        else:
             logger.error(f"Unexpected error calling Groq: {e}")
-            return f"Error: {str(e)}"
+        return f"Error: {str(e)}"
@@ -0,0 +1,174 @@
+"""
+Per-provider request deadlines and hedged requests.
+
+Every generation gets a deadline. With hedging enabled, a call that is still
+running after the provider's recent latency percentile gets a duplicate, the
+first to finish wins and the other is cancelled. This trims the tail latency
+caused by a few stuck requests at the cost of some extra load.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from metrics.latency import percentile
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Number of recent latencies kept per provider to derive the hedge delay
+LATENCY_WINDOW = 200
+
+# Hedging starts once this many latencies have been observed
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+
+
+@dataclass
+class RequestPolicy:
+    """Deadline and hedging settings for a provider."""
+    timeout_s: float = 60.0
+    hedge_percentile: Optional[float] = None  # e.g. 95; None disables hedging
+    hedge_min_samples: int = DEFAULT_HEDGE_MIN_SAMPLES
+
+    @property
+    def hedging(self) -> bool:
+        return self.hedge_percentile is not None
+
+
+# Override with <PROVIDER>_TIMEOUT_S / <PROVIDER>_HEDGE_PERCENTILE / <PROVIDER>_HEDGE_MIN_SAMPLES
+DEFAULT_REQUEST_POLICIES: Dict[str, RequestPolicy] = {
+    "groq": RequestPolicy(timeout_s=30.0),
+    "google": RequestPolicy(timeout_s=60.0),
+    # Local models are slow to load; TIMEOUT is the historical Ollama setting
+    "ollama": RequestPolicy(timeout_s=float(os.getenv("TIMEOUT", "30.0"))),
+    "mock": RequestPolicy(timeout_s=30.0),
+}
+
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return None
+    return float(value)
+
+
+_policies: Dict[str, RequestPolicy] = {}
+_policies_lock = threading.Lock()
+
+
+def get_request_policy(provider: str) -> RequestPolicy:
+    """Get the process-wide request policy for a provider."""
+    with _policies_lock:
+        if provider not in _policies:
+            default = DEFAULT_REQUEST_POLICIES.get(provider, RequestPolicy())
+            prefix = provider.upper()
+            timeout_s = _env_float(f"{prefix}_TIMEOUT_S")
+            hedge_percentile = _env_float(f"{prefix}_HEDGE_PERCENTILE")
+            min_samples = _env_float(f"{prefix}_HEDGE_MIN_SAMPLES")
+            _policies[provider] = RequestPolicy(
+                timeout_s=timeout_s if timeout_s is not None else default.timeout_s,
+                hedge_percentile=hedge_percentile if hedge_percentile is not None else default.hedge_percentile,
+                hedge_min_samples=int(min_samples) if min_samples is not None else default.hedge_min_samples,
+            )
+        return _policies[provider]
+
+
+class LatencyTracker:
+    """
+    Rolling window of recent successful call latencies for one provider.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_s: float):
+        with self._lock:
+            self._samples.append(latency_s)
+
+    def hedge_delay(self, policy: RequestPolicy) -> Optional[float]:
+        """Seconds to wait before hedging, or None if hedging is off or there is too little data."""
+        if not policy.hedging:
+            return None
+        with self._lock:
+            if len(self._samples) < policy.hedge_min_samples:
+                return None
+            samples = list(self._samples)
+        return percentile(samples, policy.hedge_percentile)
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_latency_tracker(provider: str) -> LatencyTracker:
+    """Get the process-wide latency tracker for a provider."""
+    with _trackers_lock:
+        if provider not in _trackers:
+            _trackers[provider] = LatencyTracker()
+        return _trackers[provider]
+
+
+async def _cancel_all(tasks):
+    for task in tasks:
+        task.cancel()
+    # Wait so cancelled calls release their connections before we return
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def hedged_call(
+    call: Callable[[], Awaitable[T]],
+    policy: RequestPolicy,
+    tracker: LatencyTracker,
+    hedge: Optional[Callable[[], Awaitable[T]]] = None,
+) -> T:
+    """
+    Await `call()` under the policy's deadline, hedging it if it runs long.
+
+    Args:
+        call: Starts the primary request
+        policy: Deadline and hedging settings
+        tracker: Latency history used for the hedge delay (updated on success)
+        hedge: Starts the duplicate request (defaults to `call`); use it to
+            take a rate-limit slot before sending
+
+    Raises:
+        asyncio.TimeoutError: No attempt finished within policy.timeout_s
+        Exception: The error of the last attempt if every attempt failed
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    deadline = start + policy.timeout_s
+    hedge_delay = tracker.hedge_delay(policy)
+
+    pending = {asyncio.ensure_future(call())}
+    hedged = False
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError(f"Request exceeded {policy.timeout_s:g}s deadline")
+            wait_s = remaining
+            if hedge_delay is not None and not hedged:
+                wait_s = min(wait_s, max(0.0, start + hedge_delay - loop.time()))
+
+            done, pending = await asyncio.wait(pending, timeout=wait_s, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    tracker.record(loop.time() - start)
+                    return task.result()
+                error = task.exception()
+
+            if not done and hedge_delay is not None and not hedged:
+                hedged = True
+                logger.debug(f"Hedging request after {hedge_delay:.2f}s")
+                pending.add(asyncio.ensure_future((hedge or call)()))
+        raise error
+    finally:
+        if pending:
+            await _cancel_all(pending)
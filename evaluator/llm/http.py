@@ -0,0 +1,50 @@
+"""
+Shared, pooled HTTP clients for model adapters.
+
+Adapters reuse one connection pool per process (sync) or per event loop (async)
+instead of opening a client per adapter instance, so keep-alive connections
+and TLS sessions are reused across calls. HTTP/2 is negotiated when the `h2`
+package is installed and the server supports it.
+"""
+import asyncio
+import importlib.util
+import threading
+import weakref
+from typing import Optional
+
+import httpx
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+
+# Per-request timeouts are passed by each adapter; this is only the fallback
+DEFAULT_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+_sync_client: Optional[httpx.Client] = None
+_sync_client_lock = threading.Lock()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_http_client() -> httpx.Client:
+    """Process-wide pooled blocking client."""
+    global _sync_client
+    with _sync_client_lock:
+        if _sync_client is None:
+            _sync_client = httpx.Client(http2=HTTP2_AVAILABLE, limits=POOL_LIMITS, timeout=DEFAULT_TIMEOUT)
+        return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Pooled async client for the running event loop.
+
+    Async connection pools can't be shared between event loops, so one client
+    is kept per loop and dropped when the loop is garbage collected.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=POOL_LIMITS, timeout=DEFAULT_TIMEOUT)
+        _async_clients[loop] = client
+    return client
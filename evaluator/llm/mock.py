@@ -0,0 +1,209 @@
+"""
+Deterministic mock LLM for load testing and CI.
+
+`MockBehavior` decides, reproducibly, how a request should behave: time to
+first token, token rate, whether it fails with a 500 or a 429, and what text
+it returns. It is shared by the in-process `MockAdapter` and by the HTTP
+mock server in `evaluator.llm.mock_server`.
+
+Configuration comes from a JSON/YAML file (MOCK_LLM_CONFIG), e.g.:
+
+    seed: 42
+    latency:
+      distribution: lognormal   # fixed | uniform | lognormal
+      median_ms: 300
+      sigma: 0.5
+    tokens_per_sec: 80
+    error_rate: 0.01
+    rate_limit_rate: 0.05
+    retry_after_s: 1
+    default_response: "Mock answer to: $prompt"
+    responses:
+      smoke_json_extract: '{"name": "Alice", "age": 25}'
+
+Responses are `string.Template`s and may use $prompt, $test_id and $model.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from string import Template
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import yaml
+
+from .base import ModelAdapter, RateLimitError, StreamChunk
+from .rate_limiter import estimate_tokens
+from .usage import record_usage
+
+logger = logging.getLogger(__name__)
+
+# Prompts sent by OllamaAdapter/GeminiAdapter embed the context before the instruction
+_PROMPT_MARKERS = ("\n\nInstruction: ", "\n\nUser Instruction: ")
+
+_TOKEN_PATTERN = re.compile(r"\S+\s*|\s+")
+
+
+@dataclass
+class MockPlan:
+    """How a single mock request behaves."""
+    status: int  # 200, 429 or 500
+    ttft_s: float
+    token_delay_s: float
+    tokens: List[str]
+    retry_after_s: Optional[float] = None
+    test_id: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self.tokens)
+
+
+@dataclass
+class MockBehavior:
+    """Reproducible latency, error and response model for the mock LLM."""
+    seed: int = 0
+    latency: Dict[str, Any] = field(default_factory=lambda: {"distribution": "fixed", "median_ms": 200})
+    tokens_per_sec: float = 50.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after_s: float = 1.0
+    default_response: str = "Mock response to: $prompt"
+    responses: Dict[str, str] = field(default_factory=dict)
+    datasets_path: Optional[str] = "datasets"
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+        self._attempts: Dict[str, int] = {}
+        self._prompt_index: Optional[Dict[str, str]] = None
+
+    @classmethod
+    def from_file(cls, path: str) -> "MockBehavior":
+        with open(path, "r") as f:
+            data = yaml.safe_load(f) if path.endswith((".yaml", ".yml")) else json.load(f)
+        return cls(**(data or {}))
+
+    @classmethod
+    def from_env(cls) -> "MockBehavior":
+        """Load MOCK_LLM_CONFIG if set, otherwise use defaults."""
+        path = os.getenv("MOCK_LLM_CONFIG")
+        return cls.from_file(path) if path else cls()
+
+    def _rng(self, prompt: str) -> random.Random:
+        # Seeded by the prompt and how many times it has been requested, so
+        # results don't depend on how concurrent requests interleave
+        with self._lock:
+            attempt = self._attempts.get(prompt, 0)
+            self._attempts[prompt] = attempt + 1
+        digest = hashlib.sha256(f"{self.seed}:{attempt}:{prompt}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _sample_ttft_s(self, rng: random.Random) -> float:
+        distribution = self.latency.get("distribution", "fixed")
+        median_ms = float(self.latency.get("median_ms", 200))
+        if distribution == "uniform":
+            ms = rng.uniform(float(self.latency.get("min_ms", 0)), float(self.latency.get("max_ms", 2 * median_ms)))
+        elif distribution == "lognormal":
+            ms = rng.lognormvariate(math.log(median_ms), float(self.latency.get("sigma", 0.5)))
+        else:
+            ms = median_ms
+        return max(0.0, ms) / 1000
+
+    def resolve_test_id(self, prompt: str) -> Optional[str]:
+        """Map a prompt back to the dataset test that sent it."""
+        if self._prompt_index is None:
+            self._prompt_index = self._build_prompt_index()
+        if prompt in self._prompt_index:
+            return self._prompt_index[prompt]
+        for marker in _PROMPT_MARKERS:
+            if marker in prompt:
+                return self._prompt_index.get(prompt.rsplit(marker, 1)[1])
+        return None
+
+    def _build_prompt_index(self) -> Dict[str, str]:
+        if not self.datasets_path or not os.path.isdir(self.datasets_path):
+            return {}
+        # Imported lazily: the loader is only needed when responses are keyed by test id
+        from evaluator.loader import TestLoader
+        return {test.prompt: test.id for test in TestLoader(base_path=self.datasets_path).load_test_suite()}
+
+    def plan(self, prompt: str, model: str, test_id: Optional[str] = None) -> MockPlan:
+        rng = self._rng(prompt)
+        test_id = test_id or self.resolve_test_id(prompt)
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            return MockPlan(status=429, ttft_s=0.0, token_delay_s=0.0, tokens=[], retry_after_s=self.retry_after_s, test_id=test_id)
+        if roll < self.rate_limit_rate + self.error_rate:
+            return MockPlan(status=500, ttft_s=self._sample_ttft_s(rng), token_delay_s=0.0, tokens=[], test_id=test_id)
+
+        template = self.responses.get(test_id, self.default_response) if test_id else self.default_response
+        text = Template(template).safe_substitute(prompt=prompt, test_id=test_id or "", model=model)
+        token_delay_s = 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+        return MockPlan(
+            status=200,
+            ttft_s=self._sample_ttft_s(rng),
+            token_delay_s=token_delay_s,
+            tokens=_TOKEN_PATTERN.findall(text),
+            test_id=test_id
+        )
+
+
+class MockAdapter(ModelAdapter):
+    """
+    In-process mock model driven by MockBehavior. No network involved.
+    """
+    provider = "mock"
+
+    def __init__(self, model_name: str = "mock", behavior: Optional[MockBehavior] = None):
+        self.model_name = model_name
+        self.behavior = behavior or MockBehavior.from_env()
+
+    def _full_prompt(self, prompt: str, context: Optional[str]) -> str:
+        return f"Context: {context}\n\nInstruction: {prompt}" if context else prompt
+
+    def _check(self, plan: MockPlan) -> Optional[str]:
+        if plan.status == 429:
+            raise RateLimitError("Mock rate limit", retry_after=plan.retry_after_s)
+        if plan.status >= 500:
+            logger.error("Mock LLM returned a server error")
+            return "Error: mock server error"
+        return None
+
+    def _record_usage(self, prompt: str, context: Optional[str], plan: MockPlan):
+        prompt_tokens = estimate_tokens(self._full_prompt(prompt, context))
+        record_usage(self.provider, self.model_name, prompt_tokens, len(plan.tokens))
+
+    def generate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
+        plan = self.behavior.plan(self._full_prompt(prompt, context), self.model_name)
+        time.sleep(plan.ttft_s)
+        error = self._check(plan)
+        if error:
+            return error
+        time.sleep(plan.token_delay_s * max(0, len(plan.tokens) - 1))
+        self._record_usage(prompt, context, plan)
+        return plan.text
+
+    async def astream(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[StreamChunk]:
+        plan = self.behavior.plan(self._full_prompt(prompt, context), self.model_name)
+        await asyncio.sleep(plan.ttft_s)
+        error = self._check(plan)
+        if error:
+            yield StreamChunk(text=error, error=True)
+            return
+        for i, token in enumerate(plan.tokens):
+            if i:
+                await asyncio.sleep(plan.token_delay_s)
+            yield StreamChunk(text=token)
+        self._record_usage(prompt, context, plan)
+        yield StreamChunk(completion_tokens=len(plan.tokens))
+
+    async def agenerate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
+        parts = [chunk.text async for chunk in self.astream(prompt, context, params)]
+        return "".join(parts)
@@ -0,0 +1,170 @@
+"""
+Mock LLM HTTP server for load testing without provider quota.
+
+Speaks two protocols so the real adapters can be pointed at it unchanged:
+- Ollama:  POST /api/generate              (OLLAMA_BASE_URL=http://localhost:11435)
+- OpenAI/Groq chat completions:
+           POST /openai/v1/chat/completions (GROQ_BASE_URL=http://localhost:11435)
+           POST /v1/chat/completions
+
+Behaviour (latency, token rate, error/429 rates, canned responses) comes from
+MOCK_LLM_CONFIG; see evaluator.llm.mock. A request can name its test case
+with the X-Test-Id header, otherwise the prompt is matched against the datasets.
+
+Run with:
+    uvicorn evaluator.llm.mock_server:app --port 11435
+"""
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Header
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from .mock import MockBehavior, MockPlan
+from .rate_limiter import estimate_tokens
+
+behavior = MockBehavior.from_env()
+
+app = FastAPI(title="Mock LLM Server", version="0.1.0")
+
+
+class GenerateRequest(BaseModel):
+    model: str
+    prompt: str
+    stream: bool = True  # Ollama streams unless told otherwise
+    options: Optional[Dict[str, Any]] = None
+
+
+class ChatMessage(BaseModel):
+    role: str
+    content: str
+
+
+class ChatCompletionRequest(BaseModel):
+    model: str
+    messages: List[ChatMessage]
+    stream: bool = False
+    temperature: Optional[float] = None
+
+
+def _error_response(plan: MockPlan, openai_format: bool = False) -> JSONResponse:
+    rate_limited = plan.status == 429
+    message = "Rate limit reached (mock)" if rate_limited else "Internal server error (mock)"
+    if openai_format:
+        content = {"error": {"message": message, "type": "rate_limit_exceeded" if rate_limited else "server_error"}}
+    else:
+        content = {"error": message}
+    headers = {"retry-after": str(plan.retry_after_s)} if rate_limited else None
+    return JSONResponse(status_code=plan.status, content=content, headers=headers)
+
+
+async def _tokens(plan: MockPlan) -> AsyncIterator[str]:
+    for i, token in enumerate(plan.tokens):
+        if i:
+            await asyncio.sleep(plan.token_delay_s)
+        yield token
+
+
+def _usage(prompt: str, plan: MockPlan) -> Dict[str, int]:
+    prompt_tokens = estimate_tokens(prompt)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": len(plan.tokens),
+        "total_tokens": prompt_tokens + len(plan.tokens),
+    }
+
+
+@app.get("/health")
+def health_check():
+    return {"status": "ok"}
+
+
+@app.post("/api/generate")
+async def ollama_generate(request: GenerateRequest, x_test_id: Optional[str] = Header(None)):
+    plan = behavior.plan(request.prompt, request.model, test_id=x_test_id)
+    await asyncio.sleep(plan.ttft_s)
+    if plan.status != 200:
+        return _error_response(plan)
+
+    start = time.perf_counter()
+    created_at = datetime.now(timezone.utc).isoformat()
+    prompt_eval_count = estimate_tokens(request.prompt)
+
+    if not request.stream:
+        await asyncio.sleep(plan.token_delay_s * max(0, len(plan.tokens) - 1))
+        return {
+            "model": request.model,
+            "created_at": created_at,
+            "response": plan.text,
+            "done": True,
+            "prompt_eval_count": prompt_eval_count,
+            "eval_count": len(plan.tokens),
+            "total_duration": int((time.perf_counter() - start + plan.ttft_s) * 1e9),
+        }
+
+    async def stream() -> AsyncIterator[str]:
+        async for token in _tokens(plan):
+            yield json.dumps({"model": request.model, "created_at": created_at, "response": token, "done": False}) + "\n"
+        yield json.dumps({
+            "model": request.model,
+            "created_at": created_at,
+            "response": "",
+            "done": True,
+            "prompt_eval_count": prompt_eval_count,
+            "eval_count": len(plan.tokens),
+            "total_duration": int((time.perf_counter() - start + plan.ttft_s) * 1e9),
+        }) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/openai/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: ChatCompletionRequest, x_test_id: Optional[str] = Header(None)):
+    user_messages = [m.content for m in request.messages if m.role == "user"]
+    prompt = user_messages[-1] if user_messages else ""
+    plan = behavior.plan(prompt, request.model, test_id=x_test_id)
+    await asyncio.sleep(plan.ttft_s)
+    if plan.status != 200:
+        return _error_response(plan, openai_format=True)
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    usage = _usage(prompt, plan)
+
+    if not request.stream:
+        await asyncio.sleep(plan.token_delay_s * max(0, len(plan.tokens) - 1))
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": request.model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": plan.text}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    def chunk(delta: Dict[str, str], finish_reason: Optional[str] = None, **extra) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": request.model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            **extra,
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    async def stream() -> AsyncIterator[str]:
+        yield chunk({"role": "assistant", "content": ""})
+        async for token in _tokens(plan):
+            yield chunk({"content": token})
+        # Groq reports usage on the final chunk under x_groq
+        yield chunk({}, finish_reason="stop", x_groq={"id": completion_id, "usage": usage})
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
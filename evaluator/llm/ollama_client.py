@@ -1,20 +1,26 @@
 import httpx
+import json
 import os
-from typing import Dict, Any, Optional
-from .base import ModelAdapter
+from typing import AsyncIterator, Dict, Any, Optional
+from .base import ModelAdapter, RateLimitError, StreamChunk, parse_retry_after
+from .hedging import get_request_policy
+from .http import get_async_http_client, get_http_client
+from .usage import record_usage
 import logging
 
 logger = logging.getLogger(__name__)
 
 class OllamaAdapter(ModelAdapter):
+    provider = "ollama"
+
     def __init__(self, model_name: str = "llama3", base_url: str = "http://localhost:11434"):
         self.model_name = model_name
         self.base_url = os.getenv("OLLAMA_BASE_URL", base_url)
-        self.client = httpx.Client(timeout=float(os.getenv("TIMEOUT", "30.0")))
+        self.timeout = get_request_policy(self.provider).timeout_s
+        # Connections are pooled process-wide rather than per adapter instance
+        self.client = get_http_client()
 
-    def generate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
-        url = f"{self.base_url}/api/generate"
-        
+    def _build_payload(self, prompt: str, context: Optional[str], params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         full_prompt = prompt
         if context:
             # Simple concatenation for now, can be improved with system roles if chat API is used
@@ -29,15 +35,62 @@ class OllamaAdapter(ModelAdapter):
         if params:
             if "temperature" in params:
                  payload["options"] = {"temperature": params["temperature"]}
+        return payload
 
+    def generate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
+        url = f"{self.base_url}/api/generate"
         try:
-            response = self.client.post(url, json=payload)
+            response = self.client.post(url, json=self._build_payload(prompt, context, params), timeout=self.timeout)
             response.raise_for_status()
             data = response.json()
+            self._record_usage(data)
             return data.get("response", "")
-        except httpx.RequestError as e:
-            logger.error(f"Ollama request failed: {e}")
-            return f"Error: {str(e)}"
-        except httpx.HTTPStatusError as e:
+        except httpx.HTTPError as e:
+            return self._handle_error(e)
+
+    async def agenerate(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> str:
+        url = f"{self.base_url}/api/generate"
+        try:
+            response = await get_async_http_client().post(url, json=self._build_payload(prompt, context, params), timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+            self._record_usage(data)
+            return data.get("response", "")
+        except httpx.HTTPError as e:
+            return self._handle_error(e)
+
+    async def astream(self, prompt: str, context: Optional[str] = None, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[StreamChunk]:
+        url = f"{self.base_url}/api/generate"
+        payload = self._build_payload(prompt, context, params)
+        payload["stream"] = True
+        try:
+            async with get_async_http_client().stream("POST", url, json=payload, timeout=self.timeout) as response:
+                if response.is_error:
+                    await response.aread()
+                    response.raise_for_status()
+                # Newline-delimited JSON; the final object has done=true and eval_count
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get("done"):
+                        self._record_usage(data)
+                    yield StreamChunk(
+                        text=data.get("response", ""),
+                        completion_tokens=data.get("eval_count") if data.get("done") else None
+                    )
+        except httpx.HTTPError as e:
+            yield StreamChunk(text=self._handle_error(e), error=True)
+
+    def _record_usage(self, data: Dict[str, Any]):
+        # Ollama omits prompt_eval_count when the prompt was fully cached
+        record_usage(self.provider, self.model_name, data.get("prompt_eval_count"), data.get("eval_count"))
+
+    def _handle_error(self, e: httpx.HTTPError) -> str:
+        if isinstance(e, httpx.HTTPStatusError):
+            if e.response.status_code == 429:
+                raise RateLimitError(e.response.text, retry_after=parse_retry_after(e.response.headers.get("retry-after")))
             logger.error(f"Ollama returned error status: {e}")
             return f"Error: {e.response.text}"
+        logger.error(f"Ollama request failed: {e}")
+        return f"Error: {str(e)}"
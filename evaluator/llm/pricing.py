@@ -0,0 +1,78 @@
+"""
+Local price table for estimating generation cost.
+
+Prices are USD per million tokens and are only as current as this table;
+override or extend them with a JSON file named by PRICE_TABLE_PATH:
+
+    {"groq/llama-3.3-70b-versatile": {"input": 0.59, "output": 0.79, "cached_input": 0.295}}
+"""
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from .usage import Usage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ModelPrice:
+    input: float  # USD per 1M prompt tokens
+    output: float  # USD per 1M completion tokens
+    cached_input: Optional[float] = None  # USD per 1M cached prompt tokens (input price if None)
+
+
+# Keyed by "provider/model"; "provider/*" prices every model of a provider
+DEFAULT_PRICES: Dict[str, ModelPrice] = {
+    "groq/llama-3.3-70b-versatile": ModelPrice(input=0.59, output=0.79, cached_input=0.295),
+    "groq/llama3-70b-8192": ModelPrice(input=0.59, output=0.79),
+    "groq/llama-3.1-8b-instant": ModelPrice(input=0.05, output=0.08),
+    "groq/llama3-8b-8192": ModelPrice(input=0.05, output=0.08),
+    "google/gemini-1.5-flash": ModelPrice(input=0.075, output=0.30, cached_input=0.01875),
+    "google/gemini-1.5-pro": ModelPrice(input=1.25, output=5.00, cached_input=0.3125),
+    "google/gemini-2.0-flash": ModelPrice(input=0.10, output=0.40, cached_input=0.025),
+    "google/gemini-flash-latest": ModelPrice(input=0.30, output=2.50, cached_input=0.075),
+    # Local and simulated models cost nothing per token
+    "ollama/*": ModelPrice(input=0.0, output=0.0),
+    "mock/*": ModelPrice(input=0.0, output=0.0),
+}
+
+_prices: Optional[Dict[str, ModelPrice]] = None
+
+
+def get_price_table() -> Dict[str, ModelPrice]:
+    """Default prices merged with PRICE_TABLE_PATH overrides (loaded once)."""
+    global _prices
+    if _prices is None:
+        prices = dict(DEFAULT_PRICES)
+        path = os.getenv("PRICE_TABLE_PATH")
+        if path:
+            try:
+                with open(path, "r") as f:
+                    for key, value in json.load(f).items():
+                        prices[key] = ModelPrice(**value)
+            except (OSError, ValueError, TypeError) as e:
+                logger.error(f"Ignoring invalid price table {path}: {e}")
+        _prices = prices
+    return _prices
+
+
+def get_price(provider: str, model: str) -> Optional[ModelPrice]:
+    prices = get_price_table()
+    return prices.get(f"{provider}/{model}") or prices.get(f"{provider}/*")
+
+
+def estimate_cost(provider: str, model: str, usage: Usage) -> Optional[float]:
+    """Estimated USD cost of a call, or None if the model has no price."""
+    price = get_price(provider, model)
+    if price is None:
+        return None
+    cached_price = price.cached_input if price.cached_input is not None else price.input
+    uncached_prompt = usage.prompt_tokens - usage.cached_prompt_tokens
+    return (
+        uncached_prompt * price.input
+        + usage.cached_prompt_tokens * cached_price
+        + usage.completion_tokens * price.output
+    ) / 1_000_000
@@ -0,0 +1,190 @@
+"""
+Provider-aware adaptive rate limiting.
+
+Each provider gets one limiter per process with two token buckets: one for
+requests per minute and one for tokens per minute. Limiters back off when
+the provider answers 429 / Retry-After and recover gradually on success.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from .base import ModelAdapter, RateLimitError
+
+logger = logging.getLogger(__name__)
+
+# Rough completion size assumed when reserving tokens before a call
+ESTIMATED_COMPLETION_TOKENS = 256
+
+# Backoff tuning: halve throughput on 429, recover 10% of nominal per success
+BACKOFF_FACTOR = 0.5
+RECOVERY_STEP = 0.1
+MIN_RATE_FACTOR = 0.05
+DEFAULT_RETRY_AFTER_S = 5.0
+
+# Attempts after the first when a provider answers 429
+MAX_RATE_LIMIT_RETRIES = int(os.getenv("MAX_RATE_LIMIT_RETRIES", "3"))
+
+
+@dataclass
+class ProviderLimits:
+    """Nominal quota for a provider. None means unlimited."""
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+
+
+# Free-tier quotas; override with <PROVIDER>_RPM / <PROVIDER>_TPM
+DEFAULT_PROVIDER_LIMITS: Dict[str, ProviderLimits] = {
+    "groq": ProviderLimits(requests_per_minute=30, tokens_per_minute=6000),
+    "google": ProviderLimits(requests_per_minute=10, tokens_per_minute=250000),
+    "ollama": ProviderLimits(),
+    "mock": ProviderLimits(),
+}
+
+
+def estimate_tokens(*texts: Optional[str]) -> int:
+    """Cheap token estimate (~4 characters per token) for prompt text."""
+    return sum(len(t) for t in texts if t) // 4 + 1
+
+
+class TokenBucket:
+    """
+    Token bucket that allows reservations to go into debt.
+
+    A caller that reserves more than is available is told how long to wait
+    instead of being rejected, so concurrent callers queue fairly.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.available = per_minute
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, rate_factor: float, now: float) -> float:
+        """Debit `amount` and return seconds until the debit is covered."""
+        refill_per_s = self.capacity * rate_factor / 60.0
+        self.available = min(self.capacity, self.available + (now - self.updated) * refill_per_s)
+        self.updated = now
+        self.available -= amount
+        if self.available >= 0:
+            return 0.0
+        return -self.available / refill_per_s
+
+
+class AdaptiveRateLimiter:
+    """
+    Rate limiter for a single provider, safe to share across threads and event loops.
+    """
+
+    def __init__(self, provider: str, limits: ProviderLimits):
+        self.provider = provider
+        self.limits = limits
+        self.rate_factor = 1.0
+        self._lock = threading.Lock()
+        self._blocked_until = 0.0
+        self._requests = TokenBucket(limits.requests_per_minute) if limits.requests_per_minute else None
+        self._tokens = TokenBucket(limits.tokens_per_minute) if limits.tokens_per_minute else None
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._blocked_until - now)
+            if self._requests:
+                wait = max(wait, self._requests.reserve(1, self.rate_factor, now))
+            if self._tokens:
+                # Never reserve more than a full bucket, or a huge prompt would wait forever
+                amount = min(tokens, self._tokens.capacity)
+                wait = max(wait, self._tokens.reserve(amount, self.rate_factor, now))
+            return wait
+
+    def acquire(self, tokens: int = 0):
+        """Block the calling thread until a request of `tokens` may be sent."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """Wait (without blocking the event loop) until a request of `tokens` may be sent."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def record_success(self):
+        """Speed back up towards the nominal rate."""
+        with self._lock:
+            self.rate_factor = min(1.0, self.rate_factor + RECOVERY_STEP)
+
+    def record_rate_limited(self, retry_after: Optional[float] = None):
+        """Slow down after a 429, and pause all callers for Retry-After seconds."""
+        with self._lock:
+            self.rate_factor = max(MIN_RATE_FACTOR, self.rate_factor * BACKOFF_FACTOR)
+            pause = retry_after if retry_after is not None else DEFAULT_RETRY_AFTER_S
+            self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+        logger.warning(
+            f"{self.provider} rate limited; pausing {pause:.1f}s, throughput now {self.rate_factor:.0%} of nominal"
+        )
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _limits_from_env(provider: str) -> ProviderLimits:
+    defaults = DEFAULT_PROVIDER_LIMITS.get(provider, ProviderLimits())
+    rpm = os.getenv(f"{provider.upper()}_RPM")
+    tpm = os.getenv(f"{provider.upper()}_TPM")
+    return ProviderLimits(
+        requests_per_minute=float(rpm) if rpm else defaults.requests_per_minute,
+        tokens_per_minute=float(tpm) if tpm else defaults.tokens_per_minute,
+    )
+
+
+def get_rate_limiter(provider: str) -> AdaptiveRateLimiter:
+    """Get the process-wide limiter for a provider, creating it on first use."""
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = AdaptiveRateLimiter(provider, _limits_from_env(provider))
+        return _limiters[provider]
+
+
+def generate_rate_limited(
+    adapter: ModelAdapter,
+    prompt: str,
+    context: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> str:
+    """
+    Blocking `adapter.generate` that waits for the provider's limiter and retries on 429.
+    """
+    return generate_rate_limited_timed(adapter, prompt=prompt, context=context, params=params)[0]
+
+
+def generate_rate_limited_timed(
+    adapter: ModelAdapter,
+    prompt: str,
+    context: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, float]:
+    """
+    As generate_rate_limited, also returning the latency in ms of the call that
+    produced the output (time spent waiting on the limiter or on 429s excluded).
+    """
+    limiter = get_rate_limiter(adapter.provider)
+    tokens = estimate_tokens(prompt, context) + ESTIMATED_COMPLETION_TOKENS
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        limiter.acquire(tokens)
+        start_time = time.time()
+        try:
+            output = adapter.generate(prompt=prompt, context=context, params=params)
+        except RateLimitError as e:
+            limiter.record_rate_limited(e.retry_after)
+            if attempt == MAX_RATE_LIMIT_RETRIES:
+                raise
+            continue
+        latency_ms = (time.time() - start_time) * 1000
+        limiter.record_success()
+        return output, latency_ms
@@ -0,0 +1,117 @@
+"""
+Token usage reported by providers.
+
+Adapters keep returning plain text, and report what each call consumed with
+`record_usage`. Callers that want to account for it wrap the work in
+`track_usage()`, which collects every usage recorded in the same context,
+including calls made from worker threads (`asyncio.to_thread`) and from tasks
+spawned inside it (e.g. hedged duplicates). Concurrent tests each run in their
+own task and so are tracked separately. Blocks nest: usage recorded in an
+inner block also counts toward the enclosing one.
+
+    with track_usage() as tracker:
+        text = adapter.generate(prompt)
+    tracker.total().total_tokens, tracker.cost_usd()
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+
+@dataclass
+class Usage:
+    """Token counts of one or more calls."""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_prompt_tokens: int = 0  # Part of prompt_tokens served from the provider's prompt cache
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def __add__(self, other: "Usage") -> "Usage":
+        return Usage(
+            prompt_tokens=self.prompt_tokens + other.prompt_tokens,
+            completion_tokens=self.completion_tokens + other.completion_tokens,
+            cached_prompt_tokens=self.cached_prompt_tokens + other.cached_prompt_tokens,
+        )
+
+
+@dataclass
+class UsageRecord:
+    """Usage of a single call and the model that served it."""
+    provider: str
+    model: str
+    usage: Usage
+
+
+class UsageTracker:
+    """Collects UsageRecords; safe to append to from several threads."""
+
+    def __init__(self, parent: Optional["UsageTracker"] = None):
+        self.records: List[UsageRecord] = []
+        self.parent = parent  # Tracker of the enclosing track_usage block
+        self._lock = threading.Lock()
+
+    def add(self, record: UsageRecord):
+        with self._lock:
+            self.records.append(record)
+        if self.parent is not None:
+            self.parent.add(record)
+
+    def total(self) -> Optional[Usage]:
+        """Summed usage, or None if no call reported any."""
+        if not self.records:
+            return None
+        total = Usage()
+        for record in self.records:
+            total = total + record.usage
+        return total
+
+    def cost_usd(self) -> Optional[float]:
+        """Estimated cost from the local price table (None if nothing was recorded or a model is unpriced)."""
+        from .pricing import estimate_cost
+        if not self.records:
+            return None
+        costs = [estimate_cost(r.provider, r.model, r.usage) for r in self.records]
+        if any(cost is None for cost in costs):
+            return None
+        return sum(costs)
+
+
+_current_tracker: ContextVar[Optional[UsageTracker]] = ContextVar("usage_tracker", default=None)
+
+
+@contextmanager
+def track_usage() -> Iterator[UsageTracker]:
+    """Collect usage recorded by adapter calls made inside the block."""
+    tracker = UsageTracker(parent=_current_tracker.get())
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
+
+
+def record_usage(
+    provider: str,
+    model: str,
+    prompt_tokens: Optional[int],
+    completion_tokens: Optional[int],
+    cached_prompt_tokens: Optional[int] = None,
+):
+    """Called by adapters after every call that reported usage. No-op outside `track_usage`."""
+    tracker = _current_tracker.get()
+    if tracker is None:
+        return
+    tracker.add(UsageRecord(
+        provider=provider,
+        model=model,
+        usage=Usage(
+            prompt_tokens=prompt_tokens or 0,
+            completion_tokens=completion_tokens or 0,
+            cached_prompt_tokens=cached_prompt_tokens or 0,
+        ),
+    ))
@@ -1,71 +1,436 @@
 import os
+import gzip
+import io
 import json
 import yaml
 import logging
-from typing import List
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Collection, Dict, Iterable, Iterator, List, Optional, Tuple
 from app.schemas.test_case import TestCase
+from evaluator.dataset_cache import DatasetCache, default_cache_dir
+from evaluator.sampling import SampleSpec, in_shard
+from evaluator.tag_query import TagIndex, parse_tag_queries
 from pydantic import ValidationError
 
 logger = logging.getLogger(__name__)
 
+# JSONL may be gzip or zstd compressed; those files are read line by line
+JSONL_EXTENSIONS = ('.jsonl', '.jsonl.gz', '.jsonl.zst')
+DATASET_EXTENSIONS = ('.json', '.yaml', '.yml') + JSONL_EXTENSIONS
+
+# libyaml's parser when PyYAML was built with it (several times faster)
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+@dataclass
+class _CompiledFile:
+    """A dataset file parsed and validated by a pool worker."""
+    stamp: tuple
+    tags: List[Tuple[str, Tuple[str, ...]]]
+    tests: List[TestCase]
+    errors: List[Tuple[str, str]]  # (test id, validation error)
+
+
+def _compile_file(file_path: str) -> _CompiledFile:
+    """Pool worker: parse and validate one dataset file (errors are logged by the parent)."""
+    stamp = DatasetCache.stamp(file_path)
+    raw_tests = TestLoader(cache_dir=None, workers=1)._load_file(file_path)
+    tests, errors = [], []
+    for test_data in raw_tests:
+        try:
+            tests.append(TestCase(**test_data))
+        except ValidationError as e:
+            errors.append((test_data.get('id', 'unknown'), str(e)))
+    tags = [TestLoader._raw_tags(test_data) for test_data in raw_tests if isinstance(test_data, dict)]
+    return _CompiledFile(stamp=stamp, tags=tags, tests=tests, errors=errors)
+
+
 class TestLoader:
-    def __init__(self, base_path: str = "datasets"):
+    def __init__(self, base_path: str = "datasets", cache_dir: Optional[str] = "default", workers: Optional[int] = None):
+        """
+        Args:
+            base_path: Directory walked by load_test_suite.
+            cache_dir: Where validated cases are cached between loads. "default" uses
+                       DATASET_CACHE_DIR (or .cache/datasets); None disables the cache.
+            workers: Processes parsing and validating uncached files in parallel
+                     (default: DATASET_LOAD_WORKERS env or 1; 0 uses every core).
+        """
         self.base_path = base_path
+        if cache_dir == "default":
+            cache_dir = default_cache_dir()
+        self.cache = DatasetCache(cache_dir) if cache_dir else None
+        if workers is None:
+            workers = int(os.getenv("DATASET_LOAD_WORKERS", "1"))
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+
+    def iter_test_suite(self, tags: List[str] = None, sample: Optional[SampleSpec] = None) -> Iterator[TestCase]:
+        """
+        Yields test cases from the datasets directory as they are read, in the same
+        order as load_test_suite. JSONL files are streamed line by line and each
+        case is only validated once it is known to match the tag queries, so the
+        suite never has to fit in memory.
+
+        A sample (see evaluator.sampling) needs every test's id and tags up front,
+        so sampled iteration first scans the tag index and JSONL files; sharding
+        alone is decided test by test.
+
+        Args:
+            tags: Optional list of tag queries, as for load_test_suite.
+            sample: Optional sampling and/or sharding of the matching tests.
+
+        Raises:
+            TagQueryError: If a tag query is malformed (raised before anything is read).
+        """
+        query = parse_tag_queries(tags) if tags else None
+        return self._iter_cases(query, sample)
+
+    def _iter_cases(self, query, sample: Optional[SampleSpec]) -> Iterator[TestCase]:
+        files = self._dataset_files()
+        match = self._matcher(files, query, sample)
+        # JSONL files are streamed here rather than compiled whole, as are files the tag index rules out
+        whole = [f for f in files if not f.endswith(JSONL_EXTENSIONS) and self._may_match(f, match)]
+        with self._compile_pool(whole) as compiling:
+            for file_path in files:
+                yield from self._iter_file(file_path, match, compiling)
+        if self.cache:
+            self.cache.save_index()
+
+    def count_test_suite(self, tags: List[str] = None, sample: Optional[SampleSpec] = None) -> int:
+        """
+        Number of tests iter_test_suite would yield, counted from the tag index
+        and raw JSONL lines without validating any case (so invalid cases count).
+        """
+        query = parse_tag_queries(tags) if tags else None
+        candidates = self._matching_tags(self._dataset_files(), query)
+        if self.cache:
+            self.cache.save_index()
+        if sample is not None:
+            return len(sample.select(candidates))
+        return len(candidates)
 
-    def load_test_suite(self, tags: List[str] = None) -> List[TestCase]:
+    def _matching_tags(self, files: List[str], query) -> List[Tuple[str, Tuple[str, ...]]]:
+        """(test id, tags) of every test matching the query, unvalidated."""
+        candidates = []
+        for file_path in files:
+            try:
+                if file_path.endswith(JSONL_EXTENSIONS):
+                    file_tags = [self._raw_tags(test_data) for test_data in self._iter_jsonl(file_path)]
+                else:
+                    file_tags = self._file_tags(file_path, {})
+            except Exception:
+                continue  # Reported when the file is loaded
+            candidates.extend(entry for entry in file_tags if query is None or query.matches(*entry))
+        return candidates
+
+    def _matcher(self, files: List[str], query, sample: Optional[SampleSpec]) -> Optional[Callable[[str, Iterable[str]], bool]]:
+        """Predicate on (test id, tags) selecting the tests to yield, or None for all."""
+        if sample is not None and sample.samples:
+            selected = sample.select(self._matching_tags(files, query))
+            return lambda test_id, tags: test_id in selected
+        shard = sample.shard if sample is not None else None
+        if shard is not None:
+            return lambda test_id, tags: (query is None or query.matches(test_id, tags)) and in_shard(test_id, shard)
+        return query.matches if query is not None else None
+
+    def _iter_file(self, file_path: str, match, compiling: Dict[str, Future]) -> Iterator[TestCase]:
+        try:
+            if file_path in compiling:
+                for test_case in self._take_compiled(file_path, compiling[file_path]).tests:
+                    if match is None or match(test_case.id, test_case.tags):
+                        yield test_case
+                return
+
+            if file_path.endswith(JSONL_EXTENSIONS):
+                for test_data in self._iter_jsonl(file_path):
+                    if match is not None and not match(*self._raw_tags(test_data)):
+                        continue
+                    test_case = self._validate(file_path, test_data)
+                    if test_case is not None:
+                        yield test_case
+                return
+
+            # Whole-document files: skip those the tag index shows hold no match
+            if not self._may_match(file_path, match):
+                return
+            for test_case in self._load_cases(file_path):
+                if match is None or match(test_case.id, test_case.tags):
+                    yield test_case
+        except Exception as e:
+            logger.warning(f"Could not load file {file_path}: {e}")
+
+    def _may_match(self, file_path: str, match) -> bool:
+        """False only if the tag index shows the file holds no test selected by `match`."""
+        if match is None or not self.cache:
+            return True
+        try:
+            indexed = self.cache.get_tags(file_path, self.cache.stamp(file_path))
+        except OSError:
+            return True  # Reported when the file is loaded
+        return indexed is None or any(match(*entry) for entry in indexed)
+
+    def load_test_suite(self, tags: List[str] = None, sample: Optional[SampleSpec] = None) -> List[TestCase]:
         """
         Loads test cases from the datasets directory.
         
         Args:
-            tags: Optional list of tags to filter by. If a test matches ANY tag, it is included.
-                  If tags is None or empty, all tests are returned.
+            tags: Optional list of tag queries (plain tags or boolean expressions such as
+                  "json AND NOT adversarial", see evaluator.tag_query). If a test matches
+                  ANY of them, it is included. If tags is None or empty, all tests are returned.
+            sample: Optional sampling and/or sharding of the matching tests (see
+                    evaluator.sampling), decided from the tag index before validation.
+
+        Raises:
+            TagQueryError: If a tag query is malformed.
         """
+        query = parse_tag_queries(tags) if tags else None
+        files = self._dataset_files()
         test_cases = []
-        
-        # Walk through the directory
-        for root, _, files in os.walk(self.base_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                
+
+        if query is None and sample is None:
+            with self._compile_pool(files) as compiling:
+                for file_path in files:
+                    try:
+                        if file_path in compiling:
+                            test_cases.extend(self._take_compiled(file_path, compiling[file_path]).tests)
+                        else:
+                            test_cases.extend(self._load_cases(file_path))
+                    except Exception as e:
+                        logger.warning(f"Could not load file {file_path}: {e}")
+            if self.cache:
+                self.cache.save_index()
+            return test_cases
+
+        # Select from the tag index first; only files holding selected tests get validated
+        parsed = {}  # Files read while indexing, reused if selected
+        compiled = {}  # Files compiled by the pool
+        entries = {}
+        stamps = {}
+        if self.cache:
+            for file_path in files:
+                try:
+                    stamps[file_path] = self.cache.stamp(file_path)
+                except OSError:
+                    continue  # Reported when the file is indexed
+                indexed = self.cache.get_tags(file_path, stamps[file_path])
+                if indexed is not None:
+                    entries[file_path] = indexed
+        # Files missing from the tag index are indexed by compiling them (in parallel if configured)
+        unindexed = [f for f in files if f not in entries]
+        with self._compile_pool(unindexed) as compiling:
+            for file_path in unindexed:
                 try:
-                    loaded_tests = self._load_file(file_path)
-                    for test_data in loaded_tests:
-                        try:
-                            # Validate schema
-                            test_case = TestCase(**test_data)
-                            
-                            # Filter by tags if requested
-                            if tags:
-                                if not any(tag in test_case.tags for tag in tags):
-                                    continue
-                                    
-                            test_cases.append(test_case)
-                        except ValidationError as e:
-                            logger.error(f"Validation error in file {file_path}, test id {test_data.get('id', 'unknown')}: {e}")
+                    if file_path in compiling:
+                        compiled[file_path] = self._take_compiled(file_path, compiling[file_path])
+                        entries[file_path] = compiled[file_path].tags
+                    else:
+                        entries[file_path] = self._file_tags(file_path, parsed)
                 except Exception as e:
                     logger.warning(f"Could not load file {file_path}: {e}")
-                    
+        entries = {file_path: entries[file_path] for file_path in files if file_path in entries}
+
+        if query is not None:
+            selected = self._tag_index(entries, stamps).select(query)
+        else:
+            selected = {file_path: {test_id for test_id, _ in file_tags} for file_path, file_tags in entries.items()}
+        if sample is not None:
+            sampled = sample.select(
+                entry for file_path, file_tags in entries.items()
+                for entry in file_tags if entry[0] in selected.get(file_path, ())
+            )
+            selected = {file_path: ids & sampled for file_path, ids in selected.items()}
+        if self.cache:
+            self.cache.save_index()
+
+        # Only files holding selected tests are compiled
+        to_compile = [f for f in files if selected.get(f) and f not in compiled and f not in parsed]
+        with self._compile_pool(to_compile) as compiling:
+            for file_path in files:
+                ids = selected.get(file_path)
+                if not ids:
+                    continue
+                try:
+                    if file_path in compiled:
+                        file_cases = compiled[file_path].tests
+                    elif file_path in compiling:
+                        file_cases = self._take_compiled(file_path, compiling[file_path]).tests
+                    else:
+                        file_cases = self._load_cases(file_path, parsed.get(file_path))
+                    test_cases.extend(test_case for test_case in file_cases if test_case.id in ids)
+                except Exception as e:
+                    logger.warning(f"Could not load file {file_path}: {e}")
+
         return test_cases
-    
+
+    def _tag_index(self, entries: Dict[str, List[Tuple[str, Tuple[str, ...]]]], stamps: Dict[str, tuple]) -> TagIndex:
+        """
+        TagIndex over the suite's entries, reused from the dataset cache while every
+        file is unchanged. `stamps` are the files' stamps taken before indexing them.
+        """
+        signature = None
+        if self.cache and len(stamps) == len(entries) and stamps.keys() == entries.keys():
+            signature = tuple((file_path, stamps[file_path]) for file_path in entries)
+            index = self.cache.get_tag_index(signature)
+            if index is not None:
+                return index
+        index = TagIndex(entries)
+        if signature is not None:
+            self.cache.put_tag_index(signature, index)
+        return index
+
+    def _dataset_files(self) -> List[str]:
+        """Dataset files under base_path, in walk order."""
+        dataset_files = []
+        for root, _, files in os.walk(self.base_path):
+            for file in files:
+                if file.endswith(DATASET_EXTENSIONS):
+                    dataset_files.append(os.path.join(root, file))
+        return dataset_files
+
+    @contextmanager
+    def _compile_pool(self, file_paths: List[str]) -> Iterator[Dict[str, Future]]:
+        """
+        With several workers, submit every file lacking a fresh compiled entry to a
+        process pool. Yields file path -> Future of its _CompiledFile; results are
+        taken in file order, so the suite order is the same as a serial load.
+        """
+        if self.workers > 1 and self.cache:
+            file_paths = [f for f in file_paths if self._needs_compile(f)]
+        if self.workers <= 1 or len(file_paths) < 2:
+            yield {}
+            return
+        pool = ProcessPoolExecutor(max_workers=min(self.workers, len(file_paths)))
+        try:
+            yield {file_path: pool.submit(_compile_file, file_path) for file_path in file_paths}
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _needs_compile(self, file_path: str) -> bool:
+        try:
+            return not self.cache.is_fresh(file_path, self.cache.stamp(file_path))
+        except OSError:
+            return True  # Let the worker report why the file can't be read
+
+    def _take_compiled(self, file_path: str, future: Future) -> _CompiledFile:
+        """Result of a pool worker: log its validation errors and cache it like a serial load."""
+        compiled = future.result()
+        for test_id, error in compiled.errors:
+            logger.error(f"Validation error in file {file_path}, test id {test_id}: {error}")
+        if self.cache:
+            self.cache.put_tags(file_path, compiled.stamp, compiled.tags)
+            # Files with invalid cases stay uncached so their errors keep being reported
+            if not compiled.errors:
+                self.cache.put(file_path, compiled.stamp, compiled.tests)
+        return compiled
+
+    def _file_tags(self, file_path: str, parsed: dict) -> List[Tuple[str, Tuple[str, ...]]]:
+        """
+        (test id, tags) of every test in a file, from the tag index while the file is
+        unchanged. Files that have to be read are kept in `parsed` as (stamp, raw tests).
+        """
+        stamp = None
+        if self.cache:
+            stamp = self.cache.stamp(file_path)
+            indexed = self.cache.get_tags(file_path, stamp)
+            if indexed is not None:
+                return indexed
+
+        raw_tests = self._load_file(file_path)
+        parsed[file_path] = (stamp, raw_tests)
+        file_tags = [self._raw_tags(test_data) for test_data in raw_tests if isinstance(test_data, dict)]
+
+        if self.cache:
+            self.cache.put_tags(file_path, stamp, file_tags)
+        return file_tags
+
+    @staticmethod
+    def _raw_tags(test_data: dict) -> Tuple[str, Tuple[str, ...]]:
+        """(id, tags) of a raw test case, before validation."""
+        tags = test_data.get('tags')
+        return str(test_data.get('id')), tuple(tags) if isinstance(tags, list) else ()
+
     def load_specific_file(self, file_path: str) -> List[TestCase]:
         """Load a specific test file."""
-        test_cases = []
         try:
-            loaded_tests = self._load_file(file_path)
-            for test_data in loaded_tests:
-                try:
-                    test_cases.append(TestCase(**test_data))
-                except ValidationError as e:
-                    logger.error(f"Validation error in {file_path}: {e}")
+            return self._load_cases(file_path)
         except Exception as e:
             logger.error(f"Failed to load file {file_path}: {e}")
             raise
-            
+
+    def _load_cases(self, file_path: str, parsed: Optional[tuple] = None) -> List[TestCase]:
+        """
+        Validated test cases of a file, served from the compiled cache while the
+        file is unchanged. Invalid cases are logged and skipped.
+
+        Args:
+            parsed: (stamp, raw tests) if the file was already read.
+        """
+        stamp, raw_tests = parsed if parsed else (None, None)
+        if self.cache:
+            if stamp is None:
+                stamp = self.cache.stamp(file_path)
+            cached = self.cache.get(file_path, stamp)
+            if cached is not None:
+                return cached
+
+        if raw_tests is None:
+            raw_tests = self._load_file(file_path)
+        test_cases = []
+        invalid = False
+        for test_data in raw_tests:
+            test_case = self._validate(file_path, test_data)
+            if test_case is None:
+                invalid = True
+            else:
+                test_cases.append(test_case)
+
+        # Files with invalid cases stay uncached so their errors keep being reported
+        if self.cache and not invalid:
+            self.cache.put(file_path, stamp, test_cases)
         return test_cases
 
+    @staticmethod
+    def _validate(file_path: str, test_data: dict) -> Optional[TestCase]:
+        """Validated test case, or None (logged) if the data is invalid."""
+        try:
+            return TestCase(**test_data)
+        except ValidationError as e:
+            logger.error(f"Validation error in file {file_path}, test id {test_data.get('id', 'unknown')}: {e}")
+            return None
+
+    @staticmethod
+    def _open_text(file_path: str) -> io.TextIOBase:
+        """Open a dataset file for reading text, decompressing .gz and .zst files."""
+        if file_path.endswith('.gz'):
+            return gzip.open(file_path, 'rt', encoding='utf-8')
+        if file_path.endswith('.zst'):
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError(f"Reading {file_path} requires the 'zstandard' package (pip install zstandard)")
+            return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True), encoding='utf-8')
+        return open(file_path, 'r', encoding='utf-8')
+
+    def _iter_jsonl(self, file_path: str) -> Iterator[dict]:
+        """Raw test case dictionaries of a JSONL file, one per non-empty line."""
+        with self._open_text(file_path) as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    test_data = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"Invalid JSON on line {line_no}: {e}")
+                if not isinstance(test_data, dict):
+                    raise ValueError(f"Line {line_no} is not a JSON object")
+                yield test_data
+
     def _load_file(self, file_path: str) -> List[dict]:
         """Reads a file and returns a list of raw test case dictionaries."""
-        if file_path.endswith('.json'):
+        if file_path.endswith(JSONL_EXTENSIONS):
+            return list(self._iter_jsonl(file_path))
+        elif file_path.endswith('.json'):
             with open(file_path, 'r') as f:
                 data = json.load(f)
                 # Support single object or list of objects
@@ -75,10 +440,57 @@ class TestLoader:
                     return data
         elif file_path.endswith('.yaml') or file_path.endswith('.yml'):
             with open(file_path, 'r') as f:
-                data = yaml.safe_load(f)
+                data = yaml.load(f, Loader=YAML_LOADER)
                 if isinstance(data, dict):
                     return [data]
                 elif isinstance(data, list):
                     return data
         
         return []
+
+
+class PendingTests:
+    """
+    Lazily loaded suite minus tests already completed (or whose results are
+    reused, see evaluator.incremental), counting every test read so the suite
+    size is known once it has been consumed.
+    """
+
+    def __init__(
+        self,
+        tests: Iterable[TestCase],
+        done_ids: Collection[str] = (),
+        reuse: Optional[Callable[[TestCase], bool]] = None,
+        count: Optional[Callable[[], int]] = None,
+    ):
+        """
+        Args:
+            count: Counts the whole suite, for runs stopped before reading all of it
+                (e.g. TestLoader.count_test_suite); a list's length is used if None
+        """
+        self._tests = tests
+        self._done_ids = done_ids
+        self._reuse = reuse
+        if count is None and isinstance(tests, list):
+            count = tests.__len__
+        self._count = count
+        self.read = 0
+        self.exhausted = False
+
+    @property
+    def total(self) -> int:
+        """Size of the suite: every test read once it was consumed, else counted (or as many as were read)."""
+        if not self.exhausted and self._count is not None:
+            self.read = max(self.read, self._count())
+            self.exhausted = True
+        return self.read
+
+    def __iter__(self) -> Iterator[TestCase]:
+        for test in self._tests:
+            self.read += 1
+            if test.id in self._done_ids:
+                continue
+            if self._reuse is not None and self._reuse(test):
+                continue
+            yield test
+        self.exhausted = True
@@ -0,0 +1,68 @@
+"""
+Merge the runs of a sharded suite into one Run.
+
+Each machine runs its shard (`run_suite --shard i/N`) against its own or a
+shared database; this collects the shard runs and writes one merged Run, with
+metrics over all of their results, into the DATABASE_URL database:
+
+    python -m evaluator.merge_runs RUN_ID [RUN_ID ...] [--source-db URL ...]
+
+Every run id is looked up in each --source-db (default: DATABASE_URL).
+"""
+import argparse
+import logging
+import sys
+
+from sqlalchemy.orm import sessionmaker
+
+from db.migrations import upgrade_schema
+from db.models import Base, Run, TestResult
+from db.session import DATABASE_URL, SessionLocal, engine, make_engine
+from evaluator.persistence import merge_runs
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("merge_runs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the runs of a sharded suite into one Run")
+    parser.add_argument("run_ids", nargs="+", help="Runs to merge, in order of precedence")
+    parser.add_argument("--source-db", action="append", default=[],
+                        help="Database URL holding shard runs (repeatable; default: DATABASE_URL)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    source_sessions = [
+        SessionLocal() if url == DATABASE_URL else sessionmaker(bind=make_engine(url))()
+        for url in (args.source_db or [DATABASE_URL])
+    ]
+    db = SessionLocal()
+    try:
+        sources = []
+        for run_id in args.run_ids:
+            for session in source_sessions:
+                run = session.query(Run).filter(Run.id == run_id).first()
+                if run:
+                    sources.append((run, session.query(TestResult).filter(TestResult.run_id == run_id).all()))
+                    break
+            else:
+                logger.error(f"Run {run_id} not found")
+                sys.exit(1)
+
+        try:
+            merged = merge_runs(db, sources)
+        except ValueError as e:
+            logger.error(str(e))
+            sys.exit(1)
+        print(f"Merged {len(sources)} runs into {merged.id}: {merged.status}, "
+              f"pass rate {(merged.pass_rate or 0) * 100:.1f}% over {merged.total_tests} tests")
+    finally:
+        db.close()
+        for session in source_sessions:
+            session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Test ordering from run history.
+
+Used by CI to surface failures early: tests that fail most often go first and,
+among similar failure rates, the fastest ones, so a red build is detected
+after as few slow requests as possible.
+"""
+from typing import Dict, List
+
+from app.schemas.test_case import TestCase
+from evaluator.persistence import TestHistory
+from metrics.latency import percentile
+
+
+def failure_rate(history: TestHistory) -> float:
+    """Laplace-smoothed failure rate, so a test never seen before scores 0.5."""
+    return (history.failures + 1) / (history.runs + 2)
+
+
+def order_by_history(tests: List[TestCase], history: Dict[str, TestHistory]) -> List[TestCase]:
+    """
+    Sort tests by descending historical failure rate, then ascending mean latency.
+
+    Tests without history are treated as 50% likely to fail with median latency.
+    The sort is stable, so ties keep their original order.
+    """
+    latencies = [h.avg_latency_ms for h in history.values() if h.avg_latency_ms is not None]
+    median_latency = percentile(latencies, 50) or 0.0
+
+    def key(test: TestCase):
+        h = history.get(test.id)
+        if h is None:
+            return (-0.5, median_latency)
+        latency = h.avg_latency_ms if h.avg_latency_ms is not None else median_latency
+        return (-failure_rate(h), latency)
+
+    return sorted(tests, key=key)
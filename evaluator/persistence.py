@@ -0,0 +1,339 @@
+"""
+Persistence helpers shared by the API runner service and the CLI runner.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+from app.schemas.run import RunCreate
+from db.models import Run, TestResult
+from db.session import SessionLocal
+from evaluator.base import Judgment
+from evaluator.llm.usage import Usage
+from evaluator.runner import TestOutcome
+from metrics.latency import mean, percentile
+
+logger = logging.getLogger(__name__)
+
+# Write-behind defaults: flush after this many rows or this many seconds, whichever comes first
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_FLUSH_INTERVAL_S = 1.0
+# A batch whose transaction fails is retried this many times, after a growing delay
+WRITE_RETRIES = 2
+WRITE_RETRY_DELAY_S = 0.5
+
+# Run.status values
+RUN_RUNNING = "running"
+RUN_COMPLETED = "completed"
+RUN_FAILED = "failed"
+RUN_CANCELLED = "cancelled"
+RUN_TRUNCATED = "truncated"  # Stopped by its time/token/request budget
+RUN_INCOMPLETE = "incomplete"  # Ran to the end but some results could not be stored; resuming re-runs them
+
+# Statuses of runs that stopped before every test ran (or whose results are missing)
+PARTIAL_STATUSES = (RUN_CANCELLED, RUN_TRUNCATED, RUN_INCOMPLETE)
+
+
+def completed_test_ids(db: Session, run_id: str) -> Set[str]:
+    """Test ids that already have a stored result for this run (used to resume)."""
+    rows = db.query(TestResult.test_id).filter(TestResult.run_id == run_id).all()
+    return {test_id for (test_id,) in rows}
+
+
+@dataclass
+class TestHistory:
+    """Aggregate of a test's stored results across past runs."""
+    runs: int
+    failures: int
+    avg_latency_ms: Optional[float]
+
+
+def test_history(db: Session, test_ids: Iterable[str]) -> Dict[str, TestHistory]:
+    """Past result counts, failures and mean latency per test id (tests never run are absent)."""
+    rows = db.query(
+        TestResult.test_id,
+        func.count(TestResult.id),
+        func.sum(case((TestResult.status == "PASS", 0), else_=1)),
+        func.avg(TestResult.latency_ms),
+    ).filter(TestResult.test_id.in_(list(test_ids))).group_by(TestResult.test_id).all()
+    return {
+        test_id: TestHistory(runs=runs, failures=int(failures or 0), avg_latency_ms=avg_latency)
+        for test_id, runs, failures, avg_latency in rows
+    }
+
+
+def judgment_columns(judgment: Optional[Judgment]) -> Dict[str, object]:
+    """TestResult judge_* columns for an LLM judge's assessment (all None if no judge ran)."""
+    return {
+        "judge_score": judgment.score if judgment else None,
+        "judge_reasoning": judgment.reasoning if judgment else None,
+        "judge_issues": json.dumps(judgment.issues) if judgment else None,
+    }
+
+
+def judge_usage_columns(usage: Optional[Usage], cost_usd: Optional[float]) -> Dict[str, object]:
+    """TestResult judge token and cost columns for the model calls made to judge an output."""
+    return {
+        "judge_prompt_tokens": usage.prompt_tokens if usage else None,
+        "judge_completion_tokens": usage.completion_tokens if usage else None,
+        "judge_cost_usd": cost_usd,
+    }
+
+
+def build_result_row(run_id: str, outcome: TestOutcome) -> TestResult:
+    """Map an evaluated test outcome to its TestResult row."""
+    usage = outcome.usage
+    return TestResult(
+        run_id=run_id,
+        test_id=outcome.test.id,
+        test_name=outcome.test.name,
+        input_prompt=outcome.test.prompt,
+        output_text=outcome.output,
+        status=outcome.status,
+        failure_reasons="\n".join(outcome.reasons),
+        latency_ms=outcome.latency_ms,
+        ttft_ms=outcome.ttft_ms,
+        output_tokens=outcome.output_tokens,
+        tokens_per_sec=outcome.tokens_per_sec,
+        cached=outcome.cached,
+        prompt_tokens=usage.prompt_tokens if usage else None,
+        completion_tokens=usage.completion_tokens if usage else None,
+        cached_prompt_tokens=usage.cached_prompt_tokens if usage else None,
+        total_tokens=usage.total_tokens if usage else None,
+        cost_usd=outcome.cost_usd,
+        **judge_usage_columns(outcome.judge_usage, outcome.judge_cost_usd),
+        **judgment_columns(outcome.judgment),
+        fingerprint=outcome.test.fingerprint
+    )
+
+
+def load_run_params(run_record: Run) -> RunCreate:
+    """Parameters a run was started with, for resuming it."""
+    if run_record.params:
+        return RunCreate.model_validate_json(run_record.params)
+    # Runs created before parameters were stored
+    tags = None if run_record.tags == "all" else run_record.tags.split(",")
+    return RunCreate(model_name=run_record.model_name, tags=tags)
+
+
+def _sum_cost(items: Iterable[Tuple[Optional[float], Optional[int], Optional[int]]]) -> Optional[float]:
+    """
+    Sum (cost, prompt_tokens, completion_tokens) rows. Rows without tokens (e.g.
+    cache hits) cost nothing; tokens without a cost mean an unpriced model, so
+    the total is unknown (None) rather than understated.
+    """
+    total = 0.0
+    for cost, prompt_tokens, completion_tokens in items:
+        if cost is not None:
+            total += cost
+        elif prompt_tokens or completion_tokens:
+            return None
+    return total
+
+
+def finalize_run(
+    db: Session,
+    run_record: Run,
+    total_tests: int,
+    status: str = RUN_COMPLETED,
+    budget_exhausted: Optional[str] = None,
+    rows_lost: int = 0,
+) -> Tuple[int, int]:
+    """
+    Compute final metrics over every stored result of the run, including results
+    written before a resume, and set its final status.
+
+    Args:
+        db: Database session
+        run_record: Run to update
+        total_tests: Number of tests in the suite (tests that errored count as not passed)
+        status: Final status. For partial runs (cancelled, truncated) the pass rate
+            covers only the tests that ran.
+        budget_exhausted: Budget that truncated the run, if any
+        rows_lost: Results the ResultWriter failed to store; a completed run with
+            lost results is finalized as incomplete instead
+
+    Returns:
+        (pass_count, completed_count) over all stored results
+    """
+    rows = db.query(
+        TestResult.status, TestResult.latency_ms, TestResult.ttft_ms, TestResult.tokens_per_sec,
+        TestResult.prompt_tokens, TestResult.completion_tokens, TestResult.cost_usd,
+        TestResult.judge_prompt_tokens, TestResult.judge_completion_tokens, TestResult.judge_cost_usd,
+        TestResult.copied_from_run_id
+    ).filter(TestResult.run_id == run_record.id).all()
+    pass_count = sum(1 for row in rows if row.status == "PASS")
+    if rows:
+        latencies = [row.latency_ms for row in rows if row.latency_ms is not None]
+        ttfts = [row.ttft_ms for row in rows if row.ttft_ms is not None]
+        throughputs = [row.tokens_per_sec for row in rows if row.tokens_per_sec is not None]
+        denominator = len(rows) if status in PARTIAL_STATUSES else max(total_tests, len(rows))
+        run_record.pass_rate = pass_count / denominator
+        run_record.avg_latency = mean(latencies) or 0.0
+        run_record.p95_latency = percentile(latencies, 95)
+        run_record.avg_ttft_ms = mean(ttfts)
+        run_record.p95_ttft_ms = percentile(ttfts, 95)
+        run_record.avg_tokens_per_sec = mean(throughputs)
+        # Results copied from a baseline were paid for by that run
+        spent = [row for row in rows if row.copied_from_run_id is None]
+        run_record.prompt_tokens = sum((row.prompt_tokens or 0) + (row.judge_prompt_tokens or 0) for row in spent)
+        run_record.completion_tokens = sum((row.completion_tokens or 0) + (row.judge_completion_tokens or 0) for row in spent)
+        run_record.total_tokens = run_record.prompt_tokens + run_record.completion_tokens
+        generation_cost = _sum_cost((row.cost_usd, row.prompt_tokens, row.completion_tokens) for row in spent)
+        run_record.judge_cost_usd = _sum_cost(
+            (row.judge_cost_usd, row.judge_prompt_tokens, row.judge_completion_tokens) for row in spent
+        )
+        run_record.cost_usd = (
+            generation_cost + run_record.judge_cost_usd
+            if generation_cost is not None and run_record.judge_cost_usd is not None else None
+        )
+    if rows_lost and status == RUN_COMPLETED:
+        logger.warning(f"Run {run_record.id} lost {rows_lost} results; marking it {RUN_INCOMPLETE}")
+        status = RUN_INCOMPLETE
+    run_record.total_tests = total_tests
+    run_record.status = status
+    run_record.budget_exhausted = budget_exhausted
+    db.commit()
+    return pass_count, len(rows)
+
+
+def merge_runs(db: Session, sources: List[Tuple[Run, List[TestResult]]]) -> Run:
+    """
+    Combine the results of several runs, typically the shards of one suite run
+    on different machines, into a new Run in `db`.
+
+    Sources may come from other databases. The merged run takes its model and
+    parameters from the first source (without its shard), and its status is
+    completed only if every source completed. A test with results in several
+    sources keeps the first one.
+
+    Raises:
+        ValueError: If a source run is still running
+    """
+    for run, _ in sources:
+        if run.status == RUN_RUNNING:
+            raise ValueError(f"Run {run.id} is still running")
+
+    first = sources[0][0]
+    params = load_run_params(first).model_copy(update={"shard": None})
+    partial = [run for run, _ in sources if run.status != RUN_COMPLETED]
+    merged = Run(
+        model_name=first.model_name,
+        provider=first.provider,
+        tags=first.tags,
+        status=RUN_RUNNING,
+        params=params.model_dump_json(),
+    )
+    db.add(merged)
+    db.flush()
+
+    columns = [column.name for column in TestResult.__table__.columns if column.name not in ("id", "run_id")]
+    seen: Set[str] = set()
+    for run, results in sources:
+        for result in results:
+            if result.test_id in seen:
+                logger.warning(f"Skipping duplicate result for test {result.test_id} from run {run.id}")
+                continue
+            seen.add(result.test_id)
+            db.add(TestResult(run_id=merged.id, **{name: getattr(result, name) for name in columns}))
+    db.commit()
+
+    finalize_run(
+        db,
+        merged,
+        total_tests=sum(run.total_tests or 0 for run, _ in sources),
+        status=partial[0].status if partial else RUN_COMPLETED,
+        budget_exhausted=next((run.budget_exhausted for run in partial if run.budget_exhausted), None),
+    )
+    return merged
+
+
+_STOP = object()
+
+
+class ResultWriter:
+    """
+    Write-behind persistence stage for TestResult rows.
+
+    Rows are queued by the runner and bulk-inserted by a background task in one
+    transaction per batch. A batch is flushed when it reaches `batch_size` rows or
+    when its oldest row has waited `flush_interval_s`, so results become visible
+    through the API within that delay. A batch that still fails after
+    WRITE_RETRIES retries is counted in `rows_lost` (see finalize_run).
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_interval_s: Optional[float] = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.batch_size = max(1, batch_size or int(os.getenv("RESULT_BATCH_SIZE", DEFAULT_BATCH_SIZE)))
+        self.flush_interval_s = flush_interval_s or float(os.getenv("RESULT_FLUSH_INTERVAL_S", DEFAULT_FLUSH_INTERVAL_S))
+        self.session_factory = session_factory
+        self.rows_written = 0
+        self.rows_lost = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background flush task. Must be called from the running event loop."""
+        self._worker = asyncio.create_task(self._run())
+
+    async def put(self, row: TestResult):
+        await self._queue.put(row)
+
+    async def close(self):
+        """Flush every queued row and stop the background task."""
+        if self._worker is None:
+            return
+        await self._queue.put(_STOP)
+        await self._worker
+        self._worker = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        batch: List[TestResult] = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - loop.time()) if batch else None
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+            if item is _STOP:
+                break
+            if item is not None:
+                if not batch:
+                    deadline = loop.time() + self.flush_interval_s
+                batch.append(item)
+            if batch and (len(batch) >= self.batch_size or loop.time() >= deadline):
+                await asyncio.to_thread(self._write, batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(self._write, batch)
+
+    def _write(self, batch: List[TestResult]):
+        for attempt in range(WRITE_RETRIES + 1):
+            db = self.session_factory()
+            try:
+                db.add_all(batch)
+                db.commit()
+                self.rows_written += len(batch)
+                return
+            except Exception as e:
+                db.rollback()
+                if attempt == WRITE_RETRIES:
+                    # Lost rows are re-run when the run is resumed
+                    self.rows_lost += len(batch)
+                    logger.error(f"Failed to write {len(batch)} test results: {e}")
+                    return
+                logger.warning(f"Failed to write {len(batch)} test results, retrying: {e}")
+            finally:
+                db.close()
+            time.sleep(WRITE_RETRY_DELAY_S * (attempt + 1))
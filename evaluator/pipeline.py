@@ -0,0 +1,96 @@
+"""
+Cost-ordered evaluation of outputs.
+
+Evaluators declare what evaluating one output costs (BaseEvaluator.cost).
+EvaluatorPipeline applies the deterministic ones first, to every output, and
+evaluators that call a model (the LLM judge) only to outputs that passed
+them all: a failed check already decides the verdict, so judging the output
+would only spend tokens and time.
+
+Model-calling evaluations can also be run one output at a time on the
+process-wide judge pool (`judge_pool`, see evaluator.base.get_judge_pool),
+which lets the runner judge earlier outputs while later ones are still being
+generated.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+from app.schemas.test_case import TestCase
+from evaluator.base import COST_MODEL_CALL, BaseEvaluator, EvaluationResult, Judgment, get_judge_pool
+from evaluator.llm.usage import UsageTracker
+
+
+@dataclass
+class OutputEvaluation:
+    """What the evaluators of one pipeline stage made of an output."""
+    reasons: List[str] = field(default_factory=list)  # One per failed evaluator
+    usage: Optional[UsageTracker] = None  # Model calls made to evaluate it (None if there were none)
+    judgment: Optional[Judgment] = None  # The first judge's assessment, if a judge ran
+
+    @property
+    def passed(self) -> bool:
+        return not self.reasons
+
+    def add(self, evaluator: BaseEvaluator, result: EvaluationResult):
+        if not result.passed:
+            self.reasons.append(f"{evaluator.__class__.__name__}: {result.reason}")
+        if result.usage is not None:
+            if self.usage is None:
+                self.usage = UsageTracker()
+            self.usage.records.extend(result.usage.records)
+        if result.judgment is not None and self.judgment is None:
+            self.judgment = result.judgment
+
+
+class EvaluatorPipeline:
+    """
+    Evaluators split by cost: `checks` run on every output, `judges` only on
+    outputs that passed every check (and every earlier judge).
+    """
+
+    def __init__(self, evaluators: List[BaseEvaluator]):
+        """
+        Args:
+            evaluators: Evaluators to apply; ties in cost keep their given order
+        """
+        ordered = sorted(evaluators, key=lambda evaluator: evaluator.cost)
+        self.checks = [evaluator for evaluator in ordered if evaluator.cost < COST_MODEL_CALL]
+        self.judges = [evaluator for evaluator in ordered if evaluator.cost >= COST_MODEL_CALL]
+
+    @property
+    def judge_pool(self) -> ThreadPoolExecutor:
+        """Threads running `judge` calls: the process-wide judge pool, shared with batch judging."""
+        return get_judge_pool()
+
+    def needs_judging(self, passed_checks: bool) -> bool:
+        """Whether the judges still have to run on an output, given whether it passed every check."""
+        return bool(self.judges) and passed_checks
+
+    def evaluate(self, pairs: Sequence[Tuple[TestCase, str]]) -> List[OutputEvaluation]:
+        """Checks and then judges for a batch of (test, output) pairs, in order."""
+        evaluations = self.check(pairs)
+        for evaluator in self.judges:
+            undecided = [i for i, evaluation in enumerate(evaluations) if evaluation.passed]
+            if not undecided:
+                break
+            for i, result in zip(undecided, evaluator.evaluate_batch([pairs[i] for i in undecided])):
+                evaluations[i].add(evaluator, result)
+        return evaluations
+
+    def check(self, pairs: Sequence[Tuple[TestCase, str]]) -> List[OutputEvaluation]:
+        """The deterministic checks for a batch of pairs, one evaluate_batch call per evaluator."""
+        evaluations = [OutputEvaluation() for _ in pairs]
+        for evaluator in self.checks:
+            for evaluation, result in zip(evaluations, evaluator.evaluate_batch(pairs)):
+                evaluation.add(evaluator, result)
+        return evaluations
+
+    def judge(self, pair: Tuple[TestCase, str]) -> OutputEvaluation:
+        """The judges for one output that passed its checks, stopping at the first that fails it."""
+        evaluation = OutputEvaluation()
+        for evaluator in self.judges:
+            evaluation.add(evaluator, evaluator.evaluate_batch([pair])[0])
+            if not evaluation.passed:
+                break
+        return evaluation
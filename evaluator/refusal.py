@@ -0,0 +1,179 @@
+"""
+Refusal detection with pluggable phrase packs.
+
+A phrase pack is a versioned JSON file of refusal phrases for one language or
+domain:
+
+    {"name": "en-core", "version": 1, "language": "en", "domain": "general",
+     "phrases": ["i'm sorry", "i can't", ...]}
+
+The bundled packs live in evaluator/refusal_packs/. REFUSAL_PACKS selects
+others: a comma-separated list of pack files or bundled pack names (e.g.
+"en,/etc/llm/medical_refusals.json").
+
+All phrases of all packs are merged into a trie and compiled into a single
+regular expression, so an output is lowercased once and scanned once however
+many phrases the packs hold: at each position the scan follows only the trie
+branch the text selects. Matches are non-overlapping, leftmost-longest, and
+report their span in the original output and their source pack.
+"""
+import glob
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BUNDLED_PACKS_DIR = os.path.join(os.path.dirname(__file__), "refusal_packs")
+
+
+@dataclass(frozen=True)
+class PhrasePack:
+    name: str
+    version: int
+    phrases: List[str]
+    language: Optional[str] = None
+    domain: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}@{self.version}"
+
+
+@dataclass(frozen=True)
+class RefusalMatch:
+    phrase: str  # The pack phrase that matched (as written in the pack)
+    text: str  # The matched text (as written in the output)
+    start: int
+    end: int
+    pack: str  # Label ("name@version") of the pack the phrase came from
+
+
+def load_pack(path: str) -> PhrasePack:
+    """
+    Read a phrase pack file.
+
+    Raises:
+        ValueError: If the file is not a valid phrase pack
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"Phrase pack {path} must be a JSON object")
+    missing = [key for key in ("name", "version", "phrases") if key not in data]
+    if missing:
+        raise ValueError(f"Phrase pack {path} is missing {', '.join(missing)}")
+    phrases = data["phrases"]
+    if not isinstance(phrases, list) or not all(isinstance(p, str) and p.strip() for p in phrases):
+        raise ValueError(f"Phrase pack {path}: phrases must be a list of non-empty strings")
+    return PhrasePack(
+        name=str(data["name"]),
+        version=int(data["version"]),
+        phrases=phrases,
+        language=data.get("language"),
+        domain=data.get("domain"),
+    )
+
+
+def _resolve_pack_path(ref: str) -> str:
+    """A pack file path, or the name of a bundled pack (e.g. "en")."""
+    if os.path.exists(ref):
+        return ref
+    return os.path.join(BUNDLED_PACKS_DIR, ref if ref.endswith(".json") else f"{ref}.json")
+
+
+def default_pack_paths() -> List[str]:
+    """Packs named by REFUSAL_PACKS, or every bundled pack."""
+    refs = [ref.strip() for ref in os.getenv("REFUSAL_PACKS", "").split(",") if ref.strip()]
+    if refs:
+        return [_resolve_pack_path(ref) for ref in refs]
+    return sorted(glob.glob(os.path.join(BUNDLED_PACKS_DIR, "*.json")))
+
+
+def _trie_pattern(node: Dict[str, dict]) -> str:
+    """Regex matching the phrases of a trie; an optional tail makes a shorter phrase yield to a longer one."""
+    branches = []
+    for char in sorted(key for key in node if key):
+        branches.append(re.escape(char) + _trie_pattern(node[char]))
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        return f"(?:{body})?"
+    return body
+
+
+class RefusalDetector:
+    """
+    Finds refusal phrases from one or more packs in a single pass over the text.
+    """
+
+    def __init__(self, packs: List[PhrasePack]):
+        self.packs = packs
+        self._pack_by_phrase: Dict[str, str] = {}  # Lowercased phrase -> label of the first pack defining it
+        self._phrase_by_key: Dict[str, str] = {}
+        trie: Dict[str, dict] = {}
+        for pack in packs:
+            for phrase in pack.phrases:
+                key = phrase.lower()
+                if key in self._pack_by_phrase:
+                    continue
+                self._pack_by_phrase[key] = pack.label
+                self._phrase_by_key[key] = phrase
+                node = trie
+                for char in key:
+                    node = node.setdefault(char, {})
+                node[""] = {}
+        pattern = _trie_pattern(trie)
+        self._pattern = re.compile(pattern) if trie else None
+        # For the rare text whose lowercase form has a different length, so spans can't be mapped back
+        self._ignorecase_pattern = re.compile(pattern, re.IGNORECASE) if trie else None
+
+    @classmethod
+    def from_files(cls, paths: List[str]) -> "RefusalDetector":
+        return cls([load_pack(path) for path in paths])
+
+    def _match(self, text: str, m: "re.Match") -> RefusalMatch:
+        key = m.group().lower()
+        if key not in self._pack_by_phrase:
+            # Case-insensitive matching folds a few characters that lower() maps differently
+            key = next(k for k in self._pack_by_phrase if re.fullmatch(re.escape(k), m.group(), re.IGNORECASE))
+        return RefusalMatch(
+            phrase=self._phrase_by_key[key],
+            text=text[m.start():m.end()],
+            start=m.start(),
+            end=m.end(),
+            pack=self._pack_by_phrase[key],
+        )
+
+    def _scan(self, text: str) -> Iterator["re.Match"]:
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            return self._pattern.finditer(lowered)
+        return self._ignorecase_pattern.finditer(text)
+
+    def search(self, text: str) -> Optional[RefusalMatch]:
+        """First refusal phrase in the text, or None."""
+        return next(self.finditer(text), None)
+
+    def finditer(self, text: str) -> Iterator[RefusalMatch]:
+        """Every refusal phrase in the text, left to right."""
+        if self._pattern is None:
+            return
+        for m in self._scan(text):
+            yield self._match(text, m)
+
+
+_default_detector: Optional[RefusalDetector] = None
+
+
+def get_refusal_detector() -> RefusalDetector:
+    """Detector over the default packs (compiled once per process)."""
+    global _default_detector
+    if _default_detector is None:
+        _default_detector = RefusalDetector.from_files(default_pack_paths())
+        logger.debug(f"Refusal packs: {', '.join(pack.label for pack in _default_detector.packs)}")
+    return _default_detector
@@ -0,0 +1,143 @@
+"""
+Re-score the stored outputs of finished runs with the current evaluators.
+
+No model is called for generation: outputs are read back from the database a
+page at a time, evaluated in batches (BaseEvaluator.evaluate_batch) against
+the current definition of their test case, and each result's status and
+failure reasons (and, with --judge, its judge score, reasoning, issues and
+judge token usage and cost; outputs failing a deterministic check are not
+judged) are rewritten in place before the run's metrics are recomputed:
+
+    python -m evaluator.rescore RUN_ID [RUN_ID ...] [--judge grounding] [--batch-size 1000]
+
+Results whose test case is no longer in the datasets keep their stored verdict.
+"""
+import argparse
+import logging
+import sys
+from typing import Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.schemas.test_case import TestCase
+from db.migrations import upgrade_schema
+from db.models import Base, Run, TestResult
+from db.session import SessionLocal, engine
+from evaluator.base import BaseEvaluator
+from evaluator.evaluators.compliance import ComplianceEvaluator
+from evaluator.evaluators.format import FormatEvaluator
+from evaluator.llm.usage import track_usage
+from evaluator.loader import TestLoader
+from evaluator.persistence import RUN_RUNNING, finalize_run, judge_usage_columns, judgment_columns
+from evaluator.pipeline import EvaluatorPipeline
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("rescore")
+
+# Stored results read, evaluated and written back per batch
+DEFAULT_BATCH_SIZE = 1000
+
+
+def rescore_run(
+    db: Session,
+    run: Run,
+    tests: Dict[str, TestCase],
+    evaluators: List[BaseEvaluator],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Dict[str, int]:
+    """
+    Re-evaluate every stored result of a run and recompute its metrics.
+
+    Returns:
+        Counts of results "rescored", "changed" (verdict flipped) and "skipped"
+        (test case no longer defined)
+    """
+    counts = {"rescored": 0, "changed": 0, "skipped": 0}
+    pipeline = EvaluatorPipeline(evaluators)
+    last_id = ""
+    while True:
+        # Keyset pagination keeps memory flat and lets each page be written back before the next is read
+        rows = db.query(TestResult.id, TestResult.test_id, TestResult.output_text, TestResult.status).filter(
+            TestResult.run_id == run.id, TestResult.id > last_id
+        ).order_by(TestResult.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        known = [row for row in rows if row.test_id in tests]
+        counts["skipped"] += len(rows) - len(known)
+        evaluated = pipeline.evaluate([(tests[row.test_id], row.output_text or "") for row in known])
+        updates = []
+        for row, evaluation in zip(known, evaluated):
+            status = "PASS" if evaluation.passed else "FAIL"
+            if status != row.status:
+                counts["changed"] += 1
+            update = {"id": row.id, "status": status, "failure_reasons": "\n".join(evaluation.reasons)}
+            if pipeline.judges:
+                # Stored judgments, and what they cost, are only replaced when a judge is applied
+                update.update(judgment_columns(evaluation.judgment))
+                judge_usage = evaluation.usage
+                update.update(judge_usage_columns(
+                    judge_usage.total() if judge_usage else None, judge_usage.cost_usd() if judge_usage else None
+                ))
+            updates.append(update)
+        db.bulk_update_mappings(TestResult, updates)
+        db.commit()
+        counts["rescored"] += len(updates)
+
+    finalize_run(db, run, total_tests=run.total_tests or 0, status=run.status, budget_exhausted=run.budget_exhausted)
+    return counts
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Re-score stored run outputs with the current evaluators")
+    parser.add_argument("run_ids", nargs="+", help="Runs to re-score")
+    parser.add_argument("--judge", choices=["grounding", "hallucination", "quality"],
+                        help="Also apply the LLM judge with this evaluation type")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Results evaluated per batch (default {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--datasets", default="datasets", help="Directory holding the current test definitions")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    evaluators: List[BaseEvaluator] = [FormatEvaluator(), ComplianceEvaluator()]
+    if args.judge:
+        from evaluator.evaluators.llm_judge import LLMJudgeEvaluator
+        evaluators.append(LLMJudgeEvaluator(evaluation_type=args.judge))
+
+    tests = {test.id: test for test in TestLoader(base_path=args.datasets).load_test_suite()}
+    db = SessionLocal()
+    try:
+        runs = []
+        for run_id in args.run_ids:
+            run = db.query(Run).filter(Run.id == run_id).first()
+            if run is None:
+                logger.error(f"Run {run_id} not found")
+                sys.exit(1)
+            if run.status == RUN_RUNNING:
+                logger.error(f"Run {run_id} is still running")
+                sys.exit(1)
+            runs.append(run)
+
+        with track_usage() as judge_usage:
+            for run in runs:
+                previous_pass_rate = run.pass_rate
+                counts = rescore_run(db, run, tests, evaluators, batch_size=max(1, args.batch_size))
+                print(f"Rescored {counts['rescored']} results of {run.id}: "
+                      f"pass rate {(previous_pass_rate or 0) * 100:.1f}% -> {(run.pass_rate or 0) * 100:.1f}%, "
+                      f"{counts['changed']} verdicts changed, {counts['skipped']} skipped (test no longer defined)")
+        usage = judge_usage.total()
+        if usage is not None:
+            cost = judge_usage.cost_usd()
+            print(f"Judge usage: {usage.total_tokens} tokens" + (f", ${cost:.4f}" if cost is not None else ""))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
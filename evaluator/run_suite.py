@@ -1,11 +1,30 @@
 import os
 import sys
 import argparse
-import time
-from evaluator.llm.gemini_client import GeminiAdapter
-from evaluator.loader import TestLoader
-from db.models import Base, Run, TestResult
+import asyncio
+from evaluator.llm.factory import DEFAULT_MODELS, create_adapter
+from evaluator.llm.cache import CACHE_MODES, CachedAdapter
+from evaluator.loader import PendingTests, TestLoader
+from evaluator.runner import Runner, TestOutcome
+from evaluator.budget import RunBudget
+from evaluator.incremental import Baseline
+from evaluator.sampling import SampleSpec
+from evaluator.persistence import (
+    RUN_CANCELLED,
+    RUN_COMPLETED,
+    RUN_INCOMPLETE,
+    RUN_RUNNING,
+    RUN_TRUNCATED,
+    ResultWriter,
+    build_result_row,
+    completed_test_ids,
+    finalize_run,
+    load_run_params,
+)
+from app.schemas.run import RunCreate
+from db.models import Base, Run
 from db.session import engine, SessionLocal
+from db.migrations import upgrade_schema
 import logging
 
 # Basic logging setup
@@ -19,125 +38,217 @@ def run_suite():
     
     # Initialize DB (create tables)
     Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
     db = SessionLocal()
     
     try:
         # Parse args
         parser = argparse.ArgumentParser(description="Run LLM Reliability Suite")
-        parser.add_argument("--tags", nargs="+", help="Filter tests by tags (e.g. json refusal)")
+        parser.add_argument("--tags", nargs="+", help="Filter tests by tags or tag queries, ORed (e.g. json refusal, or \"json AND NOT adversarial\")")
         parser.add_argument("--model", help="Override model name")
+        parser.add_argument("--concurrency", type=int, help="Max in-flight requests (default: MAX_CONCURRENCY env or 8)")
+        parser.add_argument("--temperature", type=float, help="Generation temperature (provider default if unset)")
+        parser.add_argument("--cache", choices=CACHE_MODES, default=os.getenv("RESPONSE_CACHE_MODE", "deterministic"),
+                            help="Response cache mode: 'deterministic' serves hits only at temperature 0, 'force' always")
+        parser.add_argument("--resume", metavar="RUN_ID", help="Resume an interrupted run, skipping tests that already have results")
+        parser.add_argument("--max-duration", type=float, metavar="SECONDS", help="Wall-clock budget; stops the run when spent")
+        parser.add_argument("--max-tokens", type=int, help="Token budget (generation + judge); stops the run when spent")
+        parser.add_argument("--max-requests", type=int, help="Provider request budget; no new requests once spent")
+        parser.add_argument("--sample-fraction", type=float, help="Run this share of each tag's tests (at least one per tag)")
+        parser.add_argument("--sample-per-tag", type=int, help="Run this many tests per tag")
+        parser.add_argument("--seed", type=int, help="Seed choosing the sampled tests (default 0)")
+        parser.add_argument("--shard", metavar="I/N", help="Run only shard I of N (merge shard runs with evaluator.merge_runs)")
+        parser.add_argument("--abort-invalid-json", action="store_true", default=None,
+                            help="Stop a JSON test's generation once its output can no longer be valid JSON (default: ABORT_INVALID_JSON env)")
+        parser.add_argument("--judge", choices=["grounding", "hallucination", "quality"],
+                            help="Also apply the LLM judge to outputs that pass the deterministic checks (default: LLM_JUDGE env)")
+        parser.add_argument("--baseline", metavar="RUN_ID",
+                            help="Incremental run: copy forward this run's results for unchanged tests (same model and params)")
         args = parser.parse_args()
 
-        model_name = args.model or os.getenv("MODEL_NAME", "gemini-flash-latest")
         provider = os.getenv("MODEL_PROVIDER", "google")
         
-        logger.info(f"Initializing Runner with model: {model_name}")
+        if args.resume:
+            run_record = db.query(Run).filter(Run.id == args.resume).first()
+            if not run_record:
+                logger.error(f"Run {args.resume} not found")
+                return
+            run_params = load_run_params(run_record)
+            if args.concurrency:
+                run_params.max_concurrency = args.concurrency
+            # A resumed run gets a fresh budget; flags given now replace the stored ones
+            for field, value in (("max_duration_s", args.max_duration), ("max_tokens", args.max_tokens), ("max_requests", args.max_requests)):
+                if value is not None:
+                    setattr(run_params, field, value)
+            run_record.status = RUN_RUNNING
+            db.commit()
+            logger.info(f"Resuming Run ID: {run_record.id}")
+        else:
+            if args.baseline and not db.query(Run).filter(Run.id == args.baseline).first():
+                logger.error(f"Baseline run {args.baseline} not found")
+                return
+            run_params = RunCreate(
+                model_name=args.model or os.getenv("MODEL_NAME") or DEFAULT_MODELS.get(provider),
+                provider=provider,
+                tags=args.tags,
+                max_concurrency=args.concurrency,
+                temperature=args.temperature,
+                cache_mode=args.cache,
+                max_duration_s=args.max_duration,
+                max_tokens=args.max_tokens,
+                max_requests=args.max_requests,
+                sample_fraction=args.sample_fraction,
+                sample_per_tag=args.sample_per_tag,
+                sample_seed=args.seed,
+                shard=args.shard,
+                baseline_run_id=args.baseline,
+                abort_invalid_json=args.abort_invalid_json,
+                judge=args.judge
+            )
+            
+            # Create Run Record
+            run_record = Run(
+                model_name=run_params.model_name,
+                provider=provider,
+                tags=",".join(run_params.tags) if run_params.tags else "all",
+                baseline_run_id=run_params.baseline_run_id,
+                status=RUN_RUNNING,
+                params=run_params.model_dump_json()
+            )
+            db.add(run_record)
+            db.commit()
+            logger.info(f"Created Run ID: {run_record.id}")
         
-        # Create Run Record
-        run_record = Run(
-            model_name=model_name,
-            provider=provider,
-            tags=",".join(args.tags) if args.tags else "all"
-        )
-        db.add(run_record)
-        db.commit()
-        logger.info(f"Created Run ID: {run_record.id}")
+        model_name = run_params.model_name
+        logger.info(f"Initializing Runner with model: {model_name}")
 
         # Initialize Adapter
         try:
-            adapter = GeminiAdapter(model_name=model_name)
+            adapter = create_adapter(run_params.provider or run_record.provider, model_name=model_name)
         except Exception as e:
             logger.error(f"Failed to initialize Adapter: {e}")
             return
+        
+        cache_mode = run_params.cache_mode or args.cache
+        if cache_mode != "off":
+            adapter = CachedAdapter(adapter, mode=cache_mode)
+        params = {"temperature": run_params.temperature} if run_params.temperature is not None else None
 
-        # Load Tests
+        # Tests are read lazily while the run executes
         loader = TestLoader(base_path="datasets")
-        tests = loader.load_test_suite(tags=args.tags)
+        sample = SampleSpec.from_params(run_params)
+        tests = loader.iter_test_suite(tags=run_params.tags, sample=sample)
+        count = lambda: loader.count_test_suite(tags=run_params.tags, sample=sample)
         
-        print(f"\n{'='*20} Running Suite ({len(tests)} Tests) {'='*20}\n")
-        if args.tags:
-            print(f"Filtering by tags: {args.tags}")
+        # Skip tests completed before an interruption, and unchanged ones of an incremental run
+        done_ids = completed_test_ids(db, run_record.id)
+        baseline = Baseline(db, run_record.id, run_params) if run_params.baseline_run_id else None
+        pending = PendingTests(tests, done_ids, reuse=baseline.reuse if baseline else None, count=count)
+        
+        print(f"\n{'='*20} Running Suite {'='*20}\n")
+        if run_params.tags:
+            print(f"Filtering by tags: {run_params.tags}")
+        if run_params.sample_fraction or run_params.sample_per_tag:
+            quota = f"{run_params.sample_per_tag} per tag" if run_params.sample_per_tag else f"{run_params.sample_fraction:.0%} of each tag"
+            print(f"Sampling: {quota} (seed {run_params.sample_seed or 0})")
+        if run_params.shard:
+            print(f"Shard: {run_params.shard}")
+        if baseline:
+            if baseline.changed_params:
+                print(f"Incremental: {', '.join(baseline.changed_params)} changed since {baseline.baseline_run_id}, re-running every test")
+            else:
+                print(f"Incremental: reusing unchanged results from {baseline.baseline_run_id}")
+        if done_ids:
+            print(f"Resuming: {len(done_ids)} already completed")
         
         # Initialize Evaluators
         from evaluator.evaluators.format import FormatEvaluator
         from evaluator.evaluators.compliance import ComplianceEvaluator
         
         evaluators = [FormatEvaluator(), ComplianceEvaluator()]
+        judge = run_params.judge or os.getenv("LLM_JUDGE")
+        if judge:
+            from evaluator.evaluators.llm_judge import LLMJudgeEvaluator
+            evaluators.append(LLMJudgeEvaluator(evaluation_type=judge))
+            print(f"LLM judge: {judge} (outputs passing the deterministic checks)")
         
-        results = []
-        latencies = []
+        budget = RunBudget.from_params(run_params)
+        runner = Runner(
+            adapter, evaluators, max_concurrency=run_params.max_concurrency, params=params, budget=budget,
+            abort_invalid_json=run_params.abort_invalid_json
+        )
+        # Results are persisted in batches behind the runner
+        writer = ResultWriter()
         
-        for test in tests:
+        async def save_result(outcome: TestOutcome):
+            test = outcome.test
+            test_passed = outcome.passed
             print(f"Running Test: {test.name} ({test.id})")
             print(f"Prompt: {test.prompt}")
+            print(f"Output: {outcome.output.strip()}")
+            
+            color = "\033[92m" if test_passed else "\033[91m"
+            reset = "\033[0m"
+            
+            timing = f"{outcome.latency_ms:.2f}ms"
+            if outcome.cached:
+                timing += ", cached"
+            elif outcome.ttft_ms is not None:
+                timing += f", TTFT {outcome.ttft_ms:.0f}ms, {outcome.tokens_per_sec or 0:.1f} tok/s"
+            print(f"Status: {color}{outcome.status}{reset} ({timing})")
+            if not test_passed:
+                print(f"Failures: {', '.join(outcome.reasons)}")
             
-            start_time = time.time()
+            print("-" * 50)
+            
+            # Queue Result for batched DB write
+            await writer.put(build_result_row(run_record.id, outcome))
+        
+        async def execute():
+            writer.start()
             try:
-                output = adapter.generate(
-                    prompt=test.prompt, 
-                    context=test.context
-                )
-                latency_ms = (time.time() - start_time) * 1000
-                latencies.append(latency_ms)
-                
-                print(f"Output: {output.strip()}")
-                
-                # Run Evaluation
-                test_passed = True
-                reasons = []
-                
-                for evaluator in evaluators:
-                    result = evaluator.evaluate(test, output)
-                    if not result.passed:
-                        test_passed = False
-                        reasons.append(f"{evaluator.__class__.__name__}: {result.reason}")
-                
-                status = "PASS" if test_passed else "FAIL"
-                color = "\033[92m" if test_passed else "\033[91m"
-                reset = "\033[0m"
-                
-                print(f"Status: {color}{status}{reset} ({latency_ms:.2f}ms)")
-                if not test_passed:
-                    print(f"Failures: {', '.join(reasons)}")
-                
-                print("-" * 50)
-                
-                # Save Result to DB
-                test_result = TestResult(
-                    run_id=run_record.id,
-                    test_id=test.id,
-                    test_name=test.name,
-                    input_prompt=test.prompt,
-                    output_text=output,
-                    status=status,
-                    failure_reasons="\n".join(reasons),
-                    latency_ms=latency_ms
-                )
-                db.add(test_result)
-                db.commit()
-                
-                results.append({
-                    "test": test, 
-                    "status": status, 
-                })
-                
-                # Sleep to respect free tier rate limits (15s = 4 req/min)
-                time.sleep(15)
-                
-            except Exception as e:
-                print(f"EXECUTION ERROR: {e}")
+                await runner.run(pending, on_result=save_result, collect=False)
+            finally:
+                await writer.close()
+                if baseline:
+                    baseline.flush()
+        
+        try:
+            asyncio.run(execute())
+        except KeyboardInterrupt:
+            # In-flight requests were cancelled and finished results flushed; --resume picks up the rest
+            finalize_run(db, run_record, total_tests=pending.total, status=RUN_CANCELLED)
+            print(f"\nRun cancelled. Resume with: --resume {run_record.id}")
+            return
                 
-        # Update Run Metrics
-        if results:
-            passed_count = sum(1 for r in results if r["status"] == "PASS")
-            run_record.pass_rate = passed_count / len(tests)
-            run_record.avg_latency = sum(latencies) / len(latencies) if latencies else 0
-            db.commit()
-            
-            print(f"\n{'='*20} Run Complete {'='*20}")
-            print(f"Total Tests: {len(results)}")
-            print(f"Pass Rate: {passed_count}/{len(results)} ({run_record.pass_rate*100:.1f}%)")
-            print(f"Avg Latency: {run_record.avg_latency:.2f}ms")
+        # Update Run Metrics (over results from before and after any resume)
+        if budget is not None and budget.exhausted:
+            passed_count, completed_count = finalize_run(
+                db, run_record, total_tests=pending.total, status=RUN_TRUNCATED, budget_exhausted=budget.exhausted,
+                rows_lost=writer.rows_lost
+            )
+            print(f"\n{budget.exhausted.capitalize()} budget exhausted: run truncated. Resume with: --resume {run_record.id}")
+        else:
+            passed_count, completed_count = finalize_run(
+                db, run_record, total_tests=pending.total, status=RUN_COMPLETED, rows_lost=writer.rows_lost
+            )
+            if run_record.status == RUN_INCOMPLETE:
+                print(f"\n{writer.rows_lost} results could not be stored: run incomplete. Resume with: --resume {run_record.id}")
+        if completed_count:
+            title = {RUN_TRUNCATED: "Run Truncated", RUN_INCOMPLETE: "Run Incomplete"}.get(run_record.status, "Run Complete")
+            print(f"\n{'='*20} {title} {'='*20}")
+            print(f"Total Tests: {completed_count}" + (f" of {pending.total}" if completed_count < pending.total else ""))
+            print(f"Pass Rate: {passed_count}/{completed_count} ({run_record.pass_rate*100:.1f}%)")
+            print(f"Avg Latency: {run_record.avg_latency:.2f}ms (p95 {run_record.p95_latency or 0:.2f}ms)")
+            if run_record.avg_ttft_ms is not None:
+                print(f"Avg TTFT: {run_record.avg_ttft_ms:.2f}ms (p95 {run_record.p95_ttft_ms:.2f}ms)")
+                print(f"Avg Throughput: {run_record.avg_tokens_per_sec or 0:.1f} tokens/sec")
+            if run_record.total_tokens:
+                cost = f"${run_record.cost_usd:.4f}" if run_record.cost_usd is not None else "unknown (unpriced model)"
+                print(f"Tokens: {run_record.total_tokens} ({run_record.prompt_tokens} prompt, "
+                      f"{run_record.completion_tokens} completion), est. cost {cost}")
+            if baseline and baseline.copied:
+                print(f"Reused: {baseline.copied} unchanged results from {baseline.baseline_run_id}")
             print(f"Run saved to DB: {run_record.id}")
 
     finally:
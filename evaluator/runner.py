@@ -1,7 +1,450 @@
-# Placeholder for the test runner logic
+"""
+Asynchronous execution engine for test suites.
+
+Generation requests are sent concurrently (bounded per run and per provider,
+and paced by the provider's shared rate limiter). Outputs are evaluated off the
+event loop as they arrive, batched with whatever other outputs are waiting, so
+evaluators can share work across a batch (see BaseEvaluator.evaluate_batch).
+Evaluators run cheapest first (see evaluator.pipeline): outputs that pass the
+deterministic checks go on to the LLM judge, whose calls run on their own
+bounded pool alongside generation. Each generation runs under the provider's deadline and
+may be hedged (see evaluator.llm.hedging); cancelling `Runner.run` cancels
+every in-flight request. With abort_invalid_json, the stream of a test that
+requires JSON is validated as it arrives and stopped as soon as the output can
+no longer be valid (see evaluator.json_stream).
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from app.schemas.test_case import TestCase
+from evaluator.base import BaseEvaluator, Judgment
+from evaluator.budget import BUDGET_TIME, BUDGET_TOKENS, BudgetExceeded, RunBudget
+from evaluator.evaluators.format import requires_json
+from evaluator.json_stream import JsonStreamValidator
+from evaluator.llm.base import Generation, ModelAdapter, RateLimitError, estimate_output_tokens
+from evaluator.llm.cache import CachedAdapter
+from evaluator.llm.hedging import get_latency_tracker, get_request_policy, hedged_call
+from evaluator.llm.usage import Usage, UsageTracker, track_usage
+from evaluator.pipeline import EvaluatorPipeline, OutputEvaluation
+from evaluator.llm.rate_limiter import (
+    ESTIMATED_COMPLETION_TOKENS,
+    MAX_RATE_LIMIT_RETRIES,
+    estimate_tokens,
+    get_rate_limiter,
+)
+from metrics.latency import GenerationMetrics
+
+logger = logging.getLogger(__name__)
+
+# Default number of in-flight requests for a single run
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Default number of in-flight requests per provider, shared by all runs in the process
+DEFAULT_PROVIDER_CONCURRENCY = {
+    "groq": 8,
+    "google": 4,
+    "ollama": 2,
+    "mock": 64,
+}
+
+# Tests started ahead of free run slots (e.g. to serve cache hits), per slot
+PENDING_TESTS_PER_SLOT = 4
+
+# Max outputs handed to the evaluators in one batch
+EVALUATION_BATCH_SIZE = 64
+
+_provider_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def get_provider_semaphore(provider: str) -> asyncio.Semaphore:
+    """
+    Get the process-wide concurrency limiter for a provider.
+
+    The limit can be overridden with `<PROVIDER>_MAX_CONCURRENCY` (e.g. GROQ_MAX_CONCURRENCY).
+    """
+    if provider not in _provider_semaphores:
+        default = DEFAULT_PROVIDER_CONCURRENCY.get(provider, DEFAULT_MAX_CONCURRENCY)
+        limit = int(os.getenv(f"{provider.upper()}_MAX_CONCURRENCY", default))
+        _provider_semaphores[provider] = asyncio.Semaphore(max(1, limit))
+    return _provider_semaphores[provider]
+
+
+@dataclass
+class TestOutcome:
+    """Result of executing and evaluating a single test case."""
+    test: TestCase
+    output: str
+    status: str  # PASS / FAIL
+    reasons: List[str]
+    latency_ms: float
+    cached: bool = False  # Served from the response cache (latency is the original generation's)
+    ttft_ms: Optional[float] = None
+    output_tokens: Optional[int] = None
+    tokens_per_sec: Optional[float] = None
+    usage: Optional[Usage] = None  # Provider-reported tokens of the generation (incl. retries and hedges)
+    cost_usd: Optional[float] = None
+    judge_usage: Optional[Usage] = None  # Tokens spent by evaluators calling a model (LLM judge)
+    judge_cost_usd: Optional[float] = None
+    judgment: Optional[Judgment] = None  # The LLM judge's assessment (None if no judge ran)
+
+    @property
+    def passed(self) -> bool:
+        return self.status == "PASS"
+
+
+ResultCallback = Callable[[TestOutcome], Awaitable[None]]
+
+
 class Runner:
-    def __init__(self):
-        pass
+    """
+    Runs a test suite against a model adapter with bounded concurrency.
+    """
+
+    def __init__(
+        self,
+        adapter: ModelAdapter,
+        evaluators: List[BaseEvaluator],
+        max_concurrency: Optional[int] = None,
+        params: Optional[Dict[str, Any]] = None,
+        budget: Optional[RunBudget] = None,
+        abort_invalid_json: Optional[bool] = None,
+    ):
+        """
+        Args:
+            adapter: LLM adapter used for generation (optionally wrapped in CachedAdapter)
+            evaluators: Evaluators applied to every output, cheapest first (see EvaluatorPipeline)
+            max_concurrency: Max in-flight requests for this run (defaults to MAX_CONCURRENCY env)
+            params: Generation params passed to every call (e.g. temperature)
+            budget: Optional time/token/request caps; check `budget.exhausted` after the run
+            abort_invalid_json: Stop generating a JSON test's output once it can no longer be
+                valid JSON, failing the test (defaults to ABORT_INVALID_JSON env, off)
+        """
+        self.adapter = adapter
+        self.evaluators = evaluators
+        self.pipeline = EvaluatorPipeline(evaluators)
+        self.params = params
+        self.budget = budget
+        self.max_concurrency = max(1, max_concurrency or int(os.getenv("MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)))
+        if abort_invalid_json is None:
+            abort_invalid_json = os.getenv("ABORT_INVALID_JSON", "false").lower() == "true"
+        self.abort_invalid_json = abort_invalid_json
+
+    async def run(
+        self,
+        tests: Iterable[TestCase],
+        on_result: Optional[ResultCallback] = None,
+        collect: bool = True,
+    ) -> List[TestOutcome]:
+        """
+        Execute all tests concurrently.
+
+        Tests are pulled from `tests` only as the run has room for them, so a lazy
+        iterable (e.g. TestLoader.iter_test_suite) starts running at once and is
+        never held in memory as a whole. Anything but a list or tuple is read on a
+        worker thread, since producing the next test may parse files or query
+        the database.
+
+        Args:
+            tests: Test cases to run
+            on_result: Optional async callback invoked as soon as each test is evaluated
+            collect: Keep outcomes for the return value (disable for very large
+                     suites consumed through on_result)
+
+        Returns:
+            List of outcomes in completion order (empty if not collected). Tests
+            whose execution raised are logged and omitted, as in the serial runner,
+            as are tests stopped by the run budget.
+        """
+        run_slots = asyncio.Semaphore(self.max_concurrency)
+        provider_slots = get_provider_semaphore(self.adapter.provider)
+        limiter = get_rate_limiter(self.adapter.provider)
+        policy = get_request_policy(self.adapter.provider)
+        latency_tracker = get_latency_tracker(self.adapter.provider)
+        budget = self.budget
+        tasks: Set[asyncio.Task] = set()  # Unfinished tests
+        outcomes: List[TestOutcome] = []
+        window = asyncio.Semaphore(self.max_concurrency * PENDING_TESTS_PER_SLOT)
+        stopped = False
+        feeder: Optional[asyncio.Task] = None
+
+        def _hard_stop(reason: str):
+            """A hard budget cap was hit: cancel every unfinished test (except the caller's)."""
+            nonlocal stopped
+            current = asyncio.current_task()
+            unfinished = [task for task in tasks if not task.done() and task is not current]
+            if not unfinished and feeder.done():
+                return
+            stopped = True
+            if budget.exhausted is None:
+                budget.exhausted = reason
+            logger.warning(f"Run budget exhausted ({budget.exhausted}), cancelling {len(unfinished)} unfinished tests")
+            for task in unfinished:
+                task.cancel()
+
+        async def _generate(test: TestCase) -> Generation:
+            async with run_slots:
+                tokens = estimate_tokens(test.prompt, test.context) + ESTIMATED_COMPLETION_TOKENS
+                validate_stream = self.abort_invalid_json and requires_json(test)
+
+                async def _call(hedge: bool = False) -> Generation:
+                    if budget is not None:
+                        budget.take_request(hedge=hedge)
+                    # Each attempt (and hedge) streams its own output, so each gets its own validator
+                    validator = JsonStreamValidator(test.compiled_constraints) if validate_stream else None
+                    return await self.adapter.agenerate_streamed(
+                        prompt=test.prompt, context=test.context, params=self.params,
+                        on_chunk=validator.feed if validator else None
+                    )
+
+                async def _hedge() -> Generation:
+                    # A hedge is a real extra request, so it is paced and budgeted like one
+                    await limiter.acquire_async(tokens)
+                    return await _call(hedge=True)
+
+                for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+                    if budget is not None:
+                        budget.check_dispatch()
+                    await limiter.acquire_async(tokens)
+                    try:
+                        async with provider_slots:
+                            generation = await hedged_call(_call, policy, latency_tracker, hedge=_hedge)
+                    except asyncio.TimeoutError:
+                        # Recorded like any other adapter error so the test fails instead of vanishing
+                        logger.warning(f"Test {test.id} timed out after {policy.timeout_s:g}s")
+                        return Generation(
+                            text=f"Error: Request timed out after {policy.timeout_s:g}s",
+                            metrics=GenerationMetrics(
+                                latency_ms=policy.timeout_s * 1000, ttft_ms=None, output_tokens=0, tokens_per_sec=None
+                            )
+                        )
+                    except RateLimitError as e:
+                        limiter.record_rate_limited(e.retry_after)
+                        if attempt == MAX_RATE_LIMIT_RETRIES:
+                            raise
+                        continue
+                    limiter.record_success()
+                    return generation
+
+        async def _run_one(test: TestCase) -> Optional[TestOutcome]:
+            try:
+                # Cache hits skip the rate limiter and provider slots entirely
+                if isinstance(self.adapter, CachedAdapter):
+                    hit = await self.adapter.alookup(test.prompt, test.context, self.params)
+                    if hit is not None:
+                        metrics = GenerationMetrics(
+                            latency_ms=hit.latency_ms or 0.0,
+                            ttft_ms=None,
+                            output_tokens=estimate_output_tokens(hit.output),
+                            tokens_per_sec=None
+                        )
+                        outcome = await _evaluate(test, hit.output, metrics, None)
+                        outcome.cached = True
+                        if on_result:
+                            await on_result(outcome)
+                        return outcome
+
+                # Usage of every attempt is counted, since rejected and hedged calls may be billed too
+                with track_usage() as generation_usage:
+                    generation = await _generate(test)
+
+                outcome = await _evaluate(test, generation.text, generation.metrics, generation_usage)
+                if generation.stopped:
+                    # The output is partial, so the test fails whatever the evaluators made of it
+                    outcome.status = "FAIL"
+                    outcome.reasons.insert(0, f"Generation stopped early: {generation.stopped}")
+                if budget is not None:
+                    budget.add_tokens(self._tokens_spent(test, outcome))
+                    if budget.tokens_spent:
+                        _hard_stop(BUDGET_TOKENS)
+                if on_result:
+                    await on_result(outcome)
+                return outcome
+            except BudgetExceeded:
+                # No request can be dispatched any more, so stop feeding tests (in-flight ones still finish)
+                nonlocal stopped
+                stopped = True
+                return None
+            except Exception as e:
+                logger.error(f"Test {test.id} execution failed: {e}")
+                return None
+
+        async def _evaluate(
+            test: TestCase, output: str, metrics: GenerationMetrics, generation_usage: Optional[UsageTracker]
+        ) -> TestOutcome:
+            future = asyncio.get_running_loop().create_future()
+            evaluation_queue.put_nowait(((test, output, metrics, generation_usage), future))
+            return await future
+
+        async def _settle(batch: List[tuple]):
+            try:
+                evaluated = await asyncio.to_thread(self._evaluate_tracked, [item for item, _ in batch])
+            except Exception as e:
+                if len(batch) > 1:
+                    # Evaluate one by one so only the test whose output broke an evaluator is dropped
+                    for entry in batch:
+                        await _settle([entry])
+                    return
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+                return
+            for (_, future), outcome in zip(batch, evaluated):
+                if future.done():
+                    continue
+                if self.pipeline.needs_judging(outcome.passed):
+                    # Judged on the judge pool, so the next batch's checks needn't wait for the model
+                    task = asyncio.create_task(_judge(outcome, future))
+                    judging.add(task)
+                    task.add_done_callback(judging.discard)
+                else:
+                    future.set_result(outcome)
+
+        async def _judge(outcome: TestOutcome, future: asyncio.Future):
+            try:
+                evaluation = await asyncio.get_running_loop().run_in_executor(
+                    self.pipeline.judge_pool, self.pipeline.judge, (outcome.test, outcome.output)
+                )
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                return
+            self._apply_evaluation(outcome, evaluation)
+            if not future.done():
+                future.set_result(outcome)
+
+        async def _evaluate_batches():
+            while True:
+                batch = [await evaluation_queue.get()]
+                # Take whatever else is waiting: batches grow when evaluation falls behind, never wait to fill up
+                while len(batch) < EVALUATION_BATCH_SIZE and not evaluation_queue.empty():
+                    batch.append(evaluation_queue.get_nowait())
+                # Tests cancelled while queued (e.g. by a hard budget cap) need no evaluation
+                batch = [entry for entry in batch if not entry[1].done()]
+                if batch:
+                    await _settle(batch)
+
+        def _on_done(task: asyncio.Task):
+            tasks.discard(task)
+            window.release()
+            # Tests cancelled by a hard budget cap are simply missing from the outcomes
+            if collect and not task.cancelled() and task.result() is not None:
+                outcomes.append(task.result())
+
+        async def _feed():
+            iterator = iter(tests)
+            in_memory = isinstance(tests, (list, tuple))
+            while True:
+                await window.acquire()
+                test = None
+                if not stopped:
+                    test = next(iterator, None) if in_memory else await asyncio.to_thread(next, iterator, None)
+                if test is None:
+                    window.release()
+                    break
+                task = asyncio.create_task(_run_one(test))
+                tasks.add(task)
+                task.add_done_callback(_on_done)
+
+        evaluation_queue: asyncio.Queue = asyncio.Queue()
+        judging: Set[asyncio.Task] = set()
+        evaluation = asyncio.create_task(_evaluate_batches())
+        feeder = asyncio.create_task(_feed())
+        timer = None
+        if budget is not None and budget.max_duration_s is not None:
+            timer = asyncio.get_running_loop().call_later(budget.max_duration_s, _hard_stop, BUDGET_TIME)
+
+        try:
+            await feeder
+            if tasks:
+                await asyncio.wait(set(tasks))
+        except BaseException:
+            # Run aborted (or the test source failed): cancel in-flight requests and let them unwind before propagating
+            feeder.cancel()
+            unfinished = list(tasks)
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(feeder, *unfinished, return_exceptions=True)
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+            evaluation.cancel()
+            for task in judging:
+                task.cancel()
+            await asyncio.gather(evaluation, *judging, return_exceptions=True)
+        return outcomes
+
+    @staticmethod
+    def _tokens_spent(test: TestCase, outcome: TestOutcome) -> int:
+        """Tokens a test consumed, estimated from the text when the provider reported none."""
+        if outcome.usage is not None:
+            tokens = outcome.usage.total_tokens
+        else:
+            tokens = estimate_tokens(test.prompt, test.context) + (outcome.output_tokens or 0)
+        if outcome.judge_usage is not None:
+            tokens += outcome.judge_usage.total_tokens
+        return tokens
+
+    def _evaluate_tracked(
+        self, items: List[Tuple[TestCase, str, GenerationMetrics, Optional[UsageTracker]]]
+    ) -> List[TestOutcome]:
+        """Check a batch (judging is left to the run) and attach each output's generation token usage to its outcome."""
+        outcomes = self.evaluate_batch([(test, output, metrics) for test, output, metrics, _ in items], judge=False)
+        for outcome, (_, _, _, generation_usage) in zip(outcomes, items):
+            if generation_usage is not None:
+                outcome.usage = generation_usage.total()
+                outcome.cost_usd = generation_usage.cost_usd()
+        return outcomes
+
+    def evaluate(self, test: TestCase, output: str, metrics: GenerationMetrics) -> TestOutcome:
+        """Apply every evaluator to an output and build the outcome."""
+        return self.evaluate_batch([(test, output, metrics)])[0]
+
+    def evaluate_batch(
+        self, items: Sequence[Tuple[TestCase, str, GenerationMetrics]], judge: bool = True
+    ) -> List[TestOutcome]:
+        """
+        Apply the evaluators to a batch of outputs and build their outcomes,
+        including the tokens evaluators spent calling a model (LLM judge).
+
+        Args:
+            judge: Also run the judges on outputs that passed every check;
+                otherwise only the checks run (see EvaluatorPipeline)
+        """
+        pairs = [(test, output) for test, output, _ in items]
+        evaluated = self.pipeline.evaluate(pairs) if judge else self.pipeline.check(pairs)
+        outcomes = []
+        for (test, output, metrics), evaluation in zip(items, evaluated):
+            outcome = TestOutcome(
+                test=test,
+                output=output,
+                status="PASS",
+                reasons=[],
+                latency_ms=metrics.latency_ms,
+                ttft_ms=metrics.ttft_ms,
+                output_tokens=metrics.output_tokens,
+                tokens_per_sec=metrics.tokens_per_sec,
+            )
+            self._apply_evaluation(outcome, evaluation)
+            outcomes.append(outcome)
+        return outcomes
 
-    def run(self):
-        pass
+    @staticmethod
+    def _apply_evaluation(outcome: TestOutcome, evaluation: OutputEvaluation):
+        """Add the verdicts, judge assessment and model usage of a pipeline stage to an outcome."""
+        outcome.reasons.extend(evaluation.reasons)
+        outcome.status = "FAIL" if outcome.reasons else "PASS"
+        if outcome.judgment is None:
+            outcome.judgment = evaluation.judgment
+        if evaluation.usage is None:
+            return
+        usage, cost = evaluation.usage.total(), evaluation.usage.cost_usd()
+        if outcome.judge_usage is None:
+            outcome.judge_usage, outcome.judge_cost_usd = usage, cost
+        elif usage is not None:
+            outcome.judge_usage = outcome.judge_usage + usage
+            outcome.judge_cost_usd = (
+                outcome.judge_cost_usd + cost if outcome.judge_cost_usd is not None and cost is not None else None
+            )
@@ -0,0 +1,92 @@
+"""
+Deterministic sampling and sharding of test suites.
+
+Both work from test ids (and tags) only, through a stable hash, so every
+machine computes the same selection without coordination and adding tests to
+a dataset barely perturbs which existing tests are picked.
+
+- Sampling is stratified by tag: each tag (and the untagged tests) gets its
+  own quota, either a fraction of its tests (at least one) or a fixed number,
+  so rare tags such as refusal or adversarial are always represented. A test
+  with several tags counts toward each of them, so a fractional sample can be
+  slightly larger than the fraction.
+- Sharding assigns each test to exactly one of N shards by the hash of its id.
+  It applies after sampling, so shards of a sampled suite still add up to the
+  whole sample.
+"""
+import hashlib
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+UNTAGGED = ""
+
+
+def stable_hash(test_id: str, seed: int = 0) -> int:
+    """64-bit hash of a test id that is the same on every machine and Python run."""
+    digest = hashlib.sha256(f"{seed}:{test_id}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """Parse "i/N" (1 <= i <= N) into (i, N)."""
+    try:
+        index, count = (int(part) for part in shard.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {shard!r}, expected i/N (e.g. 1/4)")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard {shard!r}: i must be between 1 and N")
+    return index, count
+
+
+def in_shard(test_id: str, shard: Tuple[int, int]) -> bool:
+    index, count = shard
+    return stable_hash(test_id) % count == index - 1
+
+
+@dataclass(frozen=True)
+class SampleSpec:
+    fraction: Optional[float] = None  # Share of each tag's tests (at least one per tag)
+    per_tag: Optional[int] = None  # Number of tests per tag
+    seed: int = 0
+    shard: Optional[Tuple[int, int]] = None  # (i, N): keep only shard i of N
+
+    @classmethod
+    def from_params(cls, run_params) -> Optional["SampleSpec"]:
+        """Spec from a RunCreate, or None if it neither samples nor shards."""
+        if run_params.sample_fraction is None and run_params.sample_per_tag is None and run_params.shard is None:
+            return None
+        return cls(
+            fraction=run_params.sample_fraction,
+            per_tag=run_params.sample_per_tag,
+            seed=run_params.sample_seed or 0,
+            shard=parse_shard(run_params.shard) if run_params.shard else None,
+        )
+
+    @property
+    def samples(self) -> bool:
+        return self.fraction is not None or self.per_tag is not None
+
+    def _quota(self, stratum_size: int) -> int:
+        if self.per_tag is not None:
+            return min(self.per_tag, stratum_size)
+        return min(stratum_size, max(1, math.ceil(self.fraction * stratum_size)))
+
+    def select(self, tests: Iterable[Tuple[str, Iterable[str]]]) -> Set[str]:
+        """Ids selected from (test id, tags) pairs."""
+        tests = list(tests)
+        if self.samples:
+            strata: Dict[str, List[str]] = {}
+            for test_id, tags in tests:
+                for tag in (tags or (UNTAGGED,)):
+                    strata.setdefault(tag, []).append(test_id)
+            selected: Set[str] = set()
+            for ids in strata.values():
+                # The lowest hashes of a stratum are its sample
+                ranked = sorted(set(ids), key=lambda test_id: stable_hash(test_id, self.seed))
+                selected.update(ranked[:self._quota(len(ranked))])
+        else:
+            selected = {test_id for test_id, _ in tests}
+        if self.shard is not None:
+            selected = {test_id for test_id in selected if in_shard(test_id, self.shard)}
+        return selected
@@ -1,12 +1,12 @@
 """
 Sensitivity test runner that applies perturbations and measures stability.
 """
-import time
 from typing import List, Dict
 from app.schemas.test_case import TestCase
 from evaluator.perturbations.engine import PromptPerturber
 from metrics.stability import analyze_stability
 from evaluator.llm.base import ModelAdapter
+from evaluator.llm.rate_limiter import generate_rate_limited_timed
 
 class SensitivityRunner:
     """
@@ -47,15 +47,11 @@ class SensitivityRunner:
         latencies = []
         
         for prompt in perturbed_prompts:
-            start_time = time.time()
-            output = self.adapter.generate(prompt=prompt)
-            latency_ms = (time.time() - start_time) * 1000
+            # Paced by the provider's shared rate limiter; the latency excludes waiting on it
+            output, latency_ms = generate_rate_limited_timed(self.adapter, prompt=prompt)
             
             outputs.append(output)
             latencies.append(latency_ms)
-            
-            # Rate limiting
-            time.sleep(0.5)
         
         # Analyze stability
         stability_metrics = analyze_stability(outputs)
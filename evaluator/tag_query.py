@@ -0,0 +1,201 @@
+"""
+Boolean tag queries and the tag index they run against.
+
+A query combines terms with AND, OR, NOT and parentheses (NOT binds tightest,
+then AND, then OR). A term is either a tag or `id:<glob>`, matched against
+test ids with fnmatch rules:
+
+    json AND NOT adversarial
+    refusal OR grounding
+    (json OR format) AND NOT id:json_legacy_*
+
+A plain tag is itself a query, so the existing `tags=["json", "refusal"]`
+lists keep working: the loader ORs the queries of a list together.
+
+Queries are evaluated on a TagIndex, an inverted index from tag to test ids
+built from each file's ids and tags only, so the loader can tell which files
+hold matching tests before it validates any of them.
+"""
+import fnmatch
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# (file path, test id)
+TestRef = Tuple[str, str]
+
+_TOKEN_RE = re.compile(r"\(|\)|[^\s()]+")
+_KEYWORDS = ("AND", "OR", "NOT")
+
+
+class TagQueryError(ValueError):
+    """Raised for a malformed tag query."""
+
+
+class TagIndex:
+    """
+    Inverted index from tag to the tests carrying it.
+    """
+
+    def __init__(self, entries: Dict[str, List[Tuple[str, Tuple[str, ...]]]]):
+        """
+        Args:
+            entries: File path -> (test id, tags) of every test in the file.
+        """
+        self.all_refs: Set[TestRef] = set()
+        self.by_tag: Dict[str, Set[TestRef]] = {}
+        for path, tests in entries.items():
+            for test_id, tags in tests:
+                ref = (path, test_id)
+                self.all_refs.add(ref)
+                for tag in tags:
+                    self.by_tag.setdefault(tag, set()).add(ref)
+
+    def select(self, query: "Query") -> Dict[str, Set[str]]:
+        """Matching test ids, grouped by file."""
+        selected: Dict[str, Set[str]] = {}
+        for path, test_id in query.select(self):
+            selected.setdefault(path, set()).add(test_id)
+        return selected
+
+
+class Query:
+    def select(self, index: TagIndex) -> Set[TestRef]:
+        raise NotImplementedError
+
+    def matches(self, test_id: str, tags: Iterable[str]) -> bool:
+        raise NotImplementedError
+
+
+@dataclass(frozen=True)
+class Tag(Query):
+    name: str
+
+    def select(self, index):
+        return index.by_tag.get(self.name, set())
+
+    def matches(self, test_id, tags):
+        return self.name in tags
+
+
+@dataclass(frozen=True)
+class IdGlob(Query):
+    pattern: str
+
+    def select(self, index):
+        return {ref for ref in index.all_refs if fnmatch.fnmatchcase(ref[1], self.pattern)}
+
+    def matches(self, test_id, tags):
+        return fnmatch.fnmatchcase(test_id, self.pattern)
+
+
+@dataclass(frozen=True)
+class Not(Query):
+    operand: Query
+
+    def select(self, index):
+        return index.all_refs - self.operand.select(index)
+
+    def matches(self, test_id, tags):
+        return not self.operand.matches(test_id, tags)
+
+
+@dataclass(frozen=True)
+class And(Query):
+    operands: Tuple[Query, ...]
+
+    def select(self, index):
+        # Narrowest operand first so the intersection stays small
+        sets = sorted((op.select(index) for op in self.operands), key=len)
+        result = set(sets[0])
+        for other in sets[1:]:
+            result &= other
+        return result
+
+    def matches(self, test_id, tags):
+        return all(op.matches(test_id, tags) for op in self.operands)
+
+
+@dataclass(frozen=True)
+class Or(Query):
+    operands: Tuple[Query, ...]
+
+    def select(self, index):
+        result: Set[TestRef] = set()
+        for op in self.operands:
+            result |= op.select(index)
+        return result
+
+    def matches(self, test_id, tags):
+        return any(op.matches(test_id, tags) for op in self.operands)
+
+
+class _Parser:
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = _TOKEN_RE.findall(expression)
+        self.pos = 0
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise TagQueryError(f"Unexpected end of tag query: {self.expression!r}")
+        self.pos += 1
+        return token
+
+    def parse(self) -> Query:
+        if not self.tokens:
+            raise TagQueryError("Empty tag query")
+        query = self._or()
+        if self._peek() is not None:
+            raise TagQueryError(f"Unexpected {self._peek()!r} in tag query: {self.expression!r}")
+        return query
+
+    def _or(self) -> Query:
+        operands = [self._and()]
+        while self._peek() == "OR":
+            self._next()
+            operands.append(self._and())
+        return operands[0] if len(operands) == 1 else Or(tuple(operands))
+
+    def _and(self) -> Query:
+        operands = [self._not()]
+        while self._peek() == "AND":
+            self._next()
+            operands.append(self._not())
+        return operands[0] if len(operands) == 1 else And(tuple(operands))
+
+    def _not(self) -> Query:
+        if self._peek() == "NOT":
+            self._next()
+            return Not(self._not())
+        return self._term()
+
+    def _term(self) -> Query:
+        token = self._next()
+        if token == "(":
+            query = self._or()
+            if self._next() != ")":
+                raise TagQueryError(f"Missing ')' in tag query: {self.expression!r}")
+            return query
+        if token == ")" or token in _KEYWORDS:
+            raise TagQueryError(f"Unexpected {token!r} in tag query: {self.expression!r}")
+        if token.startswith("id:"):
+            if len(token) == 3:
+                raise TagQueryError(f"Empty id pattern in tag query: {self.expression!r}")
+            return IdGlob(token[3:])
+        return Tag(token)
+
+
+def parse_tag_query(expression: str) -> Query:
+    """Parse a single query expression (raises TagQueryError)."""
+    return _Parser(expression).parse()
+
+
+def parse_tag_queries(expressions: List[str]) -> Query:
+    """OR of several query expressions, as given by a `tags` list."""
+    queries = [parse_tag_query(expression) for expression in expressions]
+    return queries[0] if len(queries) == 1 else Or(tuple(queries))
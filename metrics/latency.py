@@ -1,2 +1,76 @@
+"""
+Latency metrics for single generations and whole runs.
+"""
+import math
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
 def calculate_latency(start_time, end_time):
     return end_time - start_time
+
+@dataclass
+class GenerationMetrics:
+    """Timing of one (streamed) generation."""
+    latency_ms: float  # Total generation time
+    ttft_ms: Optional[float]  # Time to first token; None if nothing was streamed
+    output_tokens: int
+    tokens_per_sec: Optional[float]  # Decode throughput after the first token
+
+class GenerationTimer:
+    """
+    Records time-to-first-token and decode throughput while consuming a stream.
+
+    Usage:
+        timer = GenerationTimer()
+        for chunk in stream:
+            timer.mark_chunk()
+        metrics = timer.finish(output_tokens)
+    """
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_chunk: Optional[float] = None
+    
+    def mark_chunk(self):
+        """Call for every chunk carrying output text."""
+        if self.first_chunk is None:
+            self.first_chunk = time.perf_counter()
+    
+    def finish(self, output_tokens: int) -> GenerationMetrics:
+        end = time.perf_counter()
+        ttft_ms = None
+        tokens_per_sec = None
+        if self.first_chunk is not None:
+            ttft_ms = (self.first_chunk - self.start) * 1000
+            # Decode phase only; fall back to the whole call for single-chunk responses
+            decode_s = end - self.first_chunk
+            if decode_s <= 0 or output_tokens <= 1:
+                decode_s = end - self.start
+            tokens_per_sec = output_tokens / decode_s if decode_s > 0 else None
+        return GenerationMetrics(
+            latency_ms=(end - self.start) * 1000,
+            ttft_ms=ttft_ms,
+            output_tokens=output_tokens,
+            tokens_per_sec=tokens_per_sec
+        )
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """
+    Nearest-rank percentile.
+    
+    Args:
+        values: Samples (unsorted)
+        pct: Percentile between 0 and 100
+    
+    Returns:
+        The percentile value, or None if there are no samples
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def mean(values: List[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
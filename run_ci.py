@@ -3,26 +3,106 @@ CI Runner Script
 ----------------
 Run checks specifically for Continuous Integration environment.
 Exits with code 1 if tests fail, stopping the build.
+
+Tests run concurrently, most-often-failing and fastest first (from past
+results in the database), and the run is aborted as soon as more than
+--max-failures tests have failed. With --junit, a JUnit XML report is
+rewritten after every test so partial results survive a job timeout.
 """
 import sys
 import os
+import argparse
 import asyncio
+from typing import Dict, List, Sequence, Tuple
 from evaluator.loader import TestLoader
 from evaluator.llm.groq_client import GroqAdapter
 from evaluator.evaluators.format import FormatEvaluator
 from evaluator.evaluators.compliance import ComplianceEvaluator
-from evaluator.base import EvaluationResult
+from evaluator.junit import JUnitReport
+from evaluator.ordering import order_by_history
+from evaluator.persistence import (
+    RUN_CANCELLED,
+    RUN_COMPLETED,
+    RUN_RUNNING,
+    ResultWriter,
+    build_result_row,
+    finalize_run,
+    test_history,
+)
+from evaluator.runner import Runner, TestOutcome
+from app.schemas.run import RunCreate
+from app.schemas.test_case import TestCase
+from db.models import Base, Run
+from db.session import engine, SessionLocal
+from db.migrations import upgrade_schema
+from metrics.latency import GenerationMetrics
 from dotenv import load_dotenv
 
 load_dotenv()
 
+CI_MODEL = "llama-3.3-70b-versatile"
+
+
+class CIRunner(Runner):
+    """
+    Runner applying the CI rules: evaluators only run for the criteria a test
+    declares, and provider errors count as failures.
+    """
+
+    def __init__(self, adapter, max_concurrency=None):
+        super().__init__(adapter, [], max_concurrency=max_concurrency)
+        self.format_eval = FormatEvaluator()
+        self.compliance_eval = ComplianceEvaluator()
+
+    def evaluate_batch(self, items: Sequence[Tuple[TestCase, str, GenerationMetrics]], judge: bool = True) -> List[TestOutcome]:
+        reasons: List[List[str]] = [[output] if output.startswith("Error:") else [] for _, output, _ in items]
+        checks = [
+            (self.format_eval, lambda criteria: criteria.get("format") == "json"),
+            (self.compliance_eval, lambda criteria: any(k in criteria for k in ["refusal", "required_phrases"])),
+        ]
+        for evaluator, applies in checks:
+            selected = [
+                i for i, (test, output, _) in enumerate(items)
+                if not output.startswith("Error:") and test.evaluation_criteria and applies(test.evaluation_criteria)
+            ]
+            results = evaluator.evaluate_batch([(items[i][0], items[i][1]) for i in selected])
+            for i, res in zip(selected, results):
+                if not res.passed:
+                    reasons[i].append(res.reason)
+
+        return [
+            TestOutcome(
+                test=test,
+                output=output,
+                status="FAIL" if test_reasons else "PASS",
+                reasons=test_reasons,
+                latency_ms=metrics.latency_ms,
+                ttft_ms=metrics.ttft_ms,
+                output_tokens=metrics.output_tokens,
+                tokens_per_sec=metrics.tokens_per_sec,
+            )
+            for (test, output, metrics), test_reasons in zip(items, reasons)
+        ]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run CI smoke tests")
+    parser.add_argument("--suite", default="datasets/smoke.json", help="Test file to run")
+    parser.add_argument("--max-failures", type=int, default=int(os.getenv("CI_MAX_FAILURES", "0")),
+                        help="Abort once more than this many tests have failed (default: CI_MAX_FAILURES env or 0)")
+    parser.add_argument("--concurrency", type=int, help="Max in-flight requests (default: MAX_CONCURRENCY env or 8)")
+    parser.add_argument("--junit", default=os.getenv("CI_JUNIT_PATH"), help="Write a JUnit XML report to this path")
+    return parser.parse_args()
+
+
 async def run_smoke_tests():
+    args = parse_args()
     print("🚀 Starting Smoke Tests for CI...")
-    
+
     # Load smoke suite
     loader = TestLoader(base_path="datasets")
-    tests = loader.load_specific_file("datasets/smoke.json")
-    
+    tests = loader.load_specific_file(args.suite)
+
     # Initialize components
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
@@ -30,57 +110,87 @@ async def run_smoke_tests():
         print("   Please add 'GROQ_API_KEY' to your GitHub Repository Secrets.")
         sys.exit(1)
 
-    model = GroqAdapter(model_name="llama-3.3-70b-versatile")
-    format_eval = FormatEvaluator()
-    compliance_eval = ComplianceEvaluator()
-    
-    passed_count = 0
-    failed_count = 0
-    
+    model = GroqAdapter(model_name=CI_MODEL)
+
+    # Results are recorded so future CI runs can order tests by their history
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+    db = SessionLocal()
+    tests = order_by_history(tests, test_history(db, [t.id for t in tests]))
+    run_params = RunCreate(model_name=CI_MODEL, provider="groq", tags=["smoke"], max_concurrency=args.concurrency)
+    run_record = Run(
+        model_name=CI_MODEL,
+        provider="groq",
+        tags="smoke",
+        status=RUN_RUNNING,
+        params=run_params.model_dump_json()
+    )
+    db.add(run_record)
+    db.commit()
+
+    report = JUnitReport(args.junit, suite_name="smoke") if args.junit else None
+    runner = CIRunner(model, max_concurrency=args.concurrency)
+    writer = ResultWriter()
+    outcomes: Dict[str, TestOutcome] = {}
+    failed: List[TestOutcome] = []
+    aborted = False
+    run_task = None
+
+    async def on_result(outcome: TestOutcome):
+        nonlocal aborted
+        outcomes[outcome.test.id] = outcome
+        if outcome.passed:
+            print(f"✅ PASS  {outcome.test.name} ({outcome.latency_ms:.0f}ms)")
+        else:
+            failed.append(outcome)
+            print(f"❌ FAIL  {outcome.test.name} ({outcome.latency_ms:.0f}ms)")
+            print(f"   Reason: {', '.join(outcome.reasons)}")
+        if report:
+            report.add_result(outcome.test, outcome.passed, outcome.latency_ms, outcome.reasons, outcome.output)
+        await writer.put(build_result_row(run_record.id, outcome))
+
+        if len(failed) > args.max_failures and not aborted:
+            aborted = True
+            print(f"\n⛔ Failure budget exceeded ({len(failed)} > {args.max_failures}), aborting remaining tests")
+            run_task.cancel()
+
+    writer.start()
+    run_task = asyncio.create_task(runner.run(tests, on_result=on_result))
+    try:
+        await run_task
+    except asyncio.CancelledError:
+        if not aborted:
+            raise
+    finally:
+        await writer.close()
+
+    # Tests without an outcome were cancelled by the abort, or raised during execution
+    errored = 0
     for test in tests:
-        print(f"\nrunning: {test.name}...", end="", flush=True)
-        
-        try:
-            # Generate
-            output = model.generate(test.prompt)
-            
-            # Evaluate
-            reasons = []
-            passed = True
-            
-            # Run evaluators
-            if test.evaluation_criteria:
-                if test.evaluation_criteria.get("format") == "json":
-                    res = format_eval.evaluate(test, output)
-                    if not res.passed:
-                        passed = False
-                        reasons.append(res.reason)
-                        
-                if any(k in test.evaluation_criteria for k in ["refusal", "required_phrases"]):
-                    res = compliance_eval.evaluate(test, output)
-                    if not res.passed:
-                        passed = False
-                        reasons.append(res.reason)
-            
-            if passed:
-                print(" ✅ PASS")
-                passed_count += 1
-            else:
-                print(" ❌ FAIL")
-                print(f"   Reason: {', '.join(reasons)}")
-                failed_count += 1
-                
-        except Exception as e:
-            print(f" ❌ ERROR: {e}")
-            failed_count += 1
-            
+        if test.id in outcomes:
+            continue
+        if aborted:
+            if report:
+                report.add_skipped(test, "Aborted: failure budget exceeded")
+        else:
+            errored += 1
+            print(f"❌ ERROR {test.name}")
+            if report:
+                report.add_error(test, "Execution failed")
+
+    finalize_run(db, run_record, total_tests=len(tests), status=RUN_CANCELLED if aborted else RUN_COMPLETED)
+    db.close()
+
+    failed_count = len(failed) + errored
     print("\n" + "="*40)
     print("SMOKE TEST SUMMARY")
     print("="*40)
     print(f"Total: {len(tests)}")
-    print(f"Passed: {passed_count}")
+    print(f"Passed: {len(outcomes) - len(failed)}")
     print(f"Failed: {failed_count}")
-    
+    if aborted:
+        print(f"Skipped: {len(tests) - len(outcomes)}")
+
     if failed_count > 0:
         print("\n❌ CI FAILURE: Some tests failed.")
         sys.exit(1)
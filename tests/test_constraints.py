@@ -0,0 +1,107 @@
+import pytest
+from pydantic import ValidationError
+
+from app.schemas import test_case
+from evaluator.constraints import ConstraintError, compile_constraints
+
+
+def check_text(constraint, text):
+    return compile_constraints([constraint]).check_text(text)
+
+
+@pytest.mark.parametrize("constraint, passing, failing, reason", [
+    ("exact_match:Paris", "the capital is paris", "Lyon", "Output did not contain expected text: 'Paris'"),
+    ("forbidden:As an AI", "Sure.", "as an ai, I can't", "Output contains forbidden text: 'As an AI'"),
+    ("regex:^\\d{3}$", "123", "1234", "Output did not match pattern: '^\\d{3}$'"),
+    ("not_regex:\\bTODO\\b", "done", "a TODO left", "Output matched forbidden pattern: '\\bTODO\\b'"),
+    ("max_words:3", "one two three", "one two three four", "Output has 4 words, more than 3"),
+    ("min_words:2", "one two", "one", "Output has 1 words, fewer than 2"),
+    ("max_chars:5", "12345", "123456", "Output has 6 chars, more than 5"),
+    ("min_chars:3", "abc", "ab", "Output has 2 chars, fewer than 3"),
+])
+def test_text_constraints(constraint, passing, failing, reason):
+    assert check_text(constraint, passing) is None
+    assert check_text(constraint, failing) == reason
+
+
+def test_name_is_case_insensitive_and_argument_stripped():
+    assert check_text(" MAX_WORDS : 1 ", "one") is None
+    assert check_text(" MAX_WORDS : 1 ", "one two") is not None
+
+
+def test_argument_may_contain_colons():
+    assert check_text("exact_match:a:b", "x a:b y") is None
+
+
+def test_first_failing_text_constraint_is_reported():
+    constraints = compile_constraints(["exact_match:hello", "max_words:1"])
+    assert constraints.check_text("goodbye world") == "Output did not contain expected text: 'hello'"
+
+
+@pytest.mark.parametrize("constraint, message", [
+    ("max_words", "expected <name>:<argument>"),
+    ("max_words:", "expected <name>:<argument>"),
+    ("max_words:ten", "expected a whole number"),
+    ("min_chars:-1", "must not be negative"),
+    ("regex:(", "Invalid constraint 'regex:('"),
+    ("format:xml", "only format:json is supported"),
+    ("json_type:dict", "expected one of object, array, string, number, boolean, null"),
+    ("max_lines:3", "Unknown constraint 'max_lines:3'"),
+])
+def test_malformed_constraints(constraint, message):
+    with pytest.raises(ConstraintError) as excinfo:
+        compile_constraints([constraint])
+    assert message in str(excinfo.value)
+
+
+def test_json_constraints_require_json():
+    assert not compile_constraints(["max_words:3"]).requires_json
+    for constraint in ("format:json", "json_type:array", "json_keys:a"):
+        assert compile_constraints([constraint]).requires_json
+    assert compile_constraints([], {"format": "json"}).requires_json
+
+
+@pytest.mark.parametrize("name, value, ok", [
+    ("object", {}, True),
+    ("array", [], True),
+    ("string", "", True),
+    ("number", 1.5, True),
+    ("number", True, False),
+    ("boolean", False, True),
+    ("null", None, True),
+    ("object", [], False),
+])
+def test_json_type(name, value, ok):
+    errors = compile_constraints([f"json_type:{name}"]).check_json(value)
+    assert (errors == []) is ok
+
+
+def test_json_type_message():
+    errors = compile_constraints(["json_type:array"]).check_json({})
+    assert [str(e) for e in errors] == ["$: is not an array"]
+
+
+def test_json_keys():
+    constraints = compile_constraints(["json_keys: a, b ,"])
+    assert constraints.check_json({"a": 1, "b": 2}) == []
+    assert [str(e) for e in constraints.check_json({"a": 1})] == ["$: is missing key 'b'"]
+    assert [str(e) for e in constraints.check_json([1])] == ["$: is not an object"]
+
+
+def test_schema_from_criteria():
+    criteria = {"format": "json", "schema": {"type": "object", "required": ["qty"]}}
+    constraints = compile_constraints([], criteria)
+    assert constraints.requires_json
+    assert constraints.check_json({"qty": 1}) == []
+    assert constraints.check_json({}) != []
+
+
+def test_invalid_constraint_invalidates_the_test_case():
+    with pytest.raises(ValidationError, match="Unknown constraint"):
+        test_case.TestCase(id="t", name="t", prompt="p", constraints=["nonsense:1"])
+
+
+def test_test_case_compiles_constraints_once():
+    test = test_case.TestCase(id="t", name="t", prompt="p", constraints=["max_words:2"])
+    assert test.compiled_constraints is test.compiled_constraints
+    assert test.compiled_constraints.check_text("a b c") == "Output has 3 words, more than 2"
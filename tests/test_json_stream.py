@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+
+from evaluator.constraints import compile_constraints
+from evaluator.json_stream import JsonStreamValidator
+from evaluator.json_validation import extract_json
+from evaluator.llm.base import ModelAdapter, StreamChunk
+
+
+class ChunkedAdapter(ModelAdapter):
+    """Streams fixed chunks and records how many the consumer pulled."""
+    provider = "test"
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.pulled = 0
+
+    def generate(self, prompt, context=None, params=None):
+        return "".join(self.chunks)
+
+    async def astream(self, prompt, context=None, params=None):
+        for chunk in self.chunks:
+            self.pulled += 1
+            yield StreamChunk(text=chunk)
+
+
+def feed(text, chunk_size=1, constraints=None):
+    """Stream text in fixed-size chunks; (error, characters fed when it was first reported)."""
+    validator = JsonStreamValidator(constraints)
+    for start in range(0, len(text), chunk_size):
+        error = validator.feed(text[start:start + chunk_size])
+        if error:
+            return error, start + chunk_size
+    return None, len(text)
+
+
+VALID = [
+    '```json\n{"a": [1, 2.5e3, -0.1, true, null, "x\\u00e9\\n"], "b": {"c": NaN, "d": -Infinity}}\n```',
+    'Here you go:\n```json\n[1, 2, 3]\n```\nAnything after the fence is ignored',
+    '```json{}```',
+    '```json\n"s"\n```',
+    '```json\n  42  \n```',
+]
+
+
+@pytest.mark.parametrize("text", VALID)
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+def test_valid_fenced_json_is_never_failed(text, chunk_size):
+    assert feed(text, chunk_size) == (None, len(text))
+    assert extract_json(text).ok
+
+
+@pytest.mark.parametrize("text, reason", [
+    ('```json\n{"a": oops}\n```', "Expecting value, got 'o'"),
+    ('```json\n{a: 1}\n```', "Expecting property name enclosed in double quotes, got 'a'"),
+    ('```json\n{"a" 1}\n```', "Expecting ':' delimiter, got '1'"),
+    ('```json\n[1 2]\n```', "Expecting ',' delimiter, got '2'"),
+    ('```json\n[1, 01]\n```', "Invalid number '01'"),
+    ('```json\n["\\x"]\n```', "Invalid \\escape: 'x'"),
+    ('```json\n["\\u12G4"]\n```', "Invalid \\uXXXX escape"),
+    ('```json\n["a\nb"]\n```', "Invalid control character in string"),
+    ('```json\n[tru]\n```', "Expecting value, got 'tru'"),
+    ('```json\n{"a": 1} trailing\n```', "Extra data after the JSON value: 't'"),
+])
+def test_invalid_fenced_json_fails_early(text, reason):
+    error, fed = feed(text)
+    assert error is not None and reason in error
+    assert fed < len(text)  # Reported before the stream ended
+    assert not extract_json(text).ok
+
+
+def test_failure_is_reported_at_the_offending_character():
+    text = '```json\n{"a": x' + " " * 500 + "}\n```"
+    error, fed = feed(text)
+    assert error == f"Invalid JSON after {text.index('x') + 1} characters of output: Expecting value, got 'x'"
+    assert fed == text.index("x") + 1
+
+
+def test_error_is_sticky():
+    validator = JsonStreamValidator()
+    assert validator.feed("```json\n[x") is not None
+    assert validator.feed("1]\n```") == validator.error
+
+
+def test_fence_split_across_chunks():
+    assert feed('Answer: ``', 1000) == (None, 10)
+    validator = JsonStreamValidator()
+    for chunk in ("Answer: ``", "`js", "on\n{1", "}"):
+        error = validator.feed(chunk)
+    assert error is not None and "Expecting property name" in error
+
+
+def test_truncated_stream_is_not_failed():
+    # An unfinished document may still become valid, so only the final evaluation can reject it
+    for text in ('```json\n{"a": [1, 2', '```json\n{"a": "unterminated', '```json\n[1, 2.', '```json\n[tr'):
+        assert feed(text) == (None, len(text))
+
+
+@pytest.mark.parametrize("text", [
+    "[Note] the JSON follows\n```json\n{\"a\": 1}\n```",
+    "[Note] no JSON here at all",
+    "{not json, just braces in prose}",
+    "{\"a\": oops} but here it is fixed: {\"a\": 1}",
+    "{\"a\": 1} and some trailing prose",
+    "[1, 2",
+])
+def test_prose_and_bare_json_are_never_failed_early(text):
+    # Left to FormatEvaluator on the complete output
+    assert feed(text) == (None, len(text))
+
+
+def test_may_let_through_what_the_final_evaluation_rejects():
+    # extract_json ends the block at the backticks inside the string; the stream check doesn't fail it
+    text = '```json\n{"k": "```"}\n```'
+    assert feed(text) == (None, len(text))
+    assert not extract_json(text).ok
+
+
+def test_only_the_first_json_fence_is_validated():
+    text = '```json\n{"a": 1}\n```\nand another: ```json\n{oops}\n```'
+    assert feed(text) == (None, len(text))
+
+
+def test_wrong_shape_fails_once_the_value_is_complete():
+    constraints = compile_constraints(["json_keys:name,qty"])
+    text = '```json\n{"name": "x"}\n```'
+    error, fed = feed(text, constraints=constraints)
+    assert error == "JSON does not match the expected shape: $: is missing key 'qty'"
+    assert fed == text.index("}") + 1
+    assert feed('```json\n{"name": "x", "qty": 1}\n```', constraints=constraints)[0] is None
+
+
+def test_schema_checked_on_complete_value():
+    constraints = compile_constraints([], {"format": "json", "schema": {"type": "array", "items": {"type": "integer"}}})
+    assert feed('```json\n[1, 2]\n```', constraints=constraints)[0] is None
+    error, _ = feed('```json\n[1, "two"]\n```', constraints=constraints)
+    assert error is not None and error.startswith("JSON does not match the expected shape: $[1]")
+
+
+def test_generation_stops_at_the_first_invalid_chunk():
+    adapter = ChunkedAdapter(["```json\n", '{"a": ', "oops", "}", "\n```", " and more"])
+    generation = asyncio.run(adapter.agenerate_streamed("p", on_chunk=JsonStreamValidator().feed))
+    assert adapter.pulled == 3
+    assert generation.text == '```json\n{"a": oops'
+    assert "Expecting value, got 'o'" in generation.stopped
+
+
+def test_generation_of_valid_or_truncated_json_runs_to_the_end():
+    for chunks in (["```json\n[1,", " 2]\n```"], ["```json\n[1,", " 2"]):
+        adapter = ChunkedAdapter(chunks)
+        generation = asyncio.run(adapter.agenerate_streamed("p", on_chunk=JsonStreamValidator().feed))
+        assert generation.stopped is None
+        assert generation.text == "".join(chunks)
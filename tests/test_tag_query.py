@@ -0,0 +1,75 @@
+import re
+
+import pytest
+
+from evaluator.tag_query import And, IdGlob, Not, Or, Tag, TagIndex, TagQueryError, parse_tag_queries, parse_tag_query
+
+ENTRIES = {
+    "a.json": [("json_1", ("json",)), ("json_legacy_1", ("json", "adversarial"))],
+    "b.yaml": [("refusal_1", ("refusal",)), ("ground_1", ("grounding", "json"))],
+}
+INDEX = TagIndex(ENTRIES)
+
+
+def select(expression):
+    return {test_id for ids in INDEX.select(parse_tag_query(expression)).values() for test_id in ids}
+
+
+def test_plain_tag():
+    assert parse_tag_query("json") == Tag("json")
+    assert select("json") == {"json_1", "json_legacy_1", "ground_1"}
+
+
+def test_not_binds_tighter_than_and_and_and_tighter_than_or():
+    assert parse_tag_query("a OR b AND NOT c") == Or((Tag("a"), And((Tag("b"), Not(Tag("c"))))))
+
+
+def test_parentheses_override_precedence():
+    assert parse_tag_query("(a OR b) AND c") == And((Or((Tag("a"), Tag("b"))), Tag("c")))
+    assert select("(refusal OR grounding) AND json") == {"ground_1"}
+
+
+def test_double_negation():
+    assert parse_tag_query("NOT NOT json") == Not(Not(Tag("json")))
+    assert select("NOT NOT json") == select("json")
+
+
+def test_id_glob():
+    assert parse_tag_query("id:json_legacy_*") == IdGlob("json_legacy_*")
+    assert select("json AND NOT id:json_legacy_*") == {"json_1", "ground_1"}
+
+
+def test_select_agrees_with_matches():
+    for expression in ("json AND NOT adversarial", "refusal OR grounding", "NOT (json OR refusal)", "id:*_1"):
+        query = parse_tag_query(expression)
+        matched = {test_id for tests in ENTRIES.values() for test_id, tags in tests if query.matches(test_id, tags)}
+        assert select(expression) == matched
+
+
+def test_query_list_is_ored():
+    assert parse_tag_queries(["json"]) == Tag("json")
+    assert parse_tag_queries(["json", "refusal AND NOT x"]) == Or((Tag("json"), And((Tag("refusal"), Not(Tag("x"))))))
+
+
+@pytest.mark.parametrize("expression, message", [
+    ("", "Empty tag query"),
+    ("   ", "Empty tag query"),
+    ("json AND", "Unexpected end"),
+    ("NOT", "Unexpected end"),
+    ("(json OR refusal", "Unexpected end"),
+    ("json)", "Unexpected ')'"),
+    ("json refusal", "Unexpected 'refusal'"),
+    ("AND json", "Unexpected 'AND'"),
+    ("json OR OR refusal", "Unexpected 'OR'"),
+    ("()", "Unexpected ')'"),
+    ("id:", "Empty id pattern"),
+])
+def test_malformed_queries(expression, message):
+    with pytest.raises(TagQueryError, match=re.escape(message)):
+        parse_tag_query(expression)
+    with pytest.raises(TagQueryError):
+        parse_tag_queries(["json", expression])
+
+
+def test_tag_query_error_is_a_value_error():
+    assert issubclass(TagQueryError, ValueError)